@@ -1,8 +1,14 @@
 # backtests/debug_case.py
 from __future__ import annotations
+import sys
 import pandas as pd
 from pathlib import Path
 
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from core.indicators import ENGINE
+
 # ปรับชื่อ/ที่อยู่ให้ตรงกับโปรเจกต์คุณ
 DATA = Path('data/XAUUSD_15m_clean.csv')
 
@@ -18,7 +24,7 @@ def main():
     # ชิม ๆ สัญญาณง่าย ๆ: EMA 10/20 cross + Turtle 20/55 break
     if {'close'}.issubset(df.columns):
         for p in (10,20,50):
-            df[f'ema{p}'] = df['close'].ewm(span=p, min_periods=p).mean()
+            df[f'ema{p}'] = ENGINE.ema(df['close'], p, adjust=True, min_periods=p)
 
         df['ema_long']  = (df['ema10'] > df['ema20']) & (df['ema20'] > df['ema50'])
         df['ema_short'] = (df['ema10'] < df['ema20']) & (df['ema20'] < df['ema50'])
@@ -28,10 +34,12 @@ def main():
 
         # Turtle breakout
         w1, w2 = 20, 55
-        df['hh20'] = df['close'].rolling(w1).max().shift(1)
-        df['ll20'] = df['close'].rolling(w1).min().shift(1)
-        df['hh55'] = df['close'].rolling(w2).max().shift(1)
-        df['ll55'] = df['close'].rolling(w2).min().shift(1)
+        hh = ENGINE.rolling_extrema(df['close'], (w1, w2), 'max')
+        ll = ENGINE.rolling_extrema(df['close'], (w1, w2), 'min')
+        df['hh20'] = pd.Series(hh[:, 0], index=df.index).shift(1)
+        df['ll20'] = pd.Series(ll[:, 0], index=df.index).shift(1)
+        df['hh55'] = pd.Series(hh[:, 1], index=df.index).shift(1)
+        df['ll55'] = pd.Series(ll[:, 1], index=df.index).shift(1)
 
         df['t20_long']  = df['close'] > df['hh20']
         df['t20_short'] = df['close'] < df['ll20']
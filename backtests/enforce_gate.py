@@ -1,7 +1,19 @@
 from __future__ import annotations
 import argparse, sys, re
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from core.metrics import BARS_PER_DAY
 
 def read_metrics(path: str):
+    # รันแบบไบนารี (.run / .run.npz / meta.json ของมัน) → metrics จาก meta โดยตรง; อย่างอื่น = ข้อความ key=value
+    if path.endswith((".run", ".run.npz", "meta.json")):
+        from core.runfile import read_meta
+        m = read_meta(Path(path)).get("metrics") or {}
+        return {"sharpe": float(m.get("sharpe", 0.0)), "maxdd": float(m.get("maxdd", 1.0)),
+                "trades": int(m.get("trades", 0))}
     with open(path, "r", encoding="utf-8") as f:
         txt = f.read()
     def pick(key, default):
@@ -15,9 +27,21 @@ def read_metrics(path: str):
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
-    ap.add_argument("metrics_file")
+    ap.add_argument("metrics_file", help="metrics.txt จาก print_metrics หรือรันแบบไบนารี (backtests/out.run)")
     ap.add_argument("--min_sharpe", type=float, required=True)
     ap.add_argument("--maxdd", type=float, required=True)
+    # เกณฑ์แบบ bootstrap (core/bootstrap.py) จากผลรัน: เช็คเปอร์เซ็นไทล์แทนค่าจุดเดียว
+    ap.add_argument("--out", default=None, help="ผลรันของ backtest (out.run / out.txt) ระบุ → รัน bootstrap")
+    ap.add_argument("--method", choices=["block", "trades"], default="block")
+    ap.add_argument("--paths", type=int, default=10_000)
+    ap.add_argument("--block", type=int, default=BARS_PER_DAY, help="ความยาวบล็อก (แท่ง)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--sharpe_pct", type=float, default=5.0)
+    ap.add_argument("--min_sharpe_pct", type=float, default=None, help="Sharpe ที่เปอร์เซ็นไทล์ sharpe_pct ขั้นต่ำ")
+    ap.add_argument("--maxdd_pct", type=float, default=95.0)
+    ap.add_argument("--max_maxdd_pct", type=float, default=None, help="MaxDD ที่เปอร์เซ็นไทล์ maxdd_pct สูงสุด")
+    ap.add_argument("--tpd_pct", type=float, default=5.0)
+    ap.add_argument("--min_tpd_pct", type=float, default=None, help="trades/day ที่เปอร์เซ็นไทล์ tpd_pct ขั้นต่ำ")
     args = ap.parse_args()
 
     m = read_metrics(args.metrics_file)
@@ -28,4 +52,20 @@ if __name__ == "__main__":
         print(f"FAIL: maxdd {m['maxdd']:.4f} > max {args.maxdd:.4f}"); ok = False
 
     print(f"RESULT: sharpe={m['sharpe']:.4f} maxdd={m['maxdd']:.4f} trades={m['trades']}")
+
+    if args.out:
+        from core.bootstrap import bootstrap, read_run
+        equity, marks = read_run(Path(args.out))
+        res = bootstrap(equity, marks, args.method, args.paths, args.block, args.seed)
+        sh = res.percentile("sharpe", args.sharpe_pct)
+        dd = res.percentile("maxdd", args.maxdd_pct)
+        tpd = res.percentile("trades_per_day", args.tpd_pct)
+        if args.min_sharpe_pct is not None and sh < args.min_sharpe_pct:
+            print(f"FAIL: sharpe p{args.sharpe_pct:g} {sh:.4f} < min {args.min_sharpe_pct:.4f}"); ok = False
+        if args.max_maxdd_pct is not None and dd > args.max_maxdd_pct:
+            print(f"FAIL: maxdd p{args.maxdd_pct:g} {dd:.4f} > max {args.max_maxdd_pct:.4f}"); ok = False
+        if args.min_tpd_pct is not None and tpd < args.min_tpd_pct:
+            print(f"FAIL: trades_per_day p{args.tpd_pct:g} {tpd:.4f} < min {args.min_tpd_pct:.4f}"); ok = False
+        print(f"RESULT: bootstrap={res.method} paths={res.paths} sharpe_p{args.sharpe_pct:g}={sh:.4f} "
+              f"maxdd_p{args.maxdd_pct:g}={dd:.4f} trades_per_day_p{args.tpd_pct:g}={tpd:.4f} ({res.seconds:.2f}s)")
     sys.exit(0 if ok else 1)
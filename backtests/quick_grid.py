@@ -1,109 +1,150 @@
 # backtests/quick_grid.py
 from __future__ import annotations
-import csv, itertools, os, re, shutil, subprocess, sys, time
+import argparse, csv, itertools, sys, time, traceback
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Optional
 
 ROOT = Path(__file__).resolve().parents[1]   # repo root (…/lbot)
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+import numpy as np
+from core.backtest import BacktestParams, BacktestResult, load_data, run_backtest, run_batch, shared_inputs
+from core.results_store import ResultsStore, cell_key, code_version, data_fingerprint
+from core.search import Choice, Filters, Real, halving_budgets, rank, sample_space, successive_halving, tpe_search
+from core.sweep import run_cells
+
 BT_DIR = ROOT / "backtests"
 DATA = ROOT / "data" / "XAUUSD_15m_clean.csv"
 RUNS_DIR = BT_DIR / "runs"
 RUNS_DIR.mkdir(parents=True, exist_ok=True)
-
-PY = sys.executable
+STRATS = "ema,turtle20,turtle55"
 
 # ---------- helpers ----------
-def run_cmd(args: List[str], log_path: Path) -> int:
-    with open(log_path, "w", encoding="utf-8", newline="") as logf:
-        p = subprocess.run(args, stdout=logf, stderr=subprocess.STDOUT, cwd=ROOT)
-        return p.returncode
-
-METRICS_RE = {
-    "sharpe": re.compile(r"Sharpe\s*[:=]\s*([-+]?\d*\.?\d+)"),
-    "maxdd":  re.compile(r"MaxDD\s*[:=]\s*([-+]?\d*\.?\d+)"),
-    "trades": re.compile(r"Trades?\s*[:=]\s*(\d+)"),
-}
-
-def parse_metrics(text: str) -> Tuple[Optional[float], Optional[float], Optional[int]]:
-    sh = md = None
-    td = None
-    m = METRICS_RE["sharpe"].search(text)
-    if m: sh = float(m.group(1))
-    m = METRICS_RE["maxdd"].search(text)
-    if m: md = float(m.group(1))
-    m = METRICS_RE["trades"].search(text)
-    if m: td = int(m.group(1))
-    return sh, md, td
-
 def minutes_to_days(minutes: int) -> float:
     return minutes / 1440.0
 
-def safe_remove(p: Path):
-    try:
-        p.unlink(missing_ok=True)  # py>=3.8
-    except Exception:
-        pass
-
 def stamp() -> str:
     return time.strftime("%Y%m%d-%H%M%S")
 
+def cell_params(base_args: Dict[str, str|int|float], minutes: int) -> BacktestParams:
+    return BacktestParams(minutes=minutes, session="ln_ny", strats=STRATS, **base_args)
+
 # ---------- core run ----------
-def run_one(tag: str, base_args: Dict[str, str|int|float], minutes: int) -> Dict[str, object]:
-    """Run a single backtest case, return dict with params + metrics."""
-    out_txt = BT_DIR / "out.txt"
+def record(tag: str, base_args: Dict[str, str|int|float], minutes: int,
+           res: BacktestResult | None, seconds: float, error: str = "") -> Dict[str, object]:
+    """
+    archive ของเซลล์ (<tag>.run.npz มี params / metrics ใน meta + <tag>.log) → dict ของ params + metrics
+    res = None → เซลล์ล้ม (error = traceback ลง log)
+    """
     run_log = RUNS_DIR / f"{tag}.log"
-
-    # cleanup
-    safe_remove(out_txt)
-
-    args = [
-        PY, "-u", "-m", "backtests.run_quick_backtest",
-        "--symbol", "XAUUSD",
-        "--session", "ln_ny",
-        "--strats", "ema,turtle20,turtle55",
-        "--minutes", str(minutes),
-    ]
-
-    # attach params
-    for k, v in base_args.items():
-        args += [f"--{k}", str(v)]
-
-    t0 = time.time()
-    rc = run_cmd(args, run_log)
-    dur = time.time() - t0
-
-    # metrics
-    metrics_txt = RUNS_DIR / f"{tag}.metrics.txt"
-    if rc == 0 and out_txt.exists() and out_txt.stat().st_size > 0:
-        # copy raw out file for archive
-        archived = RUNS_DIR / f"{tag}.out.txt"
-        shutil.copyfile(out_txt, archived)
-
-        # call print_metrics.py
-        r = subprocess.run(
-            [PY, str(BT_DIR / "print_metrics.py"), str(out_txt)],
-            capture_output=True, text=True, cwd=ROOT
-        )
-        metrics_txt.write_text(r.stdout or r.stderr, encoding="utf-8")
-        sh, md, td = parse_metrics(metrics_txt.read_text(encoding="utf-8"))
-    else:
-        sh = md = None
-        td = None
-        metrics_txt.write_text(f"[error] rc={rc}, out.txt missing/empty\n", encoding="utf-8")
+    archived = RUNS_DIR / f"{tag}.run.npz"
+    rc, sh, md, td = 1, None, None, None
+    if res is not None:
+        try:
+            res.write_run(archived, compress=True)
+            run_log.write_text(res.summary(archived), encoding="utf-8")
+            rc, sh, md, td = 0, res.metrics.sharpe, res.metrics.maxdd, res.metrics.trades
+        except Exception:
+            error = traceback.format_exc()
+    if rc:
+        run_log.write_text(error, encoding="utf-8")
 
     days = minutes_to_days(minutes)
     tpd = (td / days) if (td is not None and days > 0) else None
 
     row = {
-        "tag": tag, "rc": rc, "seconds": round(dur, 2),
+        "tag": tag, "rc": rc, "seconds": round(seconds, 2),
         **{k: base_args[k] for k in base_args},
         "minutes": minutes,
         "sharpe": sh, "maxdd": md, "trades": td, "trades_per_day": tpd,
         "log": str(run_log.relative_to(ROOT)),
-        "out": str((RUNS_DIR / f"{tag}.out.txt").relative_to(ROOT)),
+        "out": str(archived.relative_to(ROOT)),
     }
     return row
 
+def run_one(tag: str, base_args: Dict[str, str|int|float], minutes: int,
+            data=None) -> Dict[str, object]:
+    """
+    Run a single backtest case in-process (core.backtest.run_backtest), return dict with params + metrics.
+    data = ราคาที่เปิดไว้แล้ว (load_data) ใช้ร่วมทุกเซลล์; ไฟล์ archive แยกตาม tag → ไม่มีผลรันกลาง
+    """
+    t0 = time.time()
+    res, error = None, ""
+    try:
+        res = run_backtest(data if data is not None else load_data(DATA), cell_params(base_args, minutes))
+    except Exception:
+        error = traceback.format_exc()
+    return record(tag, base_args, minutes, res, time.time() - t0, error)
+
+def _cell(shared: dict, cell) -> Dict[str, object]:
+    tag, params, minutes = cell
+    return run_one(tag, params, minutes=minutes, data=shared)
+
+def run_many(label: str, cells: list, minutes: int, data=None, workers: int = 1,
+             store: ResultsStore | None = None) -> List[Dict[str, object]]:
+    """
+    ทุกเซลล์ผ่าน core.sweep.run_cells: indicator ของหน้าต่างคำนวณครั้งเดียว แล้ว publish ลง shared memory
+    ให้ทุก worker; ผลพิมพ์ทันทีที่แต่ละเซลล์เสร็จ → คืนแถวตามลำดับ cells
+    store = ResultsStore → เซลล์ที่ key (params + code version + ข้อมูล) เคยรันแล้วไม่รันซ้ำ
+            และเซลล์ใหม่ถูกบันทึกทันทีที่เสร็จ (สวีปที่ค้างกลางทาง รันใหม่ = ทำต่อจากเดิม)
+    """
+    shared, rows, todo, put = _cached(label, cells, minutes, data, store)
+    for k, (j, row, secs) in enumerate(run_cells(_cell, [cells[i] for i in todo], shared, workers), 1):
+        i = todo[j]
+        print(f"[{label}] {k}/{len(todo)} → {row['tag']}  sharpe={row['sharpe']}  ({secs:.2f}s)")
+        sys.stdout.flush()
+        rows[i] = row
+        put(i, row)
+    return rows
+
+def run_batched(label: str, cells: list, minutes: int, data=None,
+                store: ResultsStore | None = None) -> List[Dict[str, object]]:
+    """
+    เหมือน run_many แต่ทุกเซลล์ที่ยังไม่อยู่ในแคชรันในการเรียก core.backtest.run_batch ครั้งเดียว
+    (indicator ครั้งเดียว, ฝั่งชนะครั้งเดียวต่อ vote, ลูป ATR stop / cooldown ของทุกเซลล์ใน kernel เดียว)
+    ผลเท่ากับรันทีละเซลล์; ทุกเซลล์ต้องใช้ minutes / strats / atr_n เดียวกัน
+    """
+    shared, rows, todo, put = _cached(label, cells, minutes, data, store)
+    t0 = time.time()
+    try:
+        results = run_batch(shared, [cell_params(cells[i][1], cells[i][2]) for i in todo])
+        error = ""
+    except Exception:
+        results, error = [None] * len(todo), traceback.format_exc()
+    secs = (time.time() - t0) / max(len(todo), 1)
+    for k, (i, res) in enumerate(zip(todo, results), 1):
+        tag, p, m = cells[i]
+        rows[i] = record(tag, p, m, res, secs, error)
+        print(f"[{label}] {k}/{len(todo)} → {tag}  sharpe={rows[i]['sharpe']}")
+        put(i, rows[i])
+    sys.stdout.flush()
+    return rows
+
+def _cached(label: str, cells: list, minutes: int, data, store: ResultsStore | None):
+    """
+    indicator ของหน้าต่าง (คำนวณครั้งเดียว) + แถวจากแคช → (shared, rows, ดัชนีเซลล์ที่ต้องรัน, put(i, row))
+    put บันทึกแถวที่รันสำเร็จลง store ทันที (สวีปที่ค้างกลางทาง รันใหม่ = ทำต่อจากเดิม)
+    """
+    shared = shared_inputs(data if data is not None else load_data(DATA),
+                           BacktestParams(minutes=minutes, strats=STRATS))
+    rows: List[Dict[str, object]] = [{} for _ in cells]
+    keys: List[str] = []
+    code = data_fp = None
+    if store is not None:
+        code, data_fp = code_version(), data_fingerprint(shared)
+        keys = [cell_key(cell_params(p, m), code, data_fp) for _, p, m in cells]
+        for i, key in enumerate(keys):
+            rows[i] = store.get(key) or {}
+    todo = [i for i, row in enumerate(rows) if not row]
+    if len(todo) < len(cells):
+        print(f"[{label}] cached {len(cells) - len(todo)}/{len(cells)} cells → run {len(todo)}")
+
+    def put(i: int, row: Dict[str, object]):
+        if store is not None and row["rc"] == 0:
+            _, p, m = cells[i]
+            store.put(keys[i], row, cell_params(p, m), code, data_fp, sweep=label.lower())
+    return shared, rows, todo, put
+
 def write_csv(path: Path, rows: List[Dict[str, object]]):
     if not rows:
         return
@@ -114,7 +155,9 @@ def write_csv(path: Path, rows: List[Dict[str, object]]):
         w.writerows(rows)
 
 # ---------- Stage 1: coarse baseline (no pyramiding) ----------
-def stage1(minutes: int = 60000, outfile: Path | None = None) -> Path:
+def stage1(minutes: int = 60000, outfile: Path | None = None, data=None,
+           store: ResultsStore | None = None) -> Path:
+    """ทุกคู่ atr_mult × vote × cooldown ในการเรียก run_batch ครั้งเดียว (run_batched)"""
     if outfile is None:
         outfile = BT_DIR / "grid_stage1.csv"
 
@@ -127,13 +170,12 @@ def stage1(minutes: int = 60000, outfile: Path | None = None) -> Path:
     combos = list(itertools.product(*grid.values()))
     name_order = list(grid.keys())
 
-    rows = []
+    cells = []
     for i, values in enumerate(combos, 1):
         params = {k: v for k, v in zip(name_order, values)}
         tag = f"s1_{i:03d}_" + "_".join(f"{k}{v}" for k, v in params.items())
-        print(f"[Stage1] {i}/{len(combos)} → {tag}")
-        row = run_one(tag, params, minutes=minutes)
-        rows.append(row)
+        cells.append((tag, params, minutes))
+    rows = run_batched("Stage1", cells, minutes, data=data, store=store)
 
     # sort by sharpe desc, then trades/day desc
     rows_sorted = sorted(
@@ -149,7 +191,8 @@ def stage1(minutes: int = 60000, outfile: Path | None = None) -> Path:
     return outfile
 
 # ---------- Stage 2: pyramiding around top-K from Stage 1 ----------
-def stage2(topk: int = 5, minutes: int = 60000, infile: Optional[Path] = None, outfile: Optional[Path] = None) -> Path:
+def stage2(topk: int = 5, minutes: int = 60000, infile: Optional[Path] = None, outfile: Optional[Path] = None,
+           data=None, workers: int = 1, store: ResultsStore | None = None) -> Path:
     infile = infile or (BT_DIR / "grid_stage1_pass.csv")
     outfile = outfile or (BT_DIR / "grid_stage2.csv")
 
@@ -162,7 +205,7 @@ def stage2(topk: int = 5, minutes: int = 60000, infile: Optional[Path] = None, o
         base_rows = [row for row in reader]
 
     base_rows = base_rows[:topk]
-    rows = []
+    cells, bases = [], []
     for b in base_rows:
         base_params = {
             "atr_mult": float(b["atr_mult"]),
@@ -175,13 +218,15 @@ def stage2(topk: int = 5, minutes: int = 60000, infile: Optional[Path] = None, o
                 tag = ("s2_" + "_".join(
                     f"{k}{v}" for k, v in params.items()
                 ))
-                print(f"[Stage2] → {tag}")
-                row = run_one(tag, params, minutes=minutes)
-                # keep baseline info for traceability
-                row["base_tag"] = b["tag"]
-                row["base_sharpe"] = b["sharpe"]
-                row["base_trades_per_day"] = b["trades_per_day"]
-                rows.append(row)
+                cells.append((tag, params, minutes))
+                bases.append(b)
+
+    rows = run_many("Stage2", cells, minutes, data=data, workers=workers, store=store)
+    for row, b in zip(rows, bases):
+        # keep baseline info for traceability
+        row["base_tag"] = b["tag"]
+        row["base_sharpe"] = b["sharpe"]
+        row["base_trades_per_day"] = b["trades_per_day"]
 
     # rank by sharpe then trades/day
     rows_sorted = sorted(
@@ -192,20 +237,88 @@ def stage2(topk: int = 5, minutes: int = 60000, infile: Optional[Path] = None, o
     write_csv(outfile, rows_sorted)
     return outfile
 
+# ---------- Stage 1 (optimizer): successive halving / TPE แทนกริดเต็ม ----------
+# พื้นที่เดียวกับ stage1 แต่ atr_mult ต่อเนื่อง (ขั้น 0.05) และ cooldown ละเอียดขึ้น
+SEARCH_SPACE = {
+    "atr_mult":   Real(1.5, 4.0, q=0.05),
+    "vote":       Choice([1, 2, 3]),
+    "cooldown":   Choice([0, 3, 6, 9, 12]),
+    "max_layers": Choice([0]),
+}
+MIN_SEARCH_MINUTES = 800 * 15   # หน้าต่างที่สั้นกว่านี้ถูกดันเป็น 800 แท่งอยู่ดี (shared_inputs)
+
+def search(mode: str = "halving", minutes: int = 60000, trials: int = 60, eta: int = 3, seed: int = 0,
+           filters: Filters = Filters(), outfile: Path | None = None, data=None, workers: int = 1,
+           store: ResultsStore | None = None) -> Path:
+    """
+    Stage 1 แบบปรับตัว: halving = สุ่ม `trials` ชุดแล้วคัดบนหน้าต่างสั้น → ยาว (ถึง minutes)
+    tpe = ประเมินบน minutes เต็ม `trials` ครั้ง โดย sampler เลือกจุดถัดไปจากผลที่ผ่านมา
+    เขียน grid_search.csv (ทุกการประเมิน) + grid_search_pass.csv (หน้าต่างเต็ม ผ่าน filters) ใช้ต่อกับ stage2 ได้
+    """
+    outfile = outfile or (BT_DIR / "grid_search.csv")
+    data = data if data is not None else load_data(DATA)
+
+    def evaluate(cands: list, budget: int) -> list:
+        cells = [(f"opt_m{budget}_" + "_".join(f"{k}{v}" for k, v in p.items()), p, budget) for p in cands]
+        return run_many(f"Search{budget}", cells, budget, data=data, workers=workers, store=store)
+
+    if mode == "halving":
+        cands = sample_space(SEARCH_SPACE, trials, np.random.default_rng(seed))
+        cands = list({tuple(p.items()): p for p in cands}.values())
+        budgets = halving_budgets(minutes, rungs=3, eta=eta, floor=min(MIN_SEARCH_MINUTES, minutes))
+        rows = successive_halving(evaluate, cands, budgets, eta=eta, filters=filters)
+    elif mode == "tpe":
+        rows = tpe_search(evaluate, SEARCH_SPACE, trials, minutes, batch=max(4, workers or 1),
+                          filters=filters, seed=seed)
+    else:
+        raise ValueError(f"unknown search mode: {mode}")
+
+    write_csv(outfile, rows)
+    full = [r for r in rows if r["minutes"] == minutes]
+    write_csv(BT_DIR / "grid_search_pass.csv", [r for r in rank(full, filters) if filters.passes(r)])
+    print(f"[search] {mode}: {len(rows)} evaluations, {len(full)} on the full {minutes}-minute window")
+    return outfile
+
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=1, help="จำนวนโปรเซส (0 = ทุกคอร์)")
+    ap.add_argument("--db", default=str(BT_DIR / "results.sqlite"), help="แคชผลรายเซลล์ (core/results_store.py)")
+    ap.add_argument("--fresh", action="store_true", help="ไม่ใช้/ไม่บันทึกแคช รันทุกเซลล์ใหม่")
+    ap.add_argument("--search", choices=["grid", "halving", "tpe"], default="grid",
+                    help="Stage 1: กริดเต็ม / successive halving / TPE (core/search.py)")
+    ap.add_argument("--trials", type=int, default=60, help="halving: จำนวนชุดเริ่ม, tpe: จำนวนการประเมิน")
+    ap.add_argument("--eta", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--min_trades_per_day", type=float, default=3.0)
+    ap.add_argument("--max_dd", type=float, default=None)
+    args = ap.parse_args()
+
     # sanity check: price file present
     if not DATA.exists():
         print(f"[!] Missing data file: {DATA}")
         sys.exit(2)
 
+    data = load_data(DATA)  # เปิดครั้งเดียว ทุกเซลล์ใช้ร่วมกัน
+    store = None if args.fresh else ResultsStore(args.db)
+
     # Stage 1
-    print("=== Stage 1: Coarse grid (no pyramiding) ===")
-    s1_csv = stage1(minutes=60000)
+    if args.search == "grid":
+        print("=== Stage 1: Coarse grid (no pyramiding) ===")
+        s1_csv = stage1(minutes=60000, data=data, store=store)
+        s1_pass = BT_DIR / "grid_stage1_pass.csv"
+    else:
+        print(f"=== Stage 1: Adaptive search ({args.search}, no pyramiding) ===")
+        s1_csv = search(args.search, minutes=60000, trials=args.trials, eta=args.eta, seed=args.seed,
+                        filters=Filters(args.min_trades_per_day, args.max_dd),
+                        data=data, workers=args.workers, store=store)
+        s1_pass = BT_DIR / "grid_search_pass.csv"
     print(f"[OK] Stage1 → {s1_csv.relative_to(ROOT)}")
     # Stage 2
     print("=== Stage 2: Pyramiding around top-K from Stage1 ===")
-    s2_csv = stage2(topk=5, minutes=60000)
+    s2_csv = stage2(topk=5, minutes=60000, infile=s1_pass, data=data, workers=args.workers, store=store)
     print(f"[OK] Stage2 → {s2_csv.relative_to(ROOT)}")
+    if store is not None:
+        store.close()
     print("Done.")
 
 if __name__ == "__main__":
@@ -1,37 +1,41 @@
 # backtests/quick_grid_stage2.py
 from __future__ import annotations
-import csv, subprocess, time
+import argparse, csv, traceback
 from pathlib import Path
-import shutil, sys
+import sys
 
 ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from core.backtest import BacktestParams, load_data, run_backtest, shared_inputs
+from core.sweep import run_cells
+
+STRATS = "ema,turtle20,turtle55"
 BT = ROOT / "backtests"
 RUNS = BT / "runs2"; RUNS.mkdir(parents=True, exist_ok=True)
-PY = sys.executable
-
-def run_one(tag, params: dict, minutes=60000):
-    out_txt = BT/'out.txt'
-    if out_txt.exists():
-        out_txt.unlink()
-    args = [PY, "-u", "-m", "backtests.run_quick_backtest",
-            "--symbol","XAUUSD","--session","ln_ny","--strats","ema,turtle20,turtle55",
-            "--minutes", str(minutes)]
-    for k,v in params.items():
-        args += [f"--{k}", str(v)]
+
+def run_one(tag, params: dict, minutes=60000, data=None):
+    # รันในโปรเซส (core.backtest.run_backtest) → archive แยกตาม tag (<tag>.run.npz มี params / metrics ใน meta) ไม่ใช้ผลรันกลาง
     log = RUNS/f"{tag}.log"
-    rc = subprocess.run(args, cwd=ROOT, stdout=open(log,"w",encoding="utf-8"),
-                        stderr=subprocess.STDOUT).returncode
-    metrics_path = RUNS/f"{tag}.metrics.txt"
-    if rc==0 and out_txt.exists() and out_txt.stat().st_size>0:
-        shutil.copyfile(out_txt, RUNS/f"{tag}.out.txt")
-        r = subprocess.run([PY, str(BT/"print_metrics.py"), str(out_txt)],
-                           cwd=ROOT, capture_output=True, text=True)
-        metrics_path.write_text(r.stdout or r.stderr, encoding="utf-8")
-    else:
-        metrics_path.write_text(f"[error] rc={rc}\n", encoding="utf-8")
-    return rc
+    try:
+        res = run_backtest(data if data is not None else load_data(),
+                           BacktestParams(minutes=minutes, session="ln_ny", strats=STRATS, **params))
+        out = res.write_run(RUNS/f"{tag}.run.npz", compress=True)
+        log.write_text(res.summary(out), encoding="utf-8")
+        return 0
+    except Exception:
+        log.write_text(traceback.format_exc(), encoding="utf-8")
+        return 1
+
+def _cell(shared, cell):
+    tag, params, minutes = cell
+    return run_one(tag, params, minutes=minutes, data=shared)
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=1, help="จำนวนโปรเซส (0 = ทุกคอร์)")
+    args = ap.parse_args()
+
     s1 = BT/"grid_stage1_pass.csv"
     if not s1.exists():
         print("[!] grid_stage1_pass.csv not found"); sys.exit(2)
@@ -42,7 +46,8 @@ def main():
             bases.append(row)
             if len(bases)>=topk: break
 
-    rows=[]
+    data = load_data()  # เปิดครั้งเดียว ทุกเซลล์ใช้ร่วมกัน
+    cells=[]
     for b in bases:
         base = {"atr_mult": float(b["atr_mult"]),
                 "vote": int(float(b["vote"])),
@@ -51,9 +56,14 @@ def main():
             for pyr_step_atr in [0.5,0.8,1.2]:
                 params = {**base, "max_layers": max_layers, "pyr_step_atr": pyr_step_atr}
                 tag = "s2_"+"_".join(f"{k}{v}" for k,v in params.items())
-                print("→", tag); sys.stdout.flush()
-                run_one(tag, params, minutes=int(float(b.get("minutes",60000))))
-                rows.append(params)
+                cells.append((tag, params, int(float(b.get("minutes",60000)))))
+
+    # indicator ของแต่ละหน้าต่าง (minutes) คำนวณครั้งเดียว แล้วแชร์ให้ทุก worker
+    for minutes in sorted({c[2] for c in cells}):
+        group = [c for c in cells if c[2] == minutes]
+        shared = shared_inputs(data, BacktestParams(minutes=minutes, strats=STRATS))
+        for i, rc, secs in run_cells(_cell, group, shared, args.workers):
+            print("→", group[i][0], f"rc={rc} ({secs:.2f}s)"); sys.stdout.flush()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+# --- make 'core' importable when running as a script ---
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+# ------------------------------------------------------
+
+import argparse
+import numpy as np, pandas as pd
+from config import TAKER_FEE_BPS_PER_SIDE
+from core.bootstrap import read_run
+from core.kernels import pnl_path_kernel
+from core.metrics import returns_from_equity
+from core.ohlcv_store import OHLCVStore
+from core.pipeline import features_stage, positions_stage, returns_stage, signals_stage
+from core.rolling import (days_to_bars, rolling_drawdown, rolling_hit_rate, rolling_max_drawdown,
+                          rolling_sharpe, trade_pnl_at_marks)
+from core.runfile import open_run
+
+# Sharpe / drawdown / hit rate แบบหน้าต่างเลื่อน (core/rolling.py) ของ
+#   ผลรันของ run_quick_backtest (out.run / out.txt, ค่าเริ่มต้น) หรือ top-N config จาก sweep_pyramid_results.csv (--sweep)
+# บันทึกเป็น .npz (float32, สุ่มทุก --step แท่ง) ไว้พล็อต: time, labels, sharpe_<d>d / maxdd_<d>d / dd_<d>d / hit_<d>d
+
+def parse_list_floats(s: str) -> list[float]:
+    return [float(x) for x in s.split(",") if x.strip()!=""]
+
+def from_run(path: Path):
+    """(equity แท่ง × 1, ตัวชี้ไม้จบ, เวลา = idx ของแท่ง, labels)"""
+    equity, marks = read_run(path)
+    return equity[:, None], marks[:, None], np.asarray(open_run(path).idx, dtype=np.int64), [path.name]
+
+def from_sweep(path: Path, top: int, minutes: int, atr_n: int, strats: str, cooldown: int):
+    """
+    รัน top-N แถวของผลสวีปซ้ำบนหน้าต่างเดียวกัน (สเตจเดียวกับ core/pipeline.py) → equity / ตัวชี้ไม้จบ ต่อ config
+    ไม้จบ = แท่งที่สถานะที่ถือ (pos ของแท่งก่อน) ไม่ใช่ 0 แล้วเปลี่ยน
+    """
+    res = pd.read_csv(path).head(top)
+    store = OHLCVStore.open()
+    df = (store.last_n_minutes(minutes) if minutes else store).to_frame()
+    if "bars" in res and int(res["bars"].iloc[0]) != len(df):
+        print(f"[!] {path.name} was swept on {int(res['bars'].iloc[0])} bars, --minutes {minutes} gives {len(df)}")
+    cd = res["cooldown"] if "cooldown" in res else pd.Series(cooldown, index=res.index)
+    grid = np.column_stack([res["atr_mult"], res["step_atr"], res["layers"], cd]).astype(float)
+    pos = positions_stage(features_stage(df, atr_n), signals_stage(df, strats), grid)
+    ret = returns_stage(df)
+    fee = (TAKER_FEE_BPS_PER_SIDE / 10000.0) * 2.0
+    net = np.empty(pos.shape)
+    for j in range(pos.shape[1]):
+        pnl_path_kernel(ret, pos[:, j], fee, net[:, j])
+    hold = np.zeros(pos.shape)
+    hold[1:] = pos[:-1]
+    marks = np.zeros(pos.shape, dtype=np.int64)
+    marks[1:] = (hold[:-1] != 0) & (hold[1:] != hold[:-1])
+    labels = [f"am={g[0]:g} st={g[1]:g} ly={int(g[2])} cd={int(g[3])}" for g in grid]
+    return np.cumprod(1.0 + net, axis=0), marks, pd.DatetimeIndex(df["time"]).as_unit("ns").asi8, labels
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="rolling Sharpe / drawdown / hit rate → .npz สำหรับพล็อต")
+    ap.add_argument("--out", default=str(ROOT / "backtests" / "out.run"), help="ผลรันของ run_quick_backtest (.run / .txt)")
+    ap.add_argument("--sweep", default=None, help="sweep_pyramid_results.csv (ระบุ → ใช้ top-N config แทนผลรัน)")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--minutes", type=int, default=20000, help="หน้าต่างเดียวกับตอนสวีป")
+    ap.add_argument("--atr_n", type=int, default=14)
+    ap.add_argument("--strats", default="ema,turtle20,turtle55")
+    ap.add_argument("--cooldown", type=int, default=8, help="ใช้เมื่อไฟล์สวีปไม่มีคอลัมน์ cooldown")
+    ap.add_argument("--windows", default="30,90", help="ความยาวหน้าต่าง (วัน, M15 = 96 แท่ง/วัน)")
+    ap.add_argument("--step", type=int, default=96, help="เก็บทุกกี่แท่ง (96 = วันละจุด)")
+    ap.add_argument("--save", default=str(ROOT / "backtests" / "rolling_metrics.npz"))
+    args = ap.parse_args()
+
+    if args.sweep:
+        equity, marks, t, labels = from_sweep(Path(args.sweep), args.top, args.minutes, args.atr_n,
+                                              args.strats, args.cooldown)
+    else:
+        equity, marks, t, labels = from_run(Path(args.out))
+    r = np.vstack([np.zeros((1, equity.shape[1])), returns_from_equity(equity)])   # รีเทิร์นเข้าแท่ง t
+    trade_pnl = trade_pnl_at_marks(equity, marks)
+
+    keep = np.arange(len(equity) - 1, -1, -max(args.step, 1))[::-1]              # รวมแท่งสุดท้ายเสมอ
+    out = {"time": t[keep], "labels": np.array(labels)}
+    rows = []
+    for d in parse_list_floats(args.windows):
+        w = days_to_bars(d)
+        if w > len(equity):
+            print(f"[!] window {d:g}d = {w} bars > {len(equity)} bars; skipped")
+            continue
+        series = {"sharpe": rolling_sharpe(r, w), "maxdd": rolling_max_drawdown(equity, w),
+                  "dd": rolling_drawdown(equity, w), "hit": rolling_hit_rate(trade_pnl, w, mask=marks)}
+        for name, v in series.items():
+            out[f"{name}_{d:g}d"] = v[keep].astype(np.float32)
+        sh, mdd = series["sharpe"][w - 1:], series["maxdd"][w - 1:]
+        for j, lab in enumerate(labels):
+            rows.append({"config": lab, "window": f"{d:g}d", "sharpe_last": sh[-1, j], "sharpe_min": sh[:, j].min(),
+                         "pct_sharpe_neg": (sh[:, j] < 0).mean() * 100, "maxdd_worst": mdd[:, j].max(),
+                         "hit_last": series["hit"][-1, j]})
+
+    np.savez_compressed(args.save, **out)
+    if rows:
+        print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+    print(f"\nbars={len(equity)} configs={len(labels)} points={len(keep)}\nSaved: {args.save}")
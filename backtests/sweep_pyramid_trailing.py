@@ -8,11 +8,13 @@ if str(ROOT) not in sys.path:
 # ------------------------------------------------------
 
 import argparse, itertools, numpy as np, pandas as pd
-from datetime import timedelta
-from core.data_loader import load_price_csv
-from core.entries import combined_signal
-from core.position_manager import generate_position_series
-from config import TAKER_FEE_BPS_PER_SIDE, ANN_FACTOR
+from core.ohlcv_store import OHLCVStore
+from core.pipeline import Pipeline, fingerprint, load_stage, position_sweep
+from core.search import Choice, Filters, Real, halving_budgets, sample_space, successive_halving, tpe_search
+from core.sweep import resolve_workers
+
+# memo ของสเตจ load → features/returns/signals → positions → metrics ใช้ร่วมทุกการเรียกในโปรเซส
+PIPE = Pipeline()
 
 def parse_list_floats(s: str) -> list[float]:
     return [float(x) for x in s.split(",") if x.strip()!=""]
@@ -20,38 +22,46 @@ def parse_list_floats(s: str) -> list[float]:
 def parse_list_ints(s: str) -> list[int]:
     return [int(float(x)) for x in s.split(",") if x.strip()!=""]
 
-def ann_sharpe(per_bar: pd.Series) -> float:
-    r = per_bar.dropna()
-    if len(r) < 2 or r.std() == 0: return 0.0
-    return (r.mean()/r.std()) * np.sqrt(ANN_FACTOR)
-
-def max_dd(per_bar: pd.Series) -> float:
-    eq = (1+per_bar.fillna(0)).cumprod()
-    peak = eq.cummax()
-    dd = (eq/peak)-1
-    return float(-dd.min()) if len(dd) else 0.0
-
-def run_one(df, atr_n, atr_mult, step_atr, layers):
-    sig = combined_signal(df)
-    pos = generate_position_series(
-        df, sig,
-        atr_n=atr_n, atr_mult=atr_mult,
-        pyramid_step_atr=step_atr, max_layers=layers
-    )
-    hold = pos.shift(1).fillna(0)
-    ret  = df["close"].pct_change().fillna(0.0)
-    gross = hold * ret
-    fee = (TAKER_FEE_BPS_PER_SIDE/10000.0) * 2.0
-    turns = hold.diff().abs().fillna(0)
-    net = gross - (turns>0).astype(int)*fee
-
-    trades = int((hold.diff().abs()>0).sum()//2)
-    shp = ann_sharpe(net)
-    mdd = max_dd(net)
-
-    days = max((df["time"].iloc[-1] - df["time"].iloc[0]).days, 1)
-    tpd = trades/days
-    return shp, mdd, trades, tpd
+def run_configs(df, atr_n, grid, workers=1, pipe=None):
+    """
+    ทุกแถวของ grid (atr_mult, step_atr, layers, cooldown) ผ่าน core/pipeline.py:
+    สัญญาณ/ATR/รีเทิร์นของ df เดิมคำนวณครั้งเดียว (ข้ามการเรียก) → grid ใหม่คำนวณแค่ positions + metrics
+    workers>1 → positions / metrics แบ่งไปหลายโปรเซส (อาร์เรย์แชร์ผ่าน shared memory)
+    """
+    pipe = pipe or PIPE
+    node = df if hasattr(df, "key") else pipe.source("df", df)
+    return position_sweep(pipe, node, atr_n, grid, workers=workers)
+
+def run_grid(df, atr_n, atr_mults, steps, layers, cooldowns, workers=1):
+    """ทุกคู่ใน product(atr_mults, steps, layers, cooldowns)"""
+    grid = list(itertools.product(atr_mults, steps, layers, cooldowns))
+    return run_configs(df, atr_n, grid, workers)
+
+def run_search(store, mode, minutes, atr_n, space, trials, filters, eta=3, seed=0, workers=1):
+    """
+    core/search.py บนพื้นที่ (atr_mult, step_atr ต่อเนื่อง / layers, cooldown แบบเลือก)
+    halving: budget = --minutes ของหน้าต่างท้ายไฟล์ (สั้น → ยาว); tpe: ประเมินบน minutes เต็ม
+    คืนผลของหน้าต่างเต็มในรูปเดียวกับ run_grid
+    """
+    pipe = PIPE
+    src = pipe.source("store", store, key=fingerprint(store.columns))
+
+    def evaluate(cands, budget):
+        df = pipe.run("load", load_stage, (src,), {"minutes": budget})
+        grid = [[p["atr_mult"], p["step_atr"], p["layers"], p["cooldown"]] for p in cands]
+        return run_configs(df, atr_n, grid, workers, pipe).to_dict("records")
+
+    if mode == "halving":
+        cands = list({tuple(p.items()): p for p in sample_space(space, trials, np.random.default_rng(seed))}.values())
+        # หน้าต่างสั้นสุดไม่ต่ำกว่า ~800 แท่ง M15 ไม่งั้น trades/day ของรอบแรกสุ่มเกินไปจนคัดผิดตัว
+        budgets = halving_budgets(minutes, rungs=3, eta=eta, floor=min(12000, minutes))
+        rows = successive_halving(evaluate, cands, budgets, eta=eta, filters=filters)
+        rows = [r for r in rows if r["budget"] == minutes]
+    else:
+        rows = tpe_search(evaluate, space, trials, minutes, batch=max(4, resolve_workers(workers)),
+                          filters=filters, seed=seed)
+    print(f"[search] {mode}: {len(rows)} configs on the full window")
+    return pd.DataFrame(rows)
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser()
@@ -60,32 +70,47 @@ if __name__ == "__main__":
     ap.add_argument("--atr_mults", type=str, default="1.8,2.0,2.25,2.5,2.75,3.0,3.25")
     ap.add_argument("--steps_atr", type=str, default="0.6,0.8,1.0,1.2,1.4")
     ap.add_argument("--layers", type=str, default="0,1,2,3")
+    ap.add_argument("--cooldowns", type=str, default="8")
     ap.add_argument("--min_trades_per_day", type=float, default=1.0)
     ap.add_argument("--max_dd", type=float, default=0.30)
     ap.add_argument("--top", type=int, default=25)
+    ap.add_argument("--workers", type=int, default=1, help="จำนวนโปรเซส (0 = ทุกคอร์)")
+    ap.add_argument("--search", choices=["grid", "halving", "tpe"], default="grid",
+                    help="grid = ทุกคู่ของรายการ; halving / tpe = ค้นในช่วง min..max ของ --atr_mults/--steps_atr")
+    ap.add_argument("--trials", type=int, default=40, help="halving: จำนวนชุดเริ่ม, tpe: จำนวนการประเมิน")
+    ap.add_argument("--eta", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--stats", action="store_true", help="พิมพ์เวลา/ cache hit ต่อสเตจของ pipeline")
     args = ap.parse_args()
 
-    df = load_price_csv()
-    if args.minutes:
-        end = df["time"].iloc[-1]
-        start = end - timedelta(minutes=args.minutes)
-        df = df[df["time"] >= start].reset_index(drop=True)
+    # searchsorted บน memmap → อ่านเฉพาะช่วง --minutes ไม่ใช่ทั้งไฟล์
+    store = OHLCVStore.open()
+    df = (store.last_n_minutes(args.minutes) if args.minutes else store).to_frame()
 
     atr_mults = parse_list_floats(args.atr_mults)
     steps     = parse_list_floats(args.steps_atr)
     layers    = parse_list_ints(args.layers)
 
-    rows = []
-    for am, st, ly in itertools.product(atr_mults, steps, layers):
-        shp, mdd, trades, tpd = run_one(df, args.atr_n, am, st, ly)
-        rows.append({
-            "atr_mult": am, "step_atr": st, "layers": ly,
-            "sharpe": round(shp,6), "maxdd": round(mdd,6),
-            "trades": trades, "trades_per_day": round(tpd,2),
-            "bars": len(df)
-        })
-
-    out = pd.DataFrame(rows)
+    cooldowns = parse_list_ints(args.cooldowns)
+
+    if args.search == "grid":
+        res = run_grid(df, args.atr_n, atr_mults, steps, layers, cooldowns, workers=args.workers)
+    else:
+        space = {"atr_mult": Real(min(atr_mults), max(atr_mults), q=0.05),
+                 "step_atr": Real(min(steps), max(steps), q=0.05),
+                 "layers": Choice(layers), "cooldown": Choice(cooldowns)}
+        res = run_search(store, args.search, args.minutes, args.atr_n, space, args.trials,
+                         Filters(args.min_trades_per_day, args.max_dd), eta=args.eta, seed=args.seed,
+                         workers=args.workers)
+    out = pd.DataFrame({
+        "atr_mult": res["atr_mult"], "step_atr": res["step_atr"], "layers": res["layers"],
+        "sharpe": [round(v, 6) for v in res["sharpe"]], "maxdd": [round(v, 6) for v in res["maxdd"]],
+        "trades": res["trades"], "trades_per_day": [round(v, 2) for v in res["trades_per_day"]],
+        "bars": len(df),
+    })
+    if len(cooldowns) > 1:
+        out.insert(3, "cooldown", res["cooldown"])
+
     # filter & sort
     filt = (out["maxdd"] <= args.max_dd) & (out["trades_per_day"] >= args.min_trades_per_day)
     outf = out.loc[filt].sort_values(["sharpe","trades_per_day"], ascending=[False,False])
@@ -97,3 +122,5 @@ if __name__ == "__main__":
     outf.to_csv(path, index=False)
     print(outf.head(args.top).to_string(index=False))
     print(f"\nSaved: {path}")
+    if args.stats:
+        print(PIPE.report())
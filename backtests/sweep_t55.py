@@ -1,20 +1,26 @@
 from __future__ import annotations
-import itertools, re, subprocess, sys
+import argparse, itertools, sys
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
-RUN = [sys.executable, str(ROOT/"backtests"/"run_quick_backtest.py")]
-MET = [sys.executable, str(ROOT/"backtests"/"print_metrics.py"), str(ROOT/"backtests"/"out.txt")]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from core.backtest import BacktestParams, load_data, run_backtest, shared_inputs
+from core.sweep import run_cells
 
-def run_once(args: list[str]) -> dict:
-    # รันตัวแบ็กเทสต์
-    subprocess.run(args, cwd=ROOT, check=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
-    # อ่าน metrics
-    out = subprocess.run(MET, cwd=ROOT, check=True, capture_output=True, text=True).stdout
-    f = lambda k: float(re.search(fr"{k}=([-\d\.]+)", out).group(1))
-    return {"sharpe": f("sharpe"), "maxdd": f("maxdd"), "trades": int(f("trades"))}
+def run_once(data, params: BacktestParams) -> dict:
+    # รันแบ็กเทสต์ในโปรเซส บนราคาที่เปิดไว้แล้ว
+    m = run_backtest(data, params).metrics
+    return {"sharpe": m.sharpe, "maxdd": m.maxdd, "trades": m.trades}
+
+def _cell(shared, params: BacktestParams) -> dict:
+    return run_once(shared, params)
 
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=1, help="จำนวนโปรเซส (0 = ทุกคอร์)")
+    args = ap.parse_args()
+
     minutes   = 60000
     session   = "ln_ny"
     strats    = "turtle55"
@@ -22,16 +28,17 @@ def main():
     cooldowns = [4, 6, 8, 12]
     atr_mults = [1.5, 2.0, 3.0, 4.0]
 
-    rows = []
-    for v, cd, am in itertools.product(votes, cooldowns, atr_mults):
-        args = RUN + ["--minutes", str(minutes), "--session", session,
-                      "--strats", strats, "--vote", str(v),
-                      "--cooldown", str(cd), "--max_layers", "1",
-                      "--atr_mult", str(am)]
-        r = run_once(args)
-        r.update({"vote": v, "cooldown": cd, "atr_mult": am})
-        rows.append(r)
-        print(f"[done] vote={v} cd={cd} atr={am}  -> Sharpe={r['sharpe']:.3f} DD={r['maxdd']:.3f} Trades={r['trades']}")
+    cells = [BacktestParams(minutes=minutes, session=session, strats=strats, vote=v,
+                            cooldown=cd, max_layers=1, atr_mult=am)
+             for v, cd, am in itertools.product(votes, cooldowns, atr_mults)]
+    # indicator ของหน้าต่างคำนวณครั้งเดียว → แชร์ให้ทุกเซลล์/worker
+    shared = shared_inputs(load_data(), cells[0])
+    rows = [None] * len(cells)
+    for i, r, _ in run_cells(_cell, cells, shared, args.workers):
+        p = cells[i]
+        r.update({"vote": p.vote, "cooldown": p.cooldown, "atr_mult": p.atr_mult})
+        rows[i] = r
+        print(f"[done] vote={p.vote} cd={p.cooldown} atr={p.atr_mult}  -> Sharpe={r['sharpe']:.3f} DD={r['maxdd']:.3f} Trades={r['trades']}")
 
     # จัดอันดับแล้วพิมพ์ Top-5
     rows.sort(key=lambda x: (x["sharpe"], -x["maxdd"]), reverse=True)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+# --- make 'core' importable when running as a script ---
+import sys
+from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+# ------------------------------------------------------
+
+import argparse, itertools, time
+import pandas as pd
+from core.ohlcv_store import OHLCVStore
+from core.search import Filters
+from core.walkforward import shared_arrays, walk_forward
+
+def parse_list_floats(s: str) -> list[float]:
+    return [float(x) for x in s.split(",") if x.strip()!=""]
+
+def parse_list_ints(s: str) -> list[int]:
+    return [int(float(x)) for x in s.split(",") if x.strip()!=""]
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="walk-forward: เลือกพารามิเตอร์บน IS ทีละ fold แล้วต่อเส้น OOS")
+    ap.add_argument("--data", default=None, help="ไฟล์ราคา (ไม่ระบุ = DATA_FILE ของ config)")
+    ap.add_argument("--minutes", type=int, default=0, help="ใช้เฉพาะช่วงท้ายกี่นาที (0 = ทั้งไฟล์)")
+    ap.add_argument("--is_minutes", type=int, default=60000, help="ความยาว in-sample ต่อ fold (M15: /15 = แท่ง)")
+    ap.add_argument("--oos_minutes", type=int, default=20000, help="ความยาว out-of-sample ต่อ fold")
+    ap.add_argument("--anchored", action="store_true", help="IS เริ่มที่ต้นข้อมูลเสมอ (ไม่ใช่ rolling)")
+    ap.add_argument("--atr_n", type=int, default=14)
+    ap.add_argument("--atr_mults", type=str, default="1.8,2.0,2.25,2.5,2.75,3.0,3.25")
+    ap.add_argument("--steps_atr", type=str, default="0.6,0.8,1.0,1.2,1.4")
+    ap.add_argument("--layers", type=str, default="0,1,2,3")
+    ap.add_argument("--cooldowns", type=str, default="8")
+    ap.add_argument("--min_trades_per_day", type=float, default=1.0)
+    ap.add_argument("--max_dd", type=float, default=0.30)
+    ap.add_argument("--workers", type=int, default=1, help="จำนวนโปรเซส (0 = ทุกคอร์)")
+    args = ap.parse_args()
+
+    store = OHLCVStore.open(Path(args.data) if args.data else None)
+    df = (store.last_n_minutes(args.minutes) if args.minutes else store).to_frame()
+
+    t0 = time.perf_counter()
+    shared = shared_arrays(df, atr_n=args.atr_n)   # indicator / สัญญาณทั้งประวัติครั้งเดียว
+    t_prep = time.perf_counter() - t0
+    grid = list(itertools.product(parse_list_floats(args.atr_mults), parse_list_floats(args.steps_atr),
+                                  parse_list_ints(args.layers), parse_list_ints(args.cooldowns)))
+    t0 = time.perf_counter()
+    res = walk_forward(shared, grid, is_bars=args.is_minutes // 15, oos_bars=args.oos_minutes // 15,
+                       anchored=args.anchored, filters=Filters(args.min_trades_per_day, args.max_dd),
+                       workers=args.workers)
+    t_run = time.perf_counter() - t0
+    if res.folds.empty:
+        print(f"[!] not enough bars ({len(df)}) for one fold of IS={args.is_minutes // 15} bars")
+        sys.exit(2)
+
+    # บันทึก: ต่อ fold + เส้น OOS ที่ต่อกันแล้ว
+    folds_path = ROOT / "backtests" / "walk_forward_folds.csv"
+    oos_path = ROOT / "backtests" / "walk_forward_oos.csv"
+    res.folds.to_csv(folds_path, index=False)
+    pd.DataFrame({"time": df["time"].to_numpy()[res.oos_index], "net": res.oos_net,
+                  "equity": res.oos_equity}).to_csv(oos_path, index=False)
+
+    cols = ["fold", "atr_mult", "step_atr", "layers", "cooldown", "is_pass", "is_sharpe", "oos_sharpe",
+            "oos_maxdd", "oos_trades", "oos_trades_per_day"]
+    print(res.folds[cols].round(4).to_string(index=False))
+    a = res.aggregate
+    print(f"\n[oos] folds={a['folds']} bars={a['bars']} sharpe={a['sharpe']:.4f} maxdd={a['maxdd']:.4f} "
+          f"trades={a['trades']} trades/day={a['trades_per_day']:.2f}")
+    print(f"[time] signals+indicators {t_prep:.2f}s (once)  folds {t_run:.2f}s  grid={len(grid)} configs/fold")
+    print(f"Saved: {folds_path}\n       {oos_path}")
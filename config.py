@@ -15,6 +15,17 @@ LBOT_DATA_DIR = Path(os.getenv(
 
 DATA_FILE = LBOT_DATA_DIR / "XAUUSD_15m_clean.csv"  # ใช้ชุด 'clean' ตามที่ระบุ
 
+# === Binary price cache (core/price_cache.py) ===
+PRICE_CACHE = os.getenv("LBOT_PRICE_CACHE", "1") == "1"
+PRICE_CACHE_DIR = Path(os.environ["LBOT_CACHE_DIR"]).resolve() if os.getenv("LBOT_CACHE_DIR") else None  # None = เก็บข้างไฟล์ CSV
+
+# === Compiled kernels (core/kernels.py) — ใช้ numba ถ้าติดตั้งไว้ ===
+USE_JIT = os.getenv("LBOT_JIT", "1") == "1"
+
+# === Indicator memo (core/indicators.py) — จำนวนผลลัพธ์ที่เก็บ (LRU), 0 = ปิด ===
+INDICATOR_CACHE_SIZE = int(os.getenv("LBOT_IND_CACHE", "256"))
+INDICATOR_CACHE_MB = int(os.getenv("LBOT_IND_CACHE_MB", "512"))   # เพดานหน่วยความจำ (ผลลัพธ์ + input ที่ถือไว้)
+
 # === Trading / Risk caps ===
 TAKER_FEE_BPS_PER_SIDE = float(os.getenv("LBOT_FEE_BPS", "0.5"))  # 0.5 bps ต่อขา
 MIN_TRADES_PER_DAY = 3
@@ -26,3 +37,15 @@ MAX_POS_PER_STRAT  = 3
 # === Annualization for Sharpe (M15 bars) ===
 M15_PER_DAY = 96
 ANN_FACTOR  = 252 * M15_PER_DAY
+
+# === DRL env (features.py / trading_env.py) ===
+SYMBOL = os.getenv("SYMBOL", "XAUUSD")
+TIMEFRAME_MINUTES = 15
+BAR_CLOSE_ONLY = True
+EMA_FAST, EMA_SLOW, EMA_TREND = 20, 50, 200
+ATR_PERIOD = int(os.getenv("ATR_PERIOD", "14"))
+SPIKE_ATR_MULT = float(os.getenv("SPIKE_ATR_MULT", "3.0"))   # range > k×ATR = แท่ง spike (ไม่เทรด)
+RISK_PER_TRADE = RISK_PER_TRADE_PCT / 100.0                 # สัดส่วนของ equity
+DAILY_RISK_CAP = RISK_PER_DAY_PCT / 100.0
+BREAKEVEN_AFTER_R_MULT = float(os.getenv("BE_AFTER_ATR", "0.5"))
+ATR_TRAIL_MULT = float(os.getenv("ATR_TRAIL_MULT", "1.0"))
@@ -0,0 +1,270 @@
+from __future__ import annotations
+import csv
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import numpy as np
+
+from core.indicators import ENGINE, _values
+from core.kernels import quick_backtest_batch_kernel, quick_backtest_kernel
+from core.metrics import ANN_BAR, max_drawdown, returns_from_equity, sharpe
+from core.ohlcv_store import OHLCVStore
+from core.runfile import write_run
+
+DATA = Path(__file__).resolve().parents[1] / "data" / "XAUUSD_15m_clean.csv"
+ANN = ANN_BAR  # M15: 96 แท่ง/วัน, 252 วัน/ปี
+
+# คอลัมน์ของ out.txt (ไม่มี header) ตามลำดับ
+OUT_COLUMNS = ["idx", "close", "want_long", "want_short", "enter_long", "enter_short", "exit_pos", "pos", "equity"]
+
+
+def _bfill(x: np.ndarray) -> np.ndarray:
+    # Series.bfill() บนอาร์เรย์: ช่อง NaN ใช้ค่าที่ไม่ใช่ NaN ถัดไป (ท้ายที่ไม่มีค่าถัดไปคงเป็น NaN)
+    n = len(x)
+    idx = np.where(np.isnan(x), n, np.arange(n))
+    idx = np.minimum.accumulate(idx[::-1])[::-1]
+    return np.r_[x, np.nan][idx]
+
+
+def votes_counts(data, strats: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    จำนวนโหวตฝั่ง long/short ต่อแท่ง + ema_bias (+1/-1/0 จาก EMA10 เทียบ EMA20)
+    data = อะไรก็ได้ที่มี ["close"] (DataFrame / OHLCVWindow / dict ของอาร์เรย์)
+    """
+    c = _values(data["close"])
+    e10, e20 = ENGINE._ema(c, 10, False, 10), ENGINE._ema(c, 20, False, 20)
+    ema_bias = (e10 > e20).astype(np.int64) - (e10 < e20)
+
+    long_cnt = np.zeros(len(c), dtype=np.int64)
+    short_cnt = np.zeros(len(c), dtype=np.int64)
+    if "ema" in strats:
+        long_cnt += e10 > e20
+        short_cnt += e10 < e20
+    windows = [n for n in (20, 55) if f"turtle{n}" in strats]
+    if windows:
+        # High/Low ของทุกหน้าต่างในรอบเดียว แล้วเลื่อน 1 แท่ง (เทียบกับกรอบของแท่งก่อนหน้า)
+        nan_row = np.full((1, len(windows)), np.nan)
+        hh = np.vstack([nan_row, ENGINE.rolling_extrema(c, windows, "max")[:-1]])
+        ll = np.vstack([nan_row, ENGINE.rolling_extrema(c, windows, "min")[:-1]])
+        long_cnt += (c[:, None] > hh).sum(axis=1)
+        short_cnt += (c[:, None] < ll).sum(axis=1)
+    return long_cnt, short_cnt, ema_bias
+
+
+def decide_winner(long_cnt, short_cnt, ema_bias, min_votes: int) -> np.ndarray:
+    # ฝั่งชนะ: +1 / -1 / 0 (เสมอ → ema_bias) โดยต้องมีคะแนนฝั่งชนะ >= min_votes
+    long_cnt, short_cnt = np.asarray(long_cnt), np.asarray(short_cnt)
+    diff = long_cnt - short_cnt
+    win = np.where(diff > 0, 1, np.where(diff < 0, -1, np.asarray(ema_bias))).astype(np.int64)
+    win[(win == 1) & (long_cnt < min_votes)] = 0
+    win[(win == -1) & (short_cnt < min_votes)] = 0
+    return win
+
+
+def indicator_arrays(data, strats: list[str], atr_n: int = 20) -> dict[str, np.ndarray]:
+    """อาร์เรย์ต่อแท่งที่ไม่ขึ้นกับ vote/atr_mult/cooldown: ราคา, ATR (bfill), จำนวนโหวต, ema_bias"""
+    c, h, l = (np.ascontiguousarray(_values(data[k])) for k in ("close", "high", "low"))
+    cols = {"close": c, "high": h, "low": l}
+    atr = _bfill(ENGINE._rolling_mean(ENGINE._true_range(cols), atr_n, atr_n))
+    long_cnt, short_cnt, ema_bias = votes_counts(cols, strats)
+    return {"close": c, "high": h, "low": l, "atr": atr,
+            "long_cnt": long_cnt, "short_cnt": short_cnt, "ema_bias": ema_bias}
+
+
+def prepare(data, strats: list[str], atr_n: int = 20, vote: int = 1) -> dict[str, np.ndarray]:
+    """อาร์เรย์ที่ simulate() ใช้: indicator_arrays() + ฝั่งชนะตาม vote"""
+    arrays = indicator_arrays(data, strats, atr_n)
+    arrays["winner"] = decide_winner(arrays["long_cnt"], arrays["short_cnt"], arrays["ema_bias"], vote)
+    return arrays
+
+
+def simulate(arrays: dict[str, np.ndarray], atr_mult: float = 0.0, cooldown: int = 0) -> dict:
+    """
+    ลูป ATR stop / cooldown / flip ของ run_quick_backtest บนอาร์เรย์ (numba ถ้ามี)
+    คืนคอลัมน์ต่อแท่งของ out.txt + enters/exits; ไม้ที่ค้างปลายทางถูกปิดที่แท่งสุดท้าย
+    """
+    a = arrays
+    el, es, ex, pos, equity, enters, exits = quick_backtest_kernel(
+        a["close"], a["high"], a["low"], a["atr"], a["winner"], atr_mult, cooldown)
+    if len(pos) and pos[-1] != 0:
+        ex[-1] = 1
+        exits += 1
+    return {"enter_long": el, "enter_short": es, "exit_pos": ex, "pos": pos, "equity": equity,
+            "enters": enters, "exits": exits}
+
+
+def out_columns(arrays: dict[str, np.ndarray], res: dict) -> dict[str, np.ndarray]:
+    """คอลัมน์ต่อแท่งของผลรัน (OUT_COLUMNS ยกเว้น idx)"""
+    return {"close": arrays["close"],
+            "want_long": arrays["long_cnt"] > 0, "want_short": arrays["short_cnt"] > 0,
+            **{k: res[k] for k in ("enter_long", "enter_short", "exit_pos", "pos", "equity")}}
+
+
+def write_out_txt(path: Path, arrays: dict[str, np.ndarray], res: dict) -> int:
+    """เขียน out.txt เดิม (9 คอลัมน์ตาม OUT_COLUMNS) → จำนวนแถว"""
+    n = len(arrays["close"])
+    cols = out_columns(arrays, res)
+    rows = [range(n), cols["close"].tolist()]
+    rows += [np.asarray(cols[k]).astype(int).tolist() for k in OUT_COLUMNS[2:-1]]
+    rows.append(cols["equity"].tolist())
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(zip(*rows))
+    return n
+
+
+# ---------- API ในโปรเซส (แทน subprocess run_quick_backtest + out.txt + print_metrics) ----------
+@dataclass(frozen=True)
+class BacktestParams:
+    minutes: int = 60000
+    strats: str = "ema,turtle20,turtle55"
+    atr_n: int = 20
+    atr_mult: float = 0.0     # 0 = ปิดสต็อป
+    vote: int = 1
+    cooldown: int = 0         # แท่ง
+    # รับไว้ให้ตรงกับ CLI แต่ engine ยังไม่ใช้
+    session: str = "all"
+    max_layers: int = 1
+    pyr_step_atr: float = 1.0
+    symbol: str = "XAUUSD"
+
+    def replace(self, **kw) -> "BacktestParams":
+        return BacktestParams(**{**asdict(self), **kw})
+
+
+@dataclass
+class Metrics:
+    sharpe: float
+    maxdd: float      # หน่วยเดียวกับ equity (peak - equity สูงสุด)
+    trades: int
+
+    def as_text(self) -> str:
+        """ฟอร์แมตเดียวกับ backtests/print_metrics.py"""
+        return f"sharpe={self.sharpe:.6f}\nmaxdd={self.maxdd:.6f}\ntrades={self.trades}\n"
+
+
+@dataclass
+class BacktestResult:
+    params: BacktestParams
+    metrics: Metrics
+    bars: int
+    enters: int
+    exits: int
+    seconds: float
+    arrays: dict = field(repr=False, default_factory=dict)
+    columns: dict = field(repr=False, default_factory=dict)
+
+    def write_out_txt(self, path: Path) -> int:
+        return write_out_txt(path, self.arrays, self.columns)
+
+    def write_run(self, path: Path, compress: bool = False) -> Path:
+        """รันแบบไบนารี (core/runfile.py) + params / metrics ใน meta.json → path ที่เขียน"""
+        return write_run(path, out_columns(self.arrays, self.columns), compress=compress,
+                         params=asdict(self.params), metrics=asdict(self.metrics),
+                         enters=int(self.enters), exits=int(self.exits))
+
+    def summary(self, out: Path | str = "") -> str:
+        """บรรทัด [dbg] / [ok] แบบที่ run_quick_backtest พิมพ์"""
+        w = self.arrays["winner"]
+        equity = float(self.columns["equity"][-1]) if self.bars else 1.0
+        return (f"[dbg] bars={self.bars} any_signal={(w!=0).sum()} long_win={(w==1).sum()} short_win={(w==-1).sum()}\n"
+                f"[ok] bars={self.bars} enters={self.enters} exits={self.exits} equity={equity:.6f} -> {out}\n")
+
+
+def compute_metrics(equity: np.ndarray, trades: int) -> Metrics:
+    """Sharpe (รีเทิร์นต่อแท่ง, ann. M15) และ MaxDD จาก equity แบบเดียวกับ print_metrics.py"""
+    eq = np.asarray(equity, dtype=float)
+    return Metrics(sharpe(returns_from_equity(eq), ANN), max_drawdown(eq, relative=False), int(trades))
+
+
+def count_trades(enter_long, enter_short, exit_pos) -> int:
+    # จำนวนไม้ = จำนวนครั้งที่ปิด; ไม่มีเลย → นับจากการเปิดแทน
+    trades = int(np.sum(exit_pos))
+    return trades if trades else int(np.sum(enter_long) + np.sum(enter_short))
+
+
+def split_strats(strats: str) -> list[str]:
+    return [s.strip().lower() for s in strats.split(",") if s.strip()]
+
+
+def shared_inputs(data, params: BacktestParams) -> dict[str, np.ndarray]:
+    """indicator_arrays ของหน้าต่างตาม params → publish ครั้งเดียวให้ทุกเซลล์ที่ minutes/strats/atr_n เดียวกัน"""
+    if hasattr(data, "tail"):
+        data = data.tail(max(800, params.minutes // 15))
+    return indicator_arrays(data, split_strats(params.strats), params.atr_n)
+
+
+def load_data(path: Path | None = None) -> OHLCVStore:
+    """เปิดราคาครั้งเดียว (memmap) ไว้ให้ run_backtest ทุกเซลล์ของกริดใช้ร่วมกัน"""
+    path = Path(path or DATA)
+    if not path.exists():
+        raise FileNotFoundError(f"missing price file: {path}")
+    return OHLCVStore.open(path)
+
+
+def run_backtest(data, params: BacktestParams | None = None) -> BacktestResult:
+    """
+    run_quick_backtest + print_metrics ในโปรเซสเดียว ไม่มีไฟล์กลาง
+    data: OHLCVStore / DataFrame → ตัด max(800, minutes // 15) แท่งท้ายเหมือน CLI;
+          OHLCVWindow / dict ของอาร์เรย์ → ใช้ทั้งช่วงตามที่ส่งมา
+          dict จาก indicator_arrays() (มี "long_cnt") → ข้ามการคำนวณ indicator
+          (ผู้เรียกต้องสร้างด้วย strats/atr_n เดียวกับ params เช่นอาร์เรย์ใน shared memory ของ core/sweep.py)
+    """
+    params = params or BacktestParams()
+    t0 = time.perf_counter()
+    if hasattr(data, "tail"):
+        data = data.tail(max(800, params.minutes // 15))
+    if isinstance(data, dict) and "long_cnt" in data:
+        arrays = dict(data)
+        arrays["winner"] = decide_winner(data["long_cnt"], data["short_cnt"], data["ema_bias"], params.vote)
+    else:
+        arrays = prepare(data, split_strats(params.strats), atr_n=params.atr_n, vote=params.vote)
+    res = simulate(arrays, atr_mult=params.atr_mult, cooldown=params.cooldown)
+    trades = count_trades(res["enter_long"], res["enter_short"], res["exit_pos"])
+    return BacktestResult(
+        params=params, metrics=compute_metrics(res["equity"], trades), bars=len(arrays["close"]),
+        enters=res["enters"], exits=res["exits"], seconds=time.perf_counter() - t0,
+        arrays=arrays, columns=res,
+    )
+
+
+def run_batch(data, grid: list[BacktestParams]) -> list[BacktestResult]:
+    """
+    หลายชุด params ในการเรียกครั้งเดียว (minutes / strats / atr_n ต้องเหมือนกันทุกชุด):
+    indicator ครั้งเดียว, ฝั่งชนะครั้งเดียวต่อ vote, ลูป ATR stop / cooldown ของทุกชุดใน kernel เดียว
+    ผลต่อชุดเท่ากับ run_backtest(data, params) (seconds = เวลารวม / จำนวนชุด)
+    """
+    grid = list(grid)
+    if not grid:
+        return []
+    base = grid[0]
+    if any((p.minutes, p.strats, p.atr_n) != (base.minutes, base.strats, base.atr_n) for p in grid):
+        raise ValueError("run_batch needs the same minutes / strats / atr_n for every params")
+    t0 = time.perf_counter()
+    if isinstance(data, dict) and "long_cnt" in data:
+        shared = dict(data)
+    else:
+        shared = shared_inputs(data, base)
+    votes = sorted({p.vote for p in grid})
+    winners = np.column_stack([decide_winner(shared["long_cnt"], shared["short_cnt"], shared["ema_bias"], v)
+                               for v in votes])
+    *cols, counts = quick_backtest_batch_kernel(
+        shared["close"], shared["high"], shared["low"], shared["atr"], winners,
+        [votes.index(p.vote) for p in grid], [p.atr_mult for p in grid], [p.cooldown for p in grid])
+    el, es, ex, pos, equity = cols
+    secs = (time.perf_counter() - t0) / len(grid)
+    out = []
+    for j, p in enumerate(grid):
+        res = {"enter_long": el[:, j], "enter_short": es[:, j], "exit_pos": ex[:, j], "pos": pos[:, j],
+               "equity": equity[:, j], "enters": int(counts[j, 0]), "exits": int(counts[j, 1])}
+        if len(res["pos"]) and res["pos"][-1] != 0:
+            res["exit_pos"][-1] = 1
+            res["exits"] += 1
+        arrays = {**shared, "winner": winners[:, votes.index(p.vote)]}
+        trades = count_trades(res["enter_long"], res["enter_short"], res["exit_pos"])
+        out.append(BacktestResult(
+            params=p, metrics=compute_metrics(res["equity"], trades), bars=len(shared["close"]),
+            enters=res["enters"], exits=res["exits"], seconds=secs, arrays=arrays, columns=res))
+    return out
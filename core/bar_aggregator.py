@@ -0,0 +1,201 @@
+from __future__ import annotations
+import argparse
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import LOCAL_TZ
+
+NS_PER_MIN = 60 * 1_000_000_000
+OUT_COLS = ["time", "open", "high", "low", "close", "volume", "gap"]
+IN_COLS = {"time", "open", "high", "low", "close", "volume", "price", "last", "bid", "ask"}
+
+
+@dataclass
+class AggStats:
+    rows_in: int = 0
+    bars_out: int = 0
+    duplicates: int = 0     # เวลาเดียวกับแถวก่อนหน้า → ตัดทิ้ง (เก็บแถวแรก)
+    out_of_order: int = 0   # เวลาย้อนหลัง → ตัดทิ้ง
+    gaps: int = 0           # จำนวนครั้งที่มีแท่งขาดก่อนหน้า
+    max_gap: int = 0        # จำนวนแท่งที่ขาดมากสุดต่อครั้ง
+
+
+class BarAggregator:
+    """
+    รวม M1/tick → แท่ง tf นาที แบบ streaming (push ทีละก้อน, หน่วยความจำคงที่)
+    ขอบแท่งยึดเวลาท้องถิ่น LOCAL_TZ (เช่น H4/D1 เริ่มตามเวลา BKK) ไม่ใช่ UTC
+    แท่งสุดท้ายของแต่ละก้อนยังไม่ปิด → เก็บค้างไว้รวมกับก้อนถัดไป
+    """
+    def __init__(self, tf_minutes: int = 15, tz=LOCAL_TZ):
+        self.tf_ns = int(tf_minutes) * NS_PER_MIN
+        self.tz = tz
+        self.stats = AggStats()
+        self._last_t: int | None = None          # เวลาแถวดิบล่าสุดที่รับไว้
+        self._pending: list | None = None        # [bucket, o, h, l, c, v] แท่งที่ยังไม่ปิด
+        self._last_bucket: int | None = None     # แท่งล่าสุดที่ส่งออกไปแล้ว
+
+    def _wall(self, t_ns: np.ndarray) -> np.ndarray:
+        # UTC ns → เวลาท้องถิ่น (wall clock) ns
+        return pd.DatetimeIndex(t_ns.view("datetime64[ns]"), tz="UTC").tz_convert(self.tz).tz_localize(None).asi8
+
+    def _buckets(self, t_ns: np.ndarray) -> np.ndarray:
+        # floor ตามเวลาท้องถิ่น แล้วแปลงขอบกลับเป็น UTC ns ด้วย offset ของ "ขอบ" (ไม่ใช่ของแถว)
+        # → แท่ง H4/D1 ที่คร่อมการเปลี่ยน DST ไม่ถูกแยกเป็นสองแท่ง
+        # ลองใช้ offset ของแถวก่อน (ถูกเกือบทุกแท่ง รวมชั่วโมงที่ซ้ำตอนถอยนาฬิกา) แล้วแก้เฉพาะขอบที่อยู่อีกฝั่งของ DST
+        local_ns = self._wall(t_ns)
+        floor = local_ns - local_ns % self.tf_ns
+        b = floor - (local_ns - t_ns)
+        first = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+        bad = self._wall(b[first]) != floor[first]
+        if bad.any():
+            start = b[first]
+            start[bad] = (pd.DatetimeIndex(floor[first][bad].view("datetime64[ns]"))
+                          .tz_localize(self.tz, ambiguous=np.ones(int(bad.sum()), dtype=bool),
+                                       nonexistent="shift_forward")
+                          .tz_convert("UTC").as_unit("ns").asi8)
+            b = np.repeat(start, np.diff(np.r_[first, len(b)]))
+        return b
+
+    def push(self, t_ns, open_, high, low, close, volume) -> dict[str, np.ndarray]:
+        """รับแถวดิบ (เรียงเวลา) → คืนแท่งที่ปิดแล้ว (อาจว่าง)"""
+        t_ns = np.asarray(t_ns, dtype=np.int64)
+        n = len(t_ns)
+        self.stats.rows_in += n
+        if n == 0:
+            return self._empty()
+
+        # dedup / ตัดแถวย้อนเวลา เทียบกับค่าสูงสุดก่อนหน้า (รวมข้ามก้อน)
+        first = np.iinfo(np.int64).min if self._last_t is None else self._last_t
+        prev_max = np.maximum.accumulate(np.r_[first, t_ns[:-1]])
+        keep = t_ns > prev_max
+        self.stats.duplicates += int(np.count_nonzero(t_ns == prev_max))
+        self.stats.out_of_order += int(np.count_nonzero(t_ns < prev_max))
+        self._last_t = int(max(first, t_ns.max()))
+        if not keep.all():
+            t_ns = t_ns[keep]
+            open_, high, low, close, volume = (np.asarray(x)[keep] for x in (open_, high, low, close, volume))
+        if len(t_ns) == 0:
+            return self._empty()
+
+        b = self._buckets(t_ns)
+        starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+        ends = np.r_[starts[1:], len(b)] - 1
+        bucket = b[starts]
+        o = np.asarray(open_, dtype=float)[starts]
+        h = np.maximum.reduceat(np.asarray(high, dtype=float), starts)
+        l = np.minimum.reduceat(np.asarray(low, dtype=float), starts)
+        c = np.asarray(close, dtype=float)[ends]
+        v = np.add.reduceat(np.asarray(volume), starts)      # dtype ตาม input (tick count = int)
+
+        # รวมกับแท่งค้างจากก้อนก่อน
+        if self._pending is not None:
+            pb, po, ph, pl, pc, pv = self._pending
+            if bucket[0] == pb:
+                o[0] = po; h[0] = max(h[0], ph); l[0] = min(l[0], pl); v[0] += pv
+            else:
+                bucket, o, h, l, c, v = (np.r_[pb, bucket], np.r_[po, o], np.r_[ph, h],
+                                         np.r_[pl, l], np.r_[pc, c], np.r_[pv, v])
+        self._pending = [int(bucket[-1]), o[-1], h[-1], l[-1], c[-1], v[-1]]
+        return self._emit(bucket[:-1], o[:-1], h[:-1], l[:-1], c[:-1], v[:-1])
+
+    def flush(self) -> dict[str, np.ndarray]:
+        """ปิดแท่งค้างสุดท้าย (เรียกตอนจบไฟล์)"""
+        if self._pending is None:
+            return self._empty()
+        pb, po, ph, pl, pc, pv = self._pending
+        self._pending = None
+        return self._emit(np.array([pb]), np.array([po]), np.array([ph]),
+                          np.array([pl]), np.array([pc]), np.array([pv]))
+
+    def _emit(self, bucket, o, h, l, c, v) -> dict[str, np.ndarray]:
+        if len(bucket) == 0:
+            return self._empty()
+        prev = bucket[0] - self.tf_ns if self._last_bucket is None else self._last_bucket
+        gap = (np.diff(bucket, prepend=prev) // self.tf_ns - 1).astype(np.int64)
+        self._last_bucket = int(bucket[-1])
+        self.stats.bars_out += len(bucket)
+        self.stats.gaps += int(np.count_nonzero(gap > 0))
+        self.stats.max_gap = max(self.stats.max_gap, int(gap.max()))
+        return {"time": bucket, "open": o, "high": h, "low": l, "close": c, "volume": v, "gap": gap}
+
+    @staticmethod
+    def _empty() -> dict[str, np.ndarray]:
+        return {k: np.empty(0, dtype=np.int64 if k in ("time", "gap") else float) for k in OUT_COLS}
+
+
+def _price_columns(df: pd.DataFrame):
+    """M1 (open/high/low/close) หรือ tick (price/last/bid+ask) → (o, h, l, c, v)"""
+    if {"open", "high", "low", "close"}.issubset(df.columns):
+        o, h, l, c = (df[k].to_numpy(dtype=float) for k in ("open", "high", "low", "close"))
+    else:
+        if "price" in df.columns:
+            p = df["price"].to_numpy(dtype=float)
+        elif "last" in df.columns:
+            p = df["last"].to_numpy(dtype=float)
+        elif {"bid", "ask"}.issubset(df.columns):
+            p = (df["bid"].to_numpy(dtype=float) + df["ask"].to_numpy(dtype=float)) * 0.5
+        else:
+            raise ValueError(f"cannot find price columns in {list(df.columns)}")
+        o = h = l = c = p
+    if "volume" in df.columns:
+        v = df["volume"].fillna(0).to_numpy()
+    else:
+        v = np.ones(len(df), dtype=np.int64)  # tick ไม่มี volume → นับจำนวน tick
+    return o, h, l, c, v
+
+
+def _write_bars(f, bars: dict[str, np.ndarray], header: bool):
+    if len(bars["time"]) == 0:
+        return
+    out = pd.DataFrame(bars)
+    # เขียนเป็น UTC พร้อม offset (format ด้วย numpy เร็วกว่า to_csv ของคอลัมน์ tz-aware มาก)
+    iso = np.datetime_as_string(bars["time"].view("datetime64[ns]"), unit="s")
+    out["time"] = np.char.add(np.char.replace(iso, "T", " "), "+00:00")
+    out.to_csv(f, index=False, header=header)
+
+
+def aggregate_csv(src: Path, dst: Path, tf_minutes: int = 15, chunk_rows: int = 1_000_000,
+                  tz=LOCAL_TZ) -> AggStats:
+    """
+    อ่านไฟล์ดิบทีละ chunk_rows แถว → เขียนแท่ง tf นาทีต่อท้าย dst ทันที (ไฟล์หลาย GB ก็ใช้หน่วยความจำคงที่)
+    เวลาที่ไม่มี timezone ถือเป็น UTC (แบบเดียวกับ core.data_loader._ensure_bkk)
+    """
+    agg = BarAggregator(tf_minutes, tz)
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    header = True
+    with open(dst, "w", encoding="utf-8", newline="") as f:
+        reader = pd.read_csv(src, chunksize=chunk_rows,
+                             usecols=lambda c: str(c).strip().lower() in IN_COLS)
+        for chunk in reader:
+            chunk.columns = [str(c).strip().lower() for c in chunk.columns]
+            t = pd.DatetimeIndex(pd.to_datetime(chunk["time"], utc=True)).as_unit("ns").asi8
+            bars = agg.push(t, *_price_columns(chunk))
+            _write_bars(f, bars, header)
+            header = header and len(bars["time"]) == 0
+        _write_bars(f, agg.flush(), header)
+    return agg.stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="stream raw M1/tick CSV → clean OHLCV bars")
+    ap.add_argument("src")
+    ap.add_argument("dst")
+    ap.add_argument("--tf", type=int, default=15, help="นาทีต่อแท่ง")
+    ap.add_argument("--chunk_rows", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    stats = aggregate_csv(Path(args.src), Path(args.dst), args.tf, args.chunk_rows)
+    dt = time.perf_counter() - t0
+    mb = Path(args.src).stat().st_size / 1e6
+    print(f"[ok] {args.src} -> {args.dst}  {dt:.2f}s  {mb / max(dt, 1e-9):.1f} MB/s")
+    print("     " + "  ".join(f"{k}={v}" for k, v in asdict(stats).items()))
+
+
+if __name__ == "__main__":
+    main()
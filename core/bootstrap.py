@@ -0,0 +1,188 @@
+from __future__ import annotations
+import argparse
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from core.backtest import ANN, compute_metrics
+from core.metrics import BARS_PER_DAY, returns_from_equity
+from core.runfile import open_run
+
+METRICS = ("sharpe", "maxdd", "trades_per_day")
+
+
+def trade_marks(enter_long, enter_short, exit_pos) -> np.ndarray:
+    """ตัวชี้ต่อแท่งว่ามีไม้จบ (นับแบบ count_trades: ไม่มีการปิดเลย → นับการเปิดแทน)"""
+    ex = np.asarray(exit_pos, dtype=np.int64)
+    return ex if ex.sum() else np.asarray(enter_long, dtype=np.int64) + np.asarray(enter_short, dtype=np.int64)
+
+
+@dataclass
+class BootstrapResult:
+    method: str
+    paths: int
+    block: int
+    seconds: float
+    point: dict                                       # sharpe / maxdd / trades_per_day ของ backtest จริง
+    sharpe: np.ndarray = field(repr=False)
+    maxdd: np.ndarray = field(repr=False)
+    trades_per_day: np.ndarray = field(repr=False)
+
+    def percentile(self, metric: str, q: float) -> float:
+        return float(np.percentile(getattr(self, metric), q))
+
+    def ci(self, metric: str, level: float = 0.90) -> tuple[float, float]:
+        a = (1.0 - level) / 2.0 * 100.0
+        return self.percentile(metric, a), self.percentile(metric, 100.0 - a)
+
+    def summary(self, qs=(5, 50, 95)) -> dict:
+        return {f"{m}_p{q:g}": self.percentile(m, q) for m in METRICS for q in qs}
+
+    def as_text(self, qs=(5, 50, 95)) -> str:
+        """บรรทัด key=value ต่อจาก metrics.txt ได้ (enforce_gate อ่านแบบเดียวกัน)"""
+        lines = [f"bootstrap={self.method} paths={self.paths} block={self.block}"]
+        lines += [f"{k}={v:.6f}" for k, v in self.summary(qs).items()]
+        return "\n".join(lines) + "\n"
+
+
+def _window_stats(lg0: np.ndarray, starts: np.ndarray, length: int, chunk: int = 8192) -> np.ndarray:
+    """
+    สถิติของช่วงยาว `length` ที่เริ่มแต่ละ starts (lg0 = log equity สะสม เริ่ม 0):
+    คอลัมน์ = [G (โตทั้งช่วง), gmin, gmax, inner (max ของ runmax(g) - g)] เทียบ equity ตอนเข้าช่วง = 1
+    """
+    out = np.empty((len(starts), 4))
+    win = sliding_window_view(lg0[1:], length)
+    for i in range(0, len(starts), chunk):
+        s = starts[i:i + chunk]
+        w = win[s] - lg0[s][:, None]
+        out[i:i + chunk, 0] = np.exp(w[:, -1])
+        out[i:i + chunk, 1] = np.exp(w.min(axis=1))
+        out[i:i + chunk, 2] = np.exp(w.max(axis=1))
+        out[i:i + chunk, 3] = (np.exp(np.maximum.accumulate(w, axis=1)) - np.exp(w)).max(axis=1)
+    return out
+
+
+def _trade_segments(marks_r: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # ช่วงของแต่ละไม้ = รีเทิร์นหลังไม้ก่อนจบ ถึงแท่งที่ไม้นี้จบ (ช่วงว่างก่อนเข้าไม้ติดไปกับไม้นั้น); เศษท้ายเป็นช่วงสุดท้าย
+    m = len(marks_r)
+    ends = np.flatnonzero(marks_r) + 1
+    bounds = np.unique(np.r_[0, ends, m])
+    return bounds[:-1], np.diff(bounds)
+
+
+def _paths_maxdd(stats: list[np.ndarray], seg: np.ndarray, eq0: float) -> np.ndarray:
+    """
+    MaxDD (peak - equity) ของแต่ละ path จากสถิติรายช่วง ไม่ต้องเดินทีละแท่ง:
+    เข้าช่วงด้วย equity E และ peak P → dd ในช่วง = max(P - E*gmin, E*inner), peak ใหม่ = max(P, E*gmax)
+    stats[k] = ตารางของช่วงลำดับที่ k (ใช้ตัวสุดท้ายซ้ำถ้ามีน้อยกว่า), seg = (paths × ช่วง) ดัชนีในตาราง
+    """
+    n = seg.shape[0]
+    eq = np.full(n, eq0)
+    peak = np.full(n, eq0)
+    dd = np.zeros(n)
+    for k in range(seg.shape[1]):
+        st = stats[min(k, len(stats) - 1)][seg[:, k]]
+        np.maximum(dd, np.maximum(peak - eq * st[:, 1], eq * st[:, 3]), out=dd)
+        np.maximum(peak, eq * st[:, 2], out=peak)
+        eq *= st[:, 0]
+    return dd
+
+
+def bootstrap(equity: np.ndarray, marks: np.ndarray | None = None, method: str = "block", paths: int = 10_000,
+              block: int = BARS_PER_DAY, seed: int = 0, mem_mb: int = 256,
+              bars_per_day: int = BARS_PER_DAY) -> BootstrapResult:
+    """
+    สุ่ม `paths` เส้นจากรีเทิร์นต่อแท่งของ backtest → การกระจายของ Sharpe / MaxDD / trades/day
+      block  = circular block bootstrap (บล็อกยาว `block` แท่ง เก็บ autocorrelation ภายในบล็อก)
+      trades = สลับลำดับไม้ (ช่วงรีเทิร์นของแต่ละไม้) → Sharpe/trades เท่าเดิม วัดความเสี่ยงของลำดับต่อ MaxDD
+    ทุก path เป็นลำดับของช่วงรีเทิร์น → Sharpe / trades จากผลรวมสะสม, MaxDD จากสถิติรายช่วงที่คำนวณครั้งเดียว
+    งานต่อ path = จำนวนช่วง ไม่ใช่จำนวนแท่ง; path แบ่งเป็นก้อนละไม่เกิน mem_mb; seed เดิม → ผลเดิม
+    """
+    eq = np.asarray(equity, dtype=float)
+    r = returns_from_equity(eq)
+    m = len(r)
+    if m < 2:
+        raise ValueError("need at least 3 equity points to resample")
+    if np.any(r <= -1.0):
+        raise ValueError("equity hits zero or below; returns cannot be compounded")
+    marks = np.zeros(len(eq), dtype=np.int64) if marks is None else np.asarray(marks, dtype=np.int64)
+    marks_r = marks[1:]                                # ไม้ที่จบที่แท่ง t ↔ รีเทิร์นเข้าแท่ง t (r[t-1])
+    days = max(m / bars_per_day, 1e-9)
+    trades = int(marks.sum())
+    pm = compute_metrics(eq, trades)
+    point = {"sharpe": pm.sharpe, "maxdd": pm.maxdd, "trades_per_day": trades / days}
+
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    if method == "block":
+        block = int(max(1, min(block, m)))
+        k = -(-m // block)
+        last = m - block * (k - 1)                     # บล็อกท้ายตัดให้ path ยาว m พอดี
+        ext = np.r_[r, r[:block]]                      # ต่อหัวไว้ท้าย → บล็อกที่วนกลับต้นอาร์เรย์
+        ext_marks = np.r_[marks_r, marks_r[:block]]
+        lg0 = np.r_[0.0, np.cumsum(np.log1p(ext))]
+        full = _window_stats(lg0, np.arange(m), block)
+        stats = [full] * (k - 1) + [full if last == block else _window_stats(lg0, np.arange(m), last)]
+        lens = np.full(k, block, dtype=np.int64)
+        lens[-1] = last
+        cs1 = np.r_[0.0, np.cumsum(ext)]
+        cs2 = np.r_[0.0, np.cumsum(ext * ext)]
+        csm = np.r_[0, np.cumsum(ext_marks)]
+    elif method == "trades":
+        seg_start, seg_len = _trade_segments(marks_r)
+        lg0 = np.r_[0.0, np.cumsum(np.log1p(r))]
+        stats = [np.array([_window_stats(lg0, np.array([s]), int(n))[0] for s, n in zip(seg_start, seg_len)])]
+        k = len(seg_start)
+    else:
+        raise ValueError(f"unknown bootstrap method: {method}")
+
+    chunk = int(max(1, min(paths, mem_mb * 2**20 // (k * 8 * 4))))
+    sharpe, maxdd, tpd = (np.empty(paths) for _ in range(3))
+    for p0 in range(0, paths, chunk):
+        c = min(chunk, paths - p0)
+        sl = slice(p0, p0 + c)
+        if method == "block":
+            seg = rng.integers(0, m, size=(c, k))
+            s1 = (cs1[seg + lens] - cs1[seg]).sum(axis=1)
+            s2 = (cs2[seg + lens] - cs2[seg]).sum(axis=1)
+            mean = s1 / m
+            sd = np.sqrt(np.maximum(s2 / m - mean * mean, 0.0))
+            sharpe[sl] = np.divide(mean, sd, out=np.zeros(c), where=sd > 0) * ANN
+            tpd[sl] = (csm[seg + lens] - csm[seg]).sum(axis=1) / days
+        else:
+            # สลับลำดับอย่างเดียว: ชุดรีเทิร์น/จำนวนไม้เท่าเดิม → Sharpe / trades/day = ค่าจริง
+            seg = rng.permuted(np.broadcast_to(np.arange(k), (c, k)), axis=1)
+            sharpe[sl], tpd[sl] = point["sharpe"], point["trades_per_day"]
+        maxdd[sl] = _paths_maxdd(stats, seg, float(eq[0]))
+    return BootstrapResult(method, paths, block if method == "block" else 0, time.perf_counter() - t0,
+                           point, sharpe, maxdd, tpd)
+
+
+def read_run(path: Path) -> tuple[np.ndarray, np.ndarray]:
+    """ผลรัน (out.run / .run.npz / out.txt เดิม — core.runfile.open_run) → (equity, ตัวชี้ไม้จบต่อแท่ง)"""
+    run = open_run(path)
+    return (np.asarray(run["equity"], dtype=float),
+            trade_marks(run["enter_long"], run["enter_short"], run["exit_pos"]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="bootstrap confidence intervals of a backtest run (out.run / out.txt)")
+    ap.add_argument("run")
+    ap.add_argument("--method", choices=["block", "trades"], default="block")
+    ap.add_argument("--paths", type=int, default=10_000)
+    ap.add_argument("--block", type=int, default=BARS_PER_DAY, help="ความยาวบล็อก (แท่ง)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--pcts", default="5,50,95")
+    args = ap.parse_args()
+
+    equity, marks = read_run(Path(args.run))
+    res = bootstrap(equity, marks, args.method, args.paths, args.block, args.seed)
+    print(res.as_text(tuple(float(q) for q in args.pcts.split(","))), end="")
+    print(f"[i] bars={len(equity)} point={ {k: round(v, 6) for k, v in res.point.items()} } {res.seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,8 @@ from datetime import datetime, timedelta
 import numpy as np
 import pandas as pd
 
-from config import DATA_FILE, LOCAL_TZ
+from config import DATA_FILE, LOCAL_TZ, PRICE_CACHE
+from core import price_cache
 
 REQUIRED_COLS = ["time", "open", "high", "low", "close", "volume"]
 
@@ -31,10 +32,8 @@ def _make_demo_data(n_days: int = 14, start_close: float = 2400.0, mu: float = 0
     # สร้าง close ด้วย GBM
     rng = np.random.default_rng(1234)
     rets = rng.normal(loc=mu / (96), scale=sigma / np.sqrt(96), size=n)  # 96 แท่ง/วัน
-    close = np.empty(n)
-    close[0] = start_close
-    for i in range(1, n):
-        close[i] = close[i-1] * (1.0 + rets[i])
+    # cumprod = close[i-1] * (1 + rets[i]) เรียงลำดับเดิม → ผลตรงกับลูปทุกบิต
+    close = np.cumprod(np.r_[start_close, 1.0 + rets[1:]])
     # สร้าง OHLC คร่าว ๆ รอบ close
     spread = np.maximum(close * 0.0008, 0.1)  # ~8 bps
     open_  = np.roll(close, 1); open_[0] = close[0]
@@ -53,21 +52,99 @@ def _make_demo_data(n_days: int = 14, start_close: float = 2400.0, mu: float = 0
     df["range"] = (df["high"] - df["low"]).abs()
     return df
 
-def load_price_csv(path: Path | None = None) -> pd.DataFrame:
+def _finish_frame(df: pd.DataFrame, src: Path | str = "") -> pd.DataFrame:
+    """เช็คคอลัมน์ + แปลงเวลาเป็น BKK + คอลัมน์ range (ใช้ทั้งตอนโหลดเต็มและตอนอ่านแถวต่อท้าย)"""
+    missing = [c for c in REQUIRED_COLS if c not in df.columns]
+    if missing:
+        raise ValueError(f"CSV missing columns: {missing} :: {src}")
+    df["time"] = _ensure_bkk(df["time"])
+    df["range"] = (df["high"] - df["low"]).abs()
+    return df
+
+def parse_price_csv(csv_path: Path) -> pd.DataFrame:
+    """อ่าน + แปลงเวลาเป็น BKK + sort จาก CSV ตรง ๆ (ไม่ผ่านแคช)"""
+    df = _finish_frame(pd.read_csv(csv_path), csv_path)
+    return df.sort_values("time").reset_index(drop=True)
+
+def load_price_csv(path: Path | None = None, use_cache: bool = PRICE_CACHE) -> pd.DataFrame:
     """
     พยายามอ่าน CSV จริงตาม DATA_FILE; ถ้าไม่พบ ให้สร้างเดโมดาต้าอัตโนมัติ (กัน CI ล้ม)
+    use_cache=True: ใช้แคชไบนารี (core/price_cache.py) ถ้ายังสด, ไม่งั้น parse แล้วเขียนแคชใหม่
     """
     csv_path = Path(path or DATA_FILE)
     if csv_path.exists():
-        df = pd.read_csv(csv_path)
-        missing = [c for c in REQUIRED_COLS if c not in df.columns]
-        if missing:
-            raise ValueError(f"CSV missing columns: {missing} :: {csv_path}")
-        df["time"] = _ensure_bkk(df["time"])
-        df = df.sort_values("time").reset_index(drop=True)
-        df["range"] = (df["high"] - df["low"]).abs()
+        if not use_cache:
+            return parse_price_csv(csv_path)
+        df = price_cache.load_cached(csv_path)
+        if df is not None:
+            return df
+        # CSV โตขึ้นแบบต่อท้าย → parse เฉพาะแถวใหม่แล้ว append เข้าแคช
+        if price_cache.update_cache(csv_path, _finish_frame) is not None:
+            df = price_cache.load_cached(csv_path)
+            if df is not None:
+                return df
+        fp = price_cache.file_fingerprint(csv_path)  # ก่อน parse กันไฟล์โตระหว่างอ่าน
+        df = parse_price_csv(csv_path)
+        price_cache.write_cache(csv_path, df, fp)
         return df
 
     # Fallback: demo data
     df = _make_demo_data()
     return df
+
+
+class PriceFeed:
+    """
+    ตัวโหลดราคาแบบต่อเนื่อง: โหลดเต็มครั้งแรก แล้ว refresh() parse เฉพาะแถวที่ต่อท้ายไฟล์
+    (จำ byte offset + เวลาแถวท้ายไว้ในหน่วยความจำ) → ต้นทุนต่อบาร์ O(แถวใหม่) แทน O(ประวัติทั้งหมด)
+    ถ้าไฟล์ถูกแก้ส่วนต้น/เวลาไม่เรียงต่อจากแถวท้าย → โหลดใหม่ทั้งไฟล์อัตโนมัติ
+    """
+    def __init__(self, path: Path | None = None, use_cache: bool = PRICE_CACHE):
+        self.path = Path(path or DATA_FILE)
+        self.use_cache = use_cache
+        self.df = pd.DataFrame()
+        self._source: dict | None = None
+        self._names: list[str] = []
+        self.reload()
+
+    def reload(self) -> pd.DataFrame:
+        if self.path.exists():
+            self._source = price_cache.file_fingerprint(self.path)
+            self._names = list(pd.read_csv(self.path, nrows=0).columns)
+        else:
+            self._source = None
+        self.df = load_price_csv(self.path, use_cache=self.use_cache)
+        return self.df
+
+    def _last_time_ns(self) -> int | None:
+        if self.df.empty:
+            return None
+        return int(self.df["time"].iloc[-1].tz_convert("UTC").as_unit("ns").value)
+
+    def refresh(self) -> int:
+        """อ่านแถวใหม่ท้ายไฟล์; คืนจำนวนแถวที่เพิ่ม (โหลดใหม่ทั้งไฟล์ → คืนจำนวนแถวทั้งหมด)"""
+        if self._source is None:
+            if not self.path.exists():
+                return 0
+            return len(self.reload())
+        try:
+            got = price_cache.read_appended(self.path, self._source, self._names)
+        except (OSError, ValueError):
+            got = None
+        if got is None:
+            return len(self.reload())
+        raw, source = got
+        if source == self._source:
+            return 0
+        new = _finish_frame(raw, self.path) if len(raw) else raw
+        if len(new):
+            t_ns = new["time"].dt.tz_convert("UTC").dt.tz_localize(None).to_numpy().astype("datetime64[ns]").view("i8")
+            if not price_cache.is_ordered_after(self._last_time_ns(), t_ns):
+                return len(self.reload())
+        if self.use_cache:
+            price_cache.append_rows(self.path, new, self._source, source)
+        self._source = source
+        if len(new):
+            new.index = pd.RangeIndex(len(self.df), len(self.df) + len(new))
+            self.df = pd.concat([self.df, new[self.df.columns]])
+        return len(new)
@@ -9,14 +9,34 @@ from .spike_filter import spike_flag
 
 # พยายามใช้ indicators ของโปรเจกต์ ถ้าไม่มีให้ทำแบบง่ายในไฟล์นี้
 try:
-    from .indicators import ema  # type: ignore
+    from .indicators import ENGINE, ema  # type: ignore
 except Exception:
+    ENGINE = None
     def ema(s: pd.Series, n: int) -> pd.Series:
         return s.ewm(span=n, adjust=False).mean()
 
 
+def _turtle_breakouts(df: pd.DataFrame, windows: list[int]) -> list[pd.Series]:
+    """
+    _turtle_breakout ของหลายหน้าต่างพร้อมกัน: High/Low ทุก n คำนวณในรอบเดียว (sparse table)
+    +1 เมื่อราคาปิดทะลุ High(n) ของแท่งก่อนหน้า / -1 เมื่อหลุด Low(n) / 0 อื่น ๆ
+    """
+    if ENGINE is None:
+        return [_turtle_breakout(df, n) for n in windows]
+    hi = ENGINE.rolling_extrema(df["high"], windows, "max", min_periods=1)
+    lo = ENGINE.rolling_extrema(df["low"], windows, "min", min_periods=1)
+    c = df["close"].to_numpy(dtype=float)[:, None]
+    nan_row = np.full((1, len(windows)), np.nan)
+    up = c > np.vstack([nan_row, hi[:-1]])
+    dn = c < np.vstack([nan_row, lo[:-1]])
+    sig = up.astype(np.int64) - dn
+    return [pd.Series(sig[:, j], index=df.index) for j in range(len(windows))]
+
+
 def _turtle_breakout(df: pd.DataFrame, n: int) -> pd.Series:
     """+1 เมื่อราคาปิดทะลุ High(n) / -1 เมื่อราคาปิดหลุด Low(n) / 0 อื่น ๆ"""
+    if ENGINE is not None:
+        return _turtle_breakouts(df, [n])[0]
     hi = df["high"].rolling(n, min_periods=1).max()
     lo = df["low"].rolling(n, min_periods=1).min()
     c = df["close"]
@@ -34,12 +54,66 @@ def _ema_cross(df: pd.DataFrame, fast: int = 20, slow: int = 55) -> pd.Series:
     return pd.Series(sig, index=df.index, dtype=float)
 
 
-def _majority_vote(signals: Iterable[pd.Series], vote: int) -> pd.Series:
-    # รวมคะแนน แล้ว threshold ตาม vote
-    sig_mat = np.column_stack([s.fillna(0).values for s in signals])
-    score = sig_mat.sum(axis=1)
-    out = np.where(score >= vote, 1, np.where(score <= -vote, -1, 0))
-    return pd.Series(out, index=signals.__iter__().__next__().index, dtype=float)
+def _strategy_score(df: pd.DataFrame, strats: str) -> np.ndarray | None:
+    """ผลรวมคะแนน (-k..k) ของกลยุทธ์ที่เลือก หรือ None ถ้าไม่ได้เลือกอะไร"""
+    s_names = [x.strip().lower() for x in strats.split(",") if x.strip()]
+    sigs: list[pd.Series] = []
+
+    if "ema" in s_names:
+        sigs.append(_ema_cross(df, 20, 55))
+    windows = [n for n, name in ((20, "turtle20"), (55, "turtle55")) if name in s_names]
+    if windows:
+        sigs.extend(_turtle_breakouts(df, windows))
+
+    if not sigs:
+        return None
+    score = np.zeros(len(df), dtype=np.int64)
+    for sig in sigs:
+        score += sig.fillna(0).to_numpy().astype(np.int64)
+    return score
+
+
+def _apply_cooldowns(raw: np.ndarray, cooldowns: list[int]) -> np.ndarray:
+    """
+    cooldown ของ combined_signal แบบไม่มีลูปรายแท่ง: จุด "เปลี่ยนฝั่ง" (ค่าไม่ใช่ 0 ที่เครื่องหมายต่างจากค่าไม่ใช่ 0 ก่อนหน้า)
+    ไม่ขึ้นกับ cooldown → หาไว้ครั้งเดียว แล้วแท่งที่ห่างจุดล่าสุด <= cd ถือค่าของจุดนั้น
+    """
+    n = len(raw)
+    nz = np.flatnonzero(raw)
+    flips = nz[raw[nz] != np.r_[0, raw[nz][:-1]]]
+    last = np.full(n, -1, dtype=np.int64)
+    last[flips] = flips
+    last = np.maximum.accumulate(last) if n else last
+    age = np.arange(n) - last
+    held = raw[np.maximum(last, 0)]
+    out = np.empty((n, len(cooldowns)), dtype=np.int8)
+    for j, cd in enumerate(cooldowns):
+        out[:, j] = np.where((last >= 0) & (age <= cd), held, raw) if cd and cd > 0 else raw
+    return out
+
+
+def combined_signal_matrix(
+    df: pd.DataFrame,
+    strats: str = "ema,turtle20,turtle55",
+    votes: Iterable[int] = (1,),
+    cooldowns: Iterable[int] = (0,),
+) -> np.ndarray:
+    """
+    combined_signal ของทุกคู่ (vote, cooldown) ในครั้งเดียว → int8 (bars × len(votes)*len(cooldowns))
+    ลำดับคอลัมน์ = itertools.product(votes, cooldowns); คะแนนกลยุทธ์และ spike mask คำนวณครั้งเดียว
+    """
+    votes, cooldowns = [max(1, int(v)) for v in votes], [int(c) for c in cooldowns]
+    out = np.zeros((len(df), len(votes) * len(cooldowns)), dtype=np.int8)
+    score = _strategy_score(df, strats)
+    if score is None:
+        return out
+    for i, v in enumerate(votes):
+        raw = np.where(score >= v, 1, np.where(score <= -v, -1, 0)).astype(np.int8)
+        out[:, i * len(cooldowns):(i + 1) * len(cooldowns)] = _apply_cooldowns(raw, cooldowns)
+
+    # spike mask: ถ้า spike ให้เป็น 0
+    out[spike_flag(df, n=14, k=3.0).to_numpy() != 0] = 0
+    return out
 
 
 def combined_signal(
@@ -58,42 +132,9 @@ def combined_signal(
       - turtle20     : breakout 20
       - turtle55     : breakout 55
     จากนั้นทำ majority vote ด้วย 'vote'
+    cooldown: บังคับให้คง signal เดิมไว้ n บาร์หลังเปลี่ยนสถานะ
     และ mask spikes ด้วย spike_flag
+    (คอลัมน์เดียวของ combined_signal_matrix)
     """
-    s_names = [x.strip().lower() for x in strats.split(",") if x.strip()]
-    sigs: list[pd.Series] = []
-
-    if "ema" in s_names:
-        sigs.append(_ema_cross(df, 20, 55))
-    if "turtle20" in s_names:
-        sigs.append(_turtle_breakout(df, 20))
-    if "turtle55" in s_names:
-        sigs.append(_turtle_breakout(df, 55))
-
-    if not sigs:
-        # ถ้าไม่เลือกอะไรเลย ให้ถือศูนย์ทั้งเส้น
-        base = pd.Series(0.0, index=df.index)
-        return base
-
-    sig = _majority_vote(sigs, max(1, vote))
-
-    # cooldown: บังคับให้คง signal เดิมไว้ n บาร์หลังเปลี่ยนสถานะ
-    if cooldown and cooldown > 0:
-        last = 0.0
-        hold = 0
-        buf = []
-        for v in sig.values:
-            if v != 0 and np.sign(v) != np.sign(last):
-                last = v
-                hold = cooldown
-            elif hold > 0:
-                v = last
-                hold -= 1
-            buf.append(v)
-        sig = pd.Series(buf, index=sig.index, dtype=float)
-
-    # spike mask: ถ้า spike ให้เป็น 0
-    mask = spike_flag(df, n=14, k=3.0)
-    sig = sig.where(mask == 0, 0.0)
-
-    return sig.astype(float).fillna(0.0)
+    sig = combined_signal_matrix(df, strats, (vote,), (cooldown,))[:, 0]
+    return pd.Series(sig, index=df.index, dtype=float)
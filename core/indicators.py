@@ -1,25 +1,322 @@
 from __future__ import annotations
+from collections import OrderedDict
+from typing import Callable
+
 import numpy as np
 import pandas as pd
 
+from config import INDICATOR_CACHE_MB, INDICATOR_CACHE_SIZE
+from core import kernels
+from core.kernels import ema_kernel, rma_kernel
+
+_SAMPLE = 1024  # จำนวนจุดที่สุ่มมา checksum ต่ออาร์เรย์
+
+
+def _values(x) -> np.ndarray:
+    """Series/array → float ndarray (Series ที่เป็น float อยู่แล้วได้ view เดิม ไม่ copy)"""
+    if isinstance(x, pd.Series):
+        return x.to_numpy(dtype=float, copy=False)
+    return np.asarray(x, dtype=float)
+
+
+def _fingerprint(a: np.ndarray) -> tuple:
+    # ตัวตน (pointer/shape/strides/dtype) + checksum จากจุดตัวอย่าง กันกรณีถูกแก้ค่าในที่เดิม
+    # memo ถืออ้างอิงอาร์เรย์ต้นทางไว้ → pointer จะไม่ถูกนำกลับมาใช้ซ้ำระหว่างที่ยังอยู่ใน cache
+    # (แก้ค่าในที่เฉพาะจุดที่ไม่ได้สุ่มมาจะตรวจไม่เจอ → เรียก ENGINE.clear() เอง)
+    n = a.shape[0] if a.ndim else 0
+    step = max(1, n // _SAMPLE)
+    sample = a[::step].tobytes() + a[-16:].tobytes() if n else b""
+    return (a.__array_interface__["data"][0], a.shape, a.strides, a.dtype.str, hash(sample))
+
+
+
+# ---------- rolling max/min หลายหน้าต่างพร้อมกัน (sparse table) ----------
+def _sparse_levels(x: np.ndarray, op, max_window: int) -> list[np.ndarray]:
+    # levels[k][i] = op ของ x[i-2^k+1 .. i] (ช่วงต้นที่ไม่ครบใช้เท่าที่มี); op = fmax/fmin → ข้าม NaN
+    levels = [x]
+    span = 1
+    while span * 2 <= max_window:
+        prev = levels[-1]
+        nxt = prev.copy()
+        nxt[span:] = op(prev[span:], prev[:-span])
+        levels.append(nxt)
+        span *= 2
+    return levels
+
+
+def rolling_extrema(x, windows, how: str = "max", min_periods: int | None = None) -> np.ndarray:
+    """
+    rolling(w).max()/min() ของทุก w ใน windows → อาร์เรย์ (bars × len(windows))
+    สร้าง sparse table ครั้งเดียว O(n log W) แล้วแต่ละหน้าต่างเป็น op ของสองช่วงที่ทับกัน O(n)
+    ผลตรงกับ pandas (ข้าม NaN, min_periods นับเฉพาะค่าที่ไม่ใช่ NaN; None = ขนาดหน้าต่าง)
+    """
+    if how not in ("max", "min"):
+        raise ValueError(f"unknown how: {how}")
+    x = _values(x)
+    windows = [int(w) for w in windows]
+    if not windows or min(windows) < 1:
+        raise ValueError(f"windows must be >= 1: {windows}")
+    op = np.fmax if how == "max" else np.fmin
+    n = len(x)
+    levels = _sparse_levels(x, op, max(windows))
+    nan = np.isnan(x)
+    valid = np.r_[0, np.cumsum(~nan)] if nan.any() else None
+    out = np.empty((n, len(windows)), dtype=float, order="F")  # คอลัมน์ต่อกันในหน่วยความจำ
+    for j, w in enumerate(windows):
+        k = w.bit_length() - 1
+        a = levels[k]
+        col = out[:, j]
+        d = w - (1 << k)
+        col[:d] = a[:d]
+        np.copyto(col[d:], op(a[d:], a[:n - d]) if d else a)
+        minp = w if min_periods is None else max(int(min_periods), 1)
+        if valid is None:
+            col[:minp - 1] = np.nan
+        else:
+            cnt = valid[1:].copy()
+            cnt[w:] -= valid[1:n - w + 1]
+            col[cnt < minp] = np.nan
+    return out
+
+
+# ---------- indicator หลายพารามิเตอร์พร้อมกัน (bars × params) สำหรับ sweep ----------
+def _param_vector(values, name: str) -> list:
+    values = list(values)
+    if not values:
+        raise ValueError(f"{name} must not be empty")
+    return values
+
+
+def ema_matrix(x, spans, min_periods: int | None = None, dtype=np.float64) -> np.ndarray:
+    """
+    ewm(span, adjust=False, min_periods).mean() ของทุก span → (bars × len(spans))
+    min_periods=None → ใช้ span ของคอลัมน์นั้น (แบบ run_quick_backtest.ema)
+    มี numba: รอบเดียวอัปเดตทุก span; ไม่มี: pandas ทีละคอลัมน์ — ผลตรงกับ pandas ทุกบิตทั้งสองทาง
+    dtype=np.float32 → ผลลัพธ์ใช้หน่วยความจำครึ่งเดียว (คำนวณภายในเป็น float64)
+    """
+    x = np.ascontiguousarray(_values(x))
+    spans = _param_vector(spans, "spans")
+    minps = [int(sp) if min_periods is None else int(min_periods) for sp in spans]
+    out = np.empty((len(x), len(spans)), dtype=dtype, order="C" if kernels._ewm_matrix_nb else "F")
+    if len(x) == 0:
+        return out
+    if kernels._ewm_matrix_nb is not None:
+        alphas = np.array([1.0 / (1.0 + (float(sp) - 1.0) / 2.0) for sp in spans])  # เหมือน pandas: com → alpha
+        return kernels._ewm_matrix_nb(x, alphas, np.maximum(np.array(minps, dtype=np.int64), 1), out)
+    sx = pd.Series(x)
+    for j, (sp, mp) in enumerate(zip(spans, minps)):
+        out[:, j] = sx.ewm(span=sp, adjust=False, min_periods=mp).mean().to_numpy()
+    return out
+
+
+def atr_matrix(df: pd.DataFrame, periods, method: str = "sma", dtype=np.float64) -> np.ndarray:
+    """
+    ATR ของทุก n ใน periods → (bars × len(periods)); TR คำนวณครั้งเดียวแล้วใช้ร่วมกัน
+    method="sma"   : core.indicators.atr (rolling mean, min_periods=n)
+    method="wilder": features._atr (RMA alpha=1/n)
+    """
+    periods = [int(n) for n in _param_vector(periods, "periods")]
+    if method == "sma":
+        tr, loop = ENGINE._true_range(df), kernels._rolling_mean_matrix_nb
+    elif method == "wilder":
+        h, l, c = _values(df["high"]), _values(df["low"]), _values(df["close"])
+        pc = np.r_[c[:1], c[:-1]]
+        tr, loop = np.maximum.reduce([h - l, np.abs(h - pc), np.abs(l - pc)]), kernels._rma_matrix_nb
+    else:
+        raise ValueError(f"unknown ATR method: {method}")
+    tr = np.ascontiguousarray(tr)
+    out = np.empty((len(tr), len(periods)), dtype=dtype, order="C" if loop else "F")
+    if len(tr) == 0:
+        return out
+    ns = np.array(periods, dtype=np.int64)
+    if loop is not None:
+        return loop(tr, ns, ns, out) if method == "sma" else loop(tr, ns, out)
+    for j, n in enumerate(periods):
+        if method == "sma":
+            out[:, j] = pd.Series(tr).rolling(n, min_periods=n).mean().to_numpy()
+        else:
+            out[:, j] = rma_kernel(tr, n)
+    return out
+
+class IndicatorEngine:
+    """
+    ตัวคำนวณ indicator กลางที่ทุกจุดใช้ร่วมกัน + memo แบบ LRU
+    key = (ชื่อ indicator, พารามิเตอร์, fingerprint ของอาร์เรย์ input)
+    ผลลัพธ์ใน memo เป็น read-only; เมธอดที่คืน ndarray คืนตัวนั้นตรง ๆ (ห้ามแก้ในที่)
+    ไล่ออกเมื่อเกิน maxsize ชิ้น หรือเกิน max_mb (nbytes ของผลลัพธ์ + input ที่ memo ถือไว้ นับ input ซ้ำครั้งเดียว);
+    ชิ้นเดียวที่ใหญ่กว่า max_mb ไม่ถูกเก็บ
+    fingerprint สุ่มตรวจ ~1024 จุดของ input: แก้ค่าในที่ตรงจุดที่ไม่ได้สุ่ม → ได้ผลเก่าจาก memo
+    (แก้อาร์เรย์ในที่แล้วต้องเรียก clear() เอง)
+    """
+    def __init__(self, maxsize: int = INDICATOR_CACHE_SIZE, max_mb: float = INDICATOR_CACHE_MB):
+        self.maxsize = int(maxsize)
+        self.max_bytes = int(max_mb * 2**20)
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._memo: OrderedDict[tuple, tuple] = OrderedDict()
+        self._inputs: dict[int, list] = {}   # id(input) → [nbytes, จำนวน entry ที่ถือ]
+
+    # ---------- memo ----------
+    def memo(self, name: str, arrays: tuple, params: tuple, fn: Callable[[], np.ndarray]) -> np.ndarray:
+        if self.maxsize <= 0:
+            self.misses += 1
+            return fn()
+        key = (name, params) + tuple(_fingerprint(a) for a in arrays)
+        hit = self._memo.get(key)
+        if hit is not None:
+            self._memo.move_to_end(key)
+            self.hits += 1
+            return hit[0]
+        self.misses += 1
+        out = np.asarray(fn())
+        out.flags.writeable = False
+        new_inputs = {id(a): a.nbytes for a in arrays if id(a) not in self._inputs}
+        if out.nbytes + sum(new_inputs.values()) > self.max_bytes:
+            return out
+        self._memo[key] = (out, arrays)
+        self.nbytes += out.nbytes
+        for a in arrays:
+            ref = self._inputs.setdefault(id(a), [a.nbytes, 0])
+            if ref[1] == 0:
+                self.nbytes += ref[0]
+            ref[1] += 1
+        while self._memo and (len(self._memo) > self.maxsize or self.nbytes > self.max_bytes):
+            self._evict()
+        return out
+
+    def _evict(self):
+        old, arrays = self._memo.popitem(last=False)[1]
+        self.nbytes -= old.nbytes
+        for a in arrays:
+            ref = self._inputs[id(a)]
+            ref[1] -= 1
+            if ref[1] == 0:
+                self.nbytes -= ref[0]
+                del self._inputs[id(a)]
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._memo), "mb": self.nbytes / 2**20,
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def clear(self):
+        self._memo.clear()
+        self._inputs.clear()
+        self.nbytes = 0
+        self.hits = self.misses = 0
+
+    # ---------- pandas semantics (คืน Series ตาม index ของ input) ----------
+    # ตัวใน (_xxx) คืนอาร์เรย์ที่อยู่ใน memo ตรง ๆ → ต่อกันเป็นทอดแล้ว hit ได้ (เช่น TR → ATR)
+    # ตัวนอกคืน Series ที่ copy แล้ว ผู้เรียกแก้ค่าในที่ได้โดยไม่กระทบ cache
+    def _ema(self, x: np.ndarray, n: int, adjust: bool, min_periods: int) -> np.ndarray:
+        return self.memo("ema", (x,), (int(n), bool(adjust), int(min_periods)),
+                         lambda: pd.Series(x).ewm(span=n, adjust=adjust, min_periods=min_periods).mean().to_numpy())
+
+    def _rolling_mean(self, x: np.ndarray, n: int, min_periods: int | None) -> np.ndarray:
+        return self.memo("rolling_mean", (x,), (int(n), min_periods),
+                         lambda: pd.Series(x).rolling(n, min_periods=min_periods).mean().to_numpy())
+
+    def _hl_range(self, df: pd.DataFrame) -> np.ndarray:
+        h, l = _values(df["high"]), _values(df["low"])
+        return self.memo("hl_range", (h, l), (), lambda: np.abs(h - l))
+
+    def _true_range(self, df: pd.DataFrame) -> np.ndarray:
+        # max ของ |h-l|, |h-prev|, |l-prev| แบบข้าม NaN (แท่งแรก = |h-l|) เหมือน concat(...).max(axis=1)
+        h, l, c = _values(df["high"]), _values(df["low"]), _values(df["close"])
+
+        def _tr():
+            pc = np.r_[np.nan, c[:-1]]
+            return np.fmax(np.fmax(self._hl_range(df), np.abs(h - pc)), np.abs(l - pc))
+        return self.memo("true_range", (h, l, c), (), _tr)
+
+    def ema(self, s: pd.Series, n: int, adjust: bool = False, min_periods: int = 0) -> pd.Series:
+        return pd.Series(self._ema(_values(s), n, adjust, min_periods), index=s.index, name=s.name)
+
+    def rolling_mean(self, s: pd.Series, n: int, min_periods: int | None = None) -> pd.Series:
+        return pd.Series(self._rolling_mean(_values(s), n, min_periods), index=s.index, name=s.name)
+
+    def hl_range(self, df: pd.DataFrame) -> pd.Series:
+        return pd.Series(self._hl_range(df), index=df.index)
+
+    def true_range(self, df: pd.DataFrame) -> pd.Series:
+        return pd.Series(self._true_range(df), index=df.index)
+
+    def atr(self, df: pd.DataFrame, n: int = 14, min_periods: int | None = None) -> pd.Series:
+        """ATR = SMA(n) ของ true range (min_periods ค่าเริ่มต้น = n)"""
+        out = self._rolling_mean(self._true_range(df), n, n if min_periods is None else min_periods)
+        return pd.Series(out, index=df.index)
+
+    def hl_range_mean(self, df: pd.DataFrame, n: int, min_periods: int | None = None) -> pd.Series:
+        """rolling mean ของ |high-low| (ATR แบบหยาบที่ spike_filter ใช้)"""
+        return pd.Series(self._rolling_mean(self._hl_range(df), n, min_periods), index=df.index)
+
+    def rolling_extrema(self, s, windows, how: str = "max", min_periods: int | None = None) -> np.ndarray:
+        """ดู rolling_extrema(); คืนอาร์เรย์ใน memo (read-only)"""
+        x = _values(s)
+        windows = tuple(int(w) for w in windows)
+        return self.memo("rolling_" + how, (x,), (windows, min_periods),
+                         lambda: rolling_extrema(x, windows, how, min_periods))
+
+    def rolling_max(self, s: pd.Series, n: int, min_periods: int | None = None) -> pd.Series:
+        return pd.Series(self.rolling_extrema(s, (n,), "max", min_periods)[:, 0], index=s.index, name=s.name)
+
+    def rolling_min(self, s: pd.Series, n: int, min_periods: int | None = None) -> pd.Series:
+        return pd.Series(self.rolling_extrema(s, (n,), "min", min_periods)[:, 0], index=s.index, name=s.name)
+
+    def ema_matrix(self, s, spans, min_periods: int | None = None, dtype=np.float64) -> np.ndarray:
+        x = _values(s)
+        return self.memo("ema_matrix", (x,), (tuple(spans), min_periods, np.dtype(dtype).str),
+                         lambda: ema_matrix(x, spans, min_periods, dtype))
+
+    def atr_matrix(self, df: pd.DataFrame, periods, method: str = "sma", dtype=np.float64) -> np.ndarray:
+        h, l, c = _values(df["high"]), _values(df["low"]), _values(df["close"])
+        return self.memo("atr_matrix", (h, l, c), (tuple(periods), method, np.dtype(dtype).str),
+                         lambda: atr_matrix(df, periods, method, dtype))
+
+    # ---------- recursive kernels (ndarray เข้า-ออก แบบ features.py) ----------
+    def ema_seeded(self, x: np.ndarray, n: int) -> np.ndarray:
+        """EMA seed ด้วยค่าแรกที่ไม่ใช่ NaN (core.kernels.ema_kernel)"""
+        x = _values(x)
+        return self.memo("ema_seeded", (x,), (int(n),), lambda: ema_kernel(x, n))
+
+    def rsi_wilder(self, close: np.ndarray, n: int = 14) -> np.ndarray:
+        c = _values(close)
+
+        def _rsi():
+            diff = np.diff(c, prepend=c[0])
+            up = np.where(diff > 0, diff, 0.0)
+            dn = np.where(diff < 0, -diff, 0.0)
+            rs = rma_kernel(up, n) / (rma_kernel(dn, n) + 1e-12)
+            return 100.0 - (100.0 / (1.0 + rs))
+        return self.memo("rsi_wilder", (c,), (int(n),), _rsi)
+
+    def atr_wilder(self, high: np.ndarray, low: np.ndarray, close: np.ndarray, n: int = 14) -> np.ndarray:
+        """ATR แบบ RMA (alpha=1/n) โดยแท่งแรกใช้ prev_close = close[0]"""
+        h, l, c = _values(high), _values(low), _values(close)
+
+        def _atr():
+            prev_close = np.r_[c[0], c[:-1]]
+            tr = np.maximum.reduce([h - l, np.abs(h - prev_close), np.abs(l - prev_close)])
+            return rma_kernel(tr, n)
+        return self.memo("atr_wilder", (h, l, c), (int(n),), _atr)
+
+
+ENGINE = IndicatorEngine()
+
+
 def ema(s: pd.Series, n: int) -> pd.Series:
-    return s.ewm(span=n, adjust=False, min_periods=1).mean()
+    return ENGINE.ema(s, n, adjust=False, min_periods=1)
 
 def bbands(s: pd.Series, n: int = 20, k: float = 2.0):
-    ma = s.rolling(n, min_periods=n).mean()
+    ma = ENGINE.rolling_mean(s, n, n)
     sd = s.rolling(n, min_periods=n).std(ddof=0)
     up = ma + k * sd
     low = ma - k * sd
     return up, low, ma
 
 def true_range(df: pd.DataFrame) -> pd.Series:
-    high, low, close = df["high"], df["low"], df["close"]
-    prev = close.shift(1)
-    tr1 = (high - low).abs()
-    tr2 = (high - prev).abs()
-    tr3 = (low - prev).abs()
-    return pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+    return ENGINE.true_range(df)
 
 def atr(df: pd.DataFrame, n: int = 14) -> pd.Series:
-    tr = true_range(df)
-    return tr.rolling(n, min_periods=n).mean()
+    return ENGINE.atr(df, n)
@@ -0,0 +1,529 @@
+from __future__ import annotations
+import math
+
+import numpy as np
+
+from config import USE_JIT
+
+# numba อยู่ใน requirements.txt (เป้าความเร็วคิดจากทาง JIT); import ไม่ได้ → ลูปเดียวกันบน Python float (ช้ากว่ามาก)
+# ทั้งสองทางคำนวณลำดับเดียวกับลูปเดิมใน features.py → ผลตรงกันทุกบิต
+try:
+    from numba import njit  # type: ignore
+    HAVE_NUMBA = True
+except Exception:
+    njit = None
+    HAVE_NUMBA = False
+
+JIT_ENABLED = HAVE_NUMBA and USE_JIT
+
+
+def jit(fn):
+    """njit(cache=True) ถ้ามี numba และเปิดใช้ (LBOT_JIT=1) มิฉะนั้นคืน None ให้ผู้เรียกใช้ fallback"""
+    if not JIT_ENABLED:
+        return None
+    return njit(cache=True, nogil=True)(fn)
+
+
+# ---------- EMA แบบ seed ด้วยค่าแรกที่ไม่ใช่ NaN (ข้าม NaN) ----------
+def _ema_loop(x, alpha, out):
+    prev = np.nan
+    for i in range(x.shape[0]):
+        v = x[i]
+        if np.isnan(v):
+            out[i] = np.nan
+            continue
+        if np.isnan(prev):
+            prev = v
+        else:
+            prev = alpha * v + (1 - alpha) * prev
+        out[i] = prev
+    return out
+
+
+def _ema_py(x: list, alpha: float) -> list:
+    out = []
+    prev = math.nan
+    beta = 1 - alpha
+    for v in x:
+        if v != v:
+            out.append(math.nan)
+            continue
+        if prev != prev:
+            prev = v
+        else:
+            prev = alpha * v + beta * prev
+        out.append(prev)
+    return out
+
+
+# ---------- RMA / Wilder: seed ด้วย SMA n ค่าแรก แล้ว (1-a)*prev + a*v ----------
+def _rma_loop(x, n, out):
+    alpha = 1.0 / n
+    acc = 0.0
+    cnt = 0
+    for i in range(x.shape[0]):
+        v = x[i]
+        if np.isnan(v):
+            out[i] = np.nan
+            continue
+        if cnt < n:
+            acc += v
+            cnt += 1
+            out[i] = np.nan if cnt < n else acc / n
+        else:
+            out[i] = (1 - alpha) * out[i - 1] + alpha * v
+    return out
+
+
+def _rma_py(x: list, n: int) -> list:
+    alpha = 1.0 / n
+    beta = 1 - alpha
+    out = []
+    acc = 0.0
+    cnt = 0
+    last = math.nan
+    for v in x:
+        if v != v:
+            last = math.nan
+        elif cnt < n:
+            acc += v
+            cnt += 1
+            last = math.nan if cnt < n else acc / n
+        else:
+            last = beta * last + alpha * v
+        out.append(last)
+    return out
+
+
+# ---------- matrix (bars × periods): หนึ่งรอบต่อข้อมูล อัปเดตทุกพารามิเตอร์ในแท่งเดียวกัน ----------
+def _ewm_matrix_loop(x, alphas, minps, out):
+    # ewm(adjust=False, ignore_na=False).mean() ของ pandas ทีละคอลัมน์ (ลำดับการคำนวณเดียวกัน)
+    m = alphas.shape[0]
+    weighted = np.empty(m)
+    old_wt = np.ones(m)
+    nobs = 0
+    v0 = x[0]
+    if not np.isnan(v0):
+        nobs = 1
+    for j in range(m):
+        weighted[j] = v0
+        out[0, j] = v0 if nobs >= minps[j] else np.nan
+    for i in range(1, x.shape[0]):
+        cur = x[i]
+        obs = not np.isnan(cur)
+        if obs:
+            nobs += 1
+        for j in range(m):
+            w = weighted[j]
+            if not np.isnan(w):
+                old_wt[j] *= 1.0 - alphas[j]
+                if obs:
+                    if w != cur:
+                        w = old_wt[j] * w + alphas[j] * cur
+                        w /= old_wt[j] + alphas[j]
+                        weighted[j] = w
+                    old_wt[j] = 1.0
+            elif obs:
+                weighted[j] = cur
+            out[i, j] = weighted[j] if nobs >= minps[j] else np.nan
+    return out
+
+
+def _rolling_mean_matrix_loop(x, windows, minps, out):
+    # rolling(n, min_periods).mean() ของ pandas (Kahan แยก add/remove) ทุก n พร้อมกัน
+    m = windows.shape[0]
+    s = np.zeros(m)
+    comp_add = np.zeros(m)
+    comp_rm = np.zeros(m)
+    nobs = np.zeros(m, np.int64)
+    neg = np.zeros(m, np.int64)
+    same = np.zeros(m, np.int64)
+    prev = np.full(m, np.nan)
+    for i in range(x.shape[0]):
+        v = x[i]
+        for j in range(m):
+            if i >= windows[j]:
+                o = x[i - windows[j]]
+                if not np.isnan(o):
+                    nobs[j] -= 1
+                    y = -o - comp_rm[j]
+                    t = s[j] + y
+                    comp_rm[j] = t - s[j] - y
+                    s[j] = t
+                    if np.signbit(o):
+                        neg[j] -= 1
+            if not np.isnan(v):
+                nobs[j] += 1
+                y = v - comp_add[j]
+                t = s[j] + y
+                comp_add[j] = t - s[j] - y
+                s[j] = t
+                if np.signbit(v):
+                    neg[j] += 1
+                if v == prev[j]:
+                    same[j] += 1
+                else:
+                    same[j] = 1
+                prev[j] = v
+            if nobs[j] >= minps[j] and nobs[j] > 0:
+                r = s[j] / nobs[j]
+                if same[j] >= nobs[j]:
+                    r = prev[j]
+                elif neg[j] == 0 and r < 0:
+                    r = 0.0
+                elif neg[j] == nobs[j] and r > 0:
+                    r = 0.0
+                out[i, j] = r
+            else:
+                out[i, j] = np.nan
+    return out
+
+
+def _rma_matrix_loop(x, periods, out):
+    m = periods.shape[0]
+    acc = np.zeros(m)
+    cnt = np.zeros(m, np.int64)
+    last = np.full(m, np.nan)
+    for i in range(x.shape[0]):
+        v = x[i]
+        for j in range(m):
+            n = periods[j]
+            if np.isnan(v):
+                last[j] = np.nan
+            elif cnt[j] < n:
+                acc[j] += v
+                cnt[j] += 1
+                last[j] = np.nan if cnt[j] < n else acc[j] / n
+            else:
+                alpha = 1.0 / n
+                last[j] = (1 - alpha) * last[j] + alpha * v
+            out[i, j] = last[j]
+    return out
+
+
+# ---------- state machine ของ position_manager.generate_position_series ----------
+# None ของลูปเดิม → ธง has_* (ราคา NaN ก็ยังให้ผลเหมือนเดิม), max/min ของ Python → เทียบตรง ๆ (คืนตัวแรกเมื่อเท่ากัน/NaN)
+# เขียนแบบ index ล้วน → ใช้ได้ทั้ง numba (ndarray) และ Python (list) ด้วยซอร์สเดียวกัน
+def _position_loop(px, a, bt, atr_mult, step_atr, max_layers, flatten, cooldown, max_pos,
+                   pos, entry, stop, layers):
+    cur = 0
+    avg = np.nan
+    lay = 0
+    peak = 0.0
+    trough = 0.0
+    trail = 0.0
+    has_peak = False
+    has_trough = False
+    has_trail = False
+    last_change = -10**9
+    for i in range(len(px)):
+        price = px[i]
+        ai = a[i] if a[i] > 1e-9 else 1e-9
+        b = bt[i]
+
+        # trailing stop
+        if cur > 0:
+            if not has_peak or price > peak:
+                peak = price
+            has_peak = True
+            t = peak - atr_mult * ai
+            if not has_trail or t > trail:
+                trail = t
+            has_trail = True
+            if price <= trail:
+                cur = 0; avg = np.nan; lay = 0
+                has_peak = has_trough = has_trail = False; last_change = i
+        elif cur < 0:
+            if not has_trough or price < trough:
+                trough = price
+            has_trough = True
+            t = trough + atr_mult * ai
+            if not has_trail or t < trail:
+                trail = t
+            has_trail = True
+            if price >= trail:
+                cur = 0; avg = np.nan; lay = 0
+                has_peak = has_trough = has_trail = False; last_change = i
+
+        if flatten and cur != 0 and b * cur < 0:
+            cur = 0; avg = np.nan; lay = 0
+            has_peak = has_trough = has_trail = False; last_change = i
+
+        if cur == 0:
+            if i - last_change >= cooldown:
+                if b > 0:
+                    cur = 1; avg = price; lay = 0
+                    peak = price; has_peak = True; has_trough = False
+                    trail = peak - atr_mult * ai; has_trail = True; last_change = i
+                elif b < 0:
+                    cur = -1; avg = price; lay = 0
+                    trough = price; has_trough = True; has_peak = False
+                    trail = trough + atr_mult * ai; has_trail = True; last_change = i
+        elif max_layers > 0:
+            if cur > 0 and b > cur and lay < max_layers:
+                if price >= avg + (lay + 1) * step_atr * ai:
+                    add = min(1, max_pos - cur)
+                    if add > 0:
+                        avg = (avg * cur + price * add) / (cur + add)
+                        cur += add; lay += 1
+                        if not has_peak or price > peak:
+                            peak = price
+                        has_peak = True
+                        t = peak - atr_mult * ai
+                        t0 = trail if has_trail and trail != 0.0 else t   # `trail or t`
+                        trail = t if t > t0 else t0
+                        has_trail = True
+            elif cur < 0 and b < cur and lay < max_layers:
+                if price <= avg - (lay + 1) * step_atr * ai:
+                    add = min(1, max_pos + cur)
+                    if add > 0:
+                        avg = (avg * -cur + price * add) / (-cur + add)
+                        cur -= add; lay += 1
+                        if not has_trough or price < trough:
+                            trough = price
+                        has_trough = True
+                        t = trough + atr_mult * ai
+                        t0 = trail if has_trail and trail != 0.0 else t
+                        trail = t if t < t0 else t0
+                        has_trail = True
+
+        cur = max(-max_pos, min(max_pos, cur))
+        pos[i] = cur
+        entry[i] = avg
+        stop[i] = trail if has_trail else np.nan
+        layers[i] = lay
+    return pos
+
+
+def _position_batch_loop(px, a, bt, atr_mults, steps, max_layers, flatten, cooldowns, max_pos, pos):
+    # หลาย config บนอาร์เรย์ราคา/ATR/เป้าหมายชุดเดียว; entry/stop/layers ใช้บัฟเฟอร์ร่วม (เก็บเฉพาะ pos)
+    n = px.shape[0]
+    col = np.empty(n)
+    entry = np.empty(n)
+    stop = np.empty(n)
+    layers = np.empty(n, np.int64)
+    for j in range(atr_mults.shape[0]):
+        _position_nb(px, a, bt, atr_mults[j], steps[j], max_layers[j], flatten, cooldowns[j], max_pos,
+                     col, entry, stop, layers)
+        for i in range(n):
+            pos[i, j] = col[i]
+    return pos
+
+
+def _pnl_path_loop(ret, pos, fee, net):
+    # ถือ pos ของแท่งก่อน, หัก fee ทุกแท่งที่ pos เปลี่ยน → net ต่อแท่ง; คืน (maxdd ของ cumprod(1+net), จำนวนครั้งที่เปลี่ยน)
+    held = 0.0
+    turns = 0
+    eq = 1.0
+    peak = -np.inf
+    dd = np.inf
+    for i in range(ret.shape[0]):
+        h = float(pos[i - 1]) if i > 0 else 0.0
+        r = h * ret[i]
+        if i > 0 and h != held:
+            r = r - fee
+            turns += 1
+        held = h
+        net[i] = r
+        eq = eq * (1.0 + r) if i > 0 else 1.0 + r
+        if eq > peak:
+            peak = eq
+        d = eq / peak - 1.0
+        if d < dd:
+            dd = d
+    return (-dd if ret.shape[0] > 0 else 0.0), turns
+
+
+# ---------- ลูปหลักของ backtests/run_quick_backtest.py (ATR stop / cooldown / flip) ----------
+def _quick_backtest_loop(close, high, low, atr, winner, a_mult, cooldown,
+                         enter_long, enter_short, exit_pos, pos_out, equity_out):
+    pos = 0
+    entry = 0.0
+    equity = 1.0
+    cooldown_left = 0
+    enters = 0
+    exits = 0
+    for i in range(len(close)):
+        c = close[i]
+        a = atr[i]
+        if a != a:
+            a = 0.0
+
+        # equity ต่อบาร์
+        if i > 0:
+            pprev = close[i - 1]
+            if pos == 1:
+                equity *= (c / pprev)
+            elif pos == -1:
+                equity *= (pprev / c)
+
+        el = es = ex = 0
+
+        # ATR stop ทำงานแม้อยู่ช่วง cooldown
+        if pos != 0 and a_mult > 0 and a > 0:
+            if pos == 1:
+                if low[i] <= entry - a_mult * a:
+                    ex = 1; exits += 1
+                    pos = 0; entry = 0.0
+                    cooldown_left = cooldown
+            else:
+                if high[i] >= entry + a_mult * a:
+                    ex = 1; exits += 1
+                    pos = 0; entry = 0.0
+                    cooldown_left = cooldown
+
+        if cooldown_left > 0:
+            cooldown_left -= 1
+        else:
+            want = winner[i]
+            if want == 1 and pos <= 0:
+                if pos == -1:
+                    ex = 1; exits += 1
+                pos = 1; entry = c; el = 1; enters += 1
+                cooldown_left = cooldown
+            elif want == -1 and pos >= 0:
+                if pos == 1:
+                    ex = 1; exits += 1
+                pos = -1; entry = c; es = 1; enters += 1
+                cooldown_left = cooldown
+
+        enter_long[i] = el
+        enter_short[i] = es
+        exit_pos[i] = ex
+        pos_out[i] = pos
+        equity_out[i] = equity
+    return enters, exits
+
+
+def _quick_backtest_batch_loop(close, high, low, atr, winners, wcol, a_mults, cooldowns,
+                               enter_long, enter_short, exit_pos, pos_out, equity_out, counts):
+    # หลาย config บนราคา/ATR ชุดเดียว; winners = ฝั่งชนะต่อ vote (bars × V), wcol[j] = คอลัมน์ของ config j
+    for j in range(a_mults.shape[0]):
+        enters, exits = _quick_backtest_nb(close, high, low, atr, winners[:, wcol[j]], a_mults[j], cooldowns[j],
+                                           enter_long[:, j], enter_short[:, j], exit_pos[:, j],
+                                           pos_out[:, j], equity_out[:, j])
+        counts[j, 0] = enters
+        counts[j, 1] = exits
+    return counts
+
+
+_ema_nb = jit(_ema_loop)
+_rma_nb = jit(_rma_loop)
+_ewm_matrix_nb = jit(_ewm_matrix_loop)
+_rolling_mean_matrix_nb = jit(_rolling_mean_matrix_loop)
+_rma_matrix_nb = jit(_rma_matrix_loop)
+_position_nb = jit(_position_loop)
+_pnl_path_nb = jit(_pnl_path_loop)
+_quick_backtest_nb = jit(_quick_backtest_loop)
+_position_batch_nb = jit(_position_batch_loop)  # เรียก _position_nb ข้างใน → ต้องประกาศหลังมัน
+_quick_backtest_batch_nb = jit(_quick_backtest_batch_loop)  # เช่นเดียวกัน (_quick_backtest_nb)
+
+
+def ema_kernel(x: np.ndarray, period: int) -> np.ndarray:
+    """EMA alpha=2/(period+1) แบบเดียวกับ features._ema (NaN คงเป็น NaN และไม่รีเซ็ต state)"""
+    x = np.ascontiguousarray(x, dtype=float)
+    alpha = 2.0 / (period + 1.0)
+    if _ema_nb is not None:
+        return _ema_nb(x, alpha, np.empty_like(x))
+    return np.array(_ema_py(x.tolist(), alpha), dtype=float)
+
+
+def rma_kernel(x: np.ndarray, period: int) -> np.ndarray:
+    """RMA/Wilder alpha=1/period, seed = SMA ของ period ค่าแรก (NaN ก่อนครบ)"""
+    x = np.ascontiguousarray(x, dtype=float)
+    if _rma_nb is not None:
+        return _rma_nb(x, int(period), np.empty_like(x))
+    return np.array(_rma_py(x.tolist(), int(period)), dtype=float)
+
+
+def position_kernel(px, a, bt, atr_mult: float, step_atr: float, max_layers: int, flatten: bool,
+                    cooldown: int, max_pos: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """รัน _position_loop → (pos, entry, stop, layers); numba ถ้ามี ไม่งั้นลูปเดียวกันบน list ของ Python"""
+    px = np.ascontiguousarray(px, dtype=float)
+    a = np.ascontiguousarray(a, dtype=float)
+    bt = np.ascontiguousarray(bt, dtype=np.int64)
+    n = px.shape[0]
+    args = (float(atr_mult), float(step_atr), int(max_layers), bool(flatten), int(cooldown), int(max_pos))
+    if _position_nb is not None:
+        out = (np.empty(n), np.empty(n), np.empty(n), np.empty(n, dtype=np.int64))
+        _position_nb(px, a, bt, *args, *out)
+        return out
+    out = ([0.0] * n, [0.0] * n, [0.0] * n, [0] * n)
+    _position_loop(px.tolist(), a.tolist(), bt.tolist(), *args, *out)
+    return (np.array(out[0], dtype=float), np.array(out[1], dtype=float),
+            np.array(out[2], dtype=float), np.array(out[3], dtype=np.int64))
+
+
+def position_batch_kernel(px, a, bt, atr_mults, steps, max_layers, cooldowns, flatten: bool,
+                          max_pos: int) -> np.ndarray:
+    """_position_loop ของทุก config (เวกเตอร์ยาวเท่ากัน) → pos int8 (bars × configs, F-order)"""
+    px = np.ascontiguousarray(px, dtype=float)
+    a = np.ascontiguousarray(a, dtype=float)
+    bt = np.ascontiguousarray(bt, dtype=np.int64)
+    am, st, ly, cd = (np.ascontiguousarray(v) for v in np.broadcast_arrays(
+        np.asarray(atr_mults, dtype=float), np.asarray(steps, dtype=float),
+        np.asarray(max_layers, dtype=np.int64), np.asarray(cooldowns, dtype=np.int64)))
+    n, k = px.shape[0], am.shape[0]
+    pos = np.empty((n, k), dtype=np.int8, order="F")
+    if _position_batch_nb is not None:
+        return _position_batch_nb(px, a, bt, am, st, ly, bool(flatten), cd, int(max_pos), pos)
+    px_l, a_l, bt_l = px.tolist(), a.tolist(), bt.tolist()
+    col, entry, stop, layers = [0.0] * n, [0.0] * n, [0.0] * n, [0] * n
+    for j in range(k):
+        _position_loop(px_l, a_l, bt_l, float(am[j]), float(st[j]), int(ly[j]), bool(flatten), int(cd[j]),
+                       int(max_pos), col, entry, stop, layers)
+        pos[:, j] = col
+    return pos
+
+
+def pnl_path_kernel(ret: np.ndarray, pos: np.ndarray, fee: float, net: np.ndarray) -> tuple[float, int]:
+    """เติม net (per-bar) ของคอลัมน์ pos หนึ่งคอลัมน์ → (maxdd, จำนวนครั้งที่ pos เปลี่ยน)"""
+    if _pnl_path_nb is not None:
+        return _pnl_path_nb(ret, np.ascontiguousarray(pos), float(fee), net)
+    hold = np.zeros(len(ret))
+    hold[1:] = pos[:-1]
+    turned = np.zeros(len(ret), dtype=bool)
+    turned[1:] = hold[1:] != hold[:-1]
+    net[:] = hold * ret - turned * fee
+    eq = np.cumprod(1 + net)
+    dd = float(-(eq / np.maximum.accumulate(eq) - 1).min()) if len(eq) else 0.0
+    return dd, int(turned.sum())
+
+
+def quick_backtest_kernel(close, high, low, atr, winner, atr_mult: float, cooldown: int):
+    """_quick_backtest_loop → (enter_long, enter_short, exit_pos, pos, equity, enters, exits)"""
+    close, high, low, atr = (np.ascontiguousarray(x, dtype=float) for x in (close, high, low, atr))
+    winner = np.ascontiguousarray(winner, dtype=np.int64)
+    n = close.shape[0]
+    if _quick_backtest_nb is not None:
+        out = tuple(np.empty(n, dtype=np.int8) for _ in range(4)) + (np.empty(n),)
+        enters, exits = _quick_backtest_nb(close, high, low, atr, winner, float(atr_mult), int(cooldown), *out)
+        return (*out, int(enters), int(exits))
+    out = ([0] * n, [0] * n, [0] * n, [0] * n, [0.0] * n)
+    enters, exits = _quick_backtest_loop(close.tolist(), high.tolist(), low.tolist(), atr.tolist(),
+                                         winner.tolist(), float(atr_mult), int(cooldown), *out)
+    return (*(np.array(x, dtype=np.int8) for x in out[:4]), np.array(out[4], dtype=float), enters, exits)
+
+
+def quick_backtest_batch_kernel(close, high, low, atr, winners, wcol, atr_mults, cooldowns):
+    """
+    _quick_backtest_loop ของทุก config ในการเรียกครั้งเดียว
+    winners (bars × V) + wcol (คอลัมน์ของแต่ละ config) → (enter_long, enter_short, exit_pos, pos int8,
+    equity float; ทั้งหมด bars × configs F-order, counts = [enters, exits] ต่อ config)
+    """
+    close, high, low, atr = (np.ascontiguousarray(x, dtype=float) for x in (close, high, low, atr))
+    winners = np.asfortranarray(winners, dtype=np.int64)
+    wcol, am, cd = (np.ascontiguousarray(v) for v in np.broadcast_arrays(
+        np.asarray(wcol, dtype=np.int64), np.asarray(atr_mults, dtype=float), np.asarray(cooldowns, dtype=np.int64)))
+    n, k = close.shape[0], am.shape[0]
+    out = tuple(np.empty((n, k), dtype=np.int8, order="F") for _ in range(4)) + (np.empty((n, k), order="F"),)
+    counts = np.zeros((k, 2), dtype=np.int64)
+    if _quick_backtest_batch_nb is not None:
+        _quick_backtest_batch_nb(close, high, low, atr, winners, wcol, am, cd, *out, counts)
+        return (*out, counts)
+    for j in range(k):
+        *cols, enters, exits = quick_backtest_kernel(close, high, low, atr, winners[:, wcol[j]], am[j], cd[j])
+        for dst, src in zip(out, cols):
+            dst[:, j] = src
+        counts[j] = enters, exits
+    return (*out, counts)
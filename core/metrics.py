@@ -0,0 +1,278 @@
+from __future__ import annotations
+import math
+
+import numpy as np
+import pandas as pd
+
+from config import ANN_FACTOR, M15_PER_DAY
+
+# เมตริกชุดเดียวของทั้ง repo (backtest / sweep / walk-forward / bootstrap / drl_agent / utils)
+#   batch: อาร์เรย์ 1D (แท่ง) หรือ 2D (แท่ง × config) → ค่าเดียว / ค่าต่อคอลัมน์ ในการเรียกครั้งเดียว
+#          2D ลดตามแกนแท่งแบบ Fortran order → ผลของแต่ละคอลัมน์ตรงกับส่ง 1D ทีละคอลัมน์ทุกบิต
+#   online: RunningMetrics.update() ทีละแท่ง O(1) (สเกลาร์ หรือเวกเตอร์ของหลาย config พร้อมกัน)
+
+ANN_BAR = math.sqrt(ANN_FACTOR)     # M15: 96 แท่ง/วัน × 252 วัน
+ANN_DAY = math.sqrt(252.0)
+BARS_PER_DAY = M15_PER_DAY
+NS_PER_DAY = 86_400 * 1_000_000_000
+
+
+def _cols(a) -> np.ndarray:
+    return np.asfortranarray(np.asarray(a, dtype=float))
+
+
+def _out(v: np.ndarray, ndim: int):
+    return float(v) if ndim == 1 else v
+
+
+def _val(v):
+    return float(v) if np.ndim(v) == 0 else v
+
+
+# ---------- batch ----------
+def returns_from_equity(equity) -> np.ndarray:
+    """รีเทิร์นต่อแท่งจาก equity (equity ก่อนหน้าเป็น 0 → หารด้วย 1); 2D → ต่อคอลัมน์"""
+    eq = np.asarray(equity, dtype=float)
+    return np.diff(eq, axis=0) / np.where(eq[:-1] == 0, 1.0, eq[:-1])
+
+
+def sharpe(r, ann: float = ANN_BAR, ddof: int = 0):
+    """mean / std * ann ของรีเทิร์นต่อแท่ง; std = 0 หรือแท่งไม่พอ → 0"""
+    r = _cols(r)
+    if r.shape[0] <= ddof:
+        return 0.0 if r.ndim == 1 else np.zeros(r.shape[1:])
+    mean, sd = r.mean(axis=0), r.std(axis=0, ddof=ddof)
+    return _out(np.divide(mean, sd, out=np.zeros_like(mean), where=sd != 0) * ann, r.ndim)
+
+
+def drawdown(equity, relative: bool = True) -> np.ndarray:
+    """ระยะจาก peak ต่อแท่ง: relative = 1 - equity/peak (สัดส่วน), ไม่ใช่ = peak - equity (หน่วย equity)"""
+    eq = _cols(equity)
+    peak = np.maximum.accumulate(eq, axis=0)
+    return 1.0 - eq / peak if relative else peak - eq
+
+
+def max_drawdown(equity, relative: bool = True):
+    """MaxDD: relative = สัดส่วนจาก peak (แบบ pnl_summary), ไม่ใช่ = peak - equity สูงสุด (แบบ compute_metrics)"""
+    eq = _cols(equity)
+    if eq.shape[0] == 0:
+        return 0.0 if eq.ndim == 1 else np.zeros(eq.shape[1:])
+    return _out(drawdown(eq, relative).max(axis=0), eq.ndim)
+
+
+def day_ends(time) -> np.ndarray:
+    """ตำแหน่งแท่งสุดท้ายของแต่ละวันปฏิทิน (ตามเวลาท้องถิ่นของ tz ถ้ามี, แบบ resample('1D').last())"""
+    idx = pd.DatetimeIndex(time)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    day = idx.as_unit("ns").asi8 // NS_PER_DAY
+    return np.flatnonzero(np.r_[day[1:] != day[:-1], True]) if len(day) else np.empty(0, dtype=np.int64)
+
+
+def daily_sharpe(equity, time, ann: float = ANN_DAY, ddof: int = 1):
+    """Sharpe จาก equity ปิดวัน (pct_change ของวันที่มีแท่ง) × sqrt(252)"""
+    eq = _cols(equity)
+    daily = eq[day_ends(time[:eq.shape[0]])]
+    return sharpe(np.diff(daily, axis=0) / daily[:-1], ann, ddof)
+
+
+def trade_stats(trade_pnl) -> dict:
+    """สถิติต่อไม้: win rate / avg win / avg loss / profit factor (ไม่มีไม้ขาดทุน → inf) / expectancy"""
+    p = np.asarray(trade_pnl, dtype=float)
+    win, loss = p[p > 0], -p[p < 0]
+    gross_win, gross_loss = float(win.sum()), float(loss.sum())
+    return {
+        "trades": int(p.size),
+        "win_rate": len(win) / p.size if p.size else 0.0,
+        "avg_win": float(win.mean()) if len(win) else 0.0,
+        "avg_loss": float(loss.mean()) if len(loss) else 0.0,
+        "gross_win": gross_win,
+        "gross_loss": gross_loss,
+        "profit_factor": gross_win / max(gross_loss, 1e-12) if len(loss) else math.inf,
+        "expectancy": float(p.mean()) if p.size else 0.0,
+    }
+
+
+def trade_returns(net, pos, chunk: int = 256) -> tuple[np.ndarray, np.ndarray]:
+    """
+    รีเทิร์นสุทธิต่อไม้จาก net ต่อแท่ง + pos (แบบ pnl_path_kernel: ถือ pos ของแท่งก่อน, ค่าธรรมเนียมที่แท่งที่เปลี่ยน)
+    ไม้ = ช่วงที่ถือ pos เดิมที่ไม่ใช่ 0 (ค่าธรรมเนียมตอนปิดเป็นของไม้ที่ปิด) → (ผลรวม net ต่อไม้, คอลัมน์ของไม้)
+    """
+    net = np.asarray(net, dtype=float).reshape(len(net), -1)
+    pos = np.asarray(pos).reshape(len(net), -1)
+    n, k = net.shape
+    pnl, col = [], []
+    for j0 in range(0, k, chunk):
+        p = pos[:, j0:j0 + chunk]
+        hold = np.zeros(p.shape)
+        hold[1:] = p[:-1]
+        turned = np.zeros(p.shape, dtype=bool)
+        turned[1:] = hold[1:] != hold[:-1]
+        seg = np.cumsum(turned, axis=0) - (turned & (hold == 0))   # แท่งปิดไม้ → ช่วงก่อนหน้า
+        seg += np.arange(p.shape[1]) * (n + 1)
+        is_trade = np.zeros(p.shape[1] * (n + 1), dtype=bool)
+        is_trade[seg[hold != 0]] = True
+        sums = np.bincount(seg.ravel(), weights=net[:, j0:j0 + chunk].ravel(), minlength=len(is_trade))
+        ids = np.flatnonzero(is_trade)
+        pnl.append(sums[ids])
+        col.append(ids // (n + 1) + j0)
+    if not pnl:
+        return np.empty(0), np.empty(0, dtype=np.int64)
+    return np.concatenate(pnl), np.concatenate(col)
+
+
+def profit_factor(pnl, col=None, k: int | None = None):
+    """กำไรรวม / ขาดทุนรวมของไม้; col (จาก trade_returns) → ต่อคอลัมน์ k คอลัมน์"""
+    pnl = np.asarray(pnl, dtype=float)
+    if col is None:
+        return trade_stats(pnl)["profit_factor"]
+    k = int(col.max()) + 1 if k is None and len(col) else (k or 0)
+    win = np.bincount(col, weights=np.maximum(pnl, 0.0), minlength=k)
+    loss = np.bincount(col, weights=np.maximum(-pnl, 0.0), minlength=k)
+    has_loss = np.bincount(col, weights=pnl < 0, minlength=k) > 0
+    return np.where(has_loss, win / np.maximum(loss, 1e-12), np.inf)
+
+
+def expectancy(pnl, col=None, k: int | None = None):
+    """รีเทิร์นเฉลี่ยต่อไม้ (ไม่มีไม้ → 0); col → ต่อคอลัมน์"""
+    pnl = np.asarray(pnl, dtype=float)
+    if col is None:
+        return float(pnl.mean()) if pnl.size else 0.0
+    k = int(col.max()) + 1 if k is None and len(col) else (k or 0)
+    cnt = np.bincount(col, minlength=k)
+    return np.bincount(col, weights=pnl, minlength=k) / np.maximum(cnt, 1)
+
+
+def trades_per_day(trades, bars: int | None = None, days: float | None = None,
+                   bars_per_day: int = BARS_PER_DAY):
+    """จำนวนไม้ต่อวัน: ระบุ days (เช่นจากเวลาจริง) หรือ bars (ตีเป็น bars / bars_per_day วัน)"""
+    days = max((bars or 0) / bars_per_day if days is None else days, 1e-9)
+    return np.asarray(trades, dtype=float) / days if np.ndim(trades) else trades / days
+
+
+def net_metrics(net, ddof: int = 1) -> dict:
+    """Sharpe (ddof=1) + MaxDD สัดส่วนของรีเทิร์นสุทธิต่อแท่ง (สูตรของ pnl_summary / walk-forward)"""
+    net = np.asarray(net, dtype=float)
+    eq = np.cumprod(1.0 + _cols(net), axis=0)
+    return {"sharpe": sharpe(net, ddof=ddof), "maxdd": max_drawdown(eq)}
+
+
+def summarize(net, pos=None, days: float | None = None, ann: float = ANN_BAR, ddof: int = 1) -> pd.DataFrame:
+    """
+    net (แท่ง × config) → DataFrame ต่อคอลัมน์ในการเรียกครั้งเดียว: sharpe / maxdd (สัดส่วน)
+    ส่ง pos มาด้วย → trades (จำนวนไม้จาก trade_returns) / trades_per_day / profit_factor / expectancy
+    """
+    net = _cols(np.asarray(net, dtype=float).reshape(len(net), -1))
+    k = net.shape[1]
+    out = pd.DataFrame({"sharpe": np.atleast_1d(sharpe(net, ann, ddof)),
+                        "maxdd": np.atleast_1d(max_drawdown(np.cumprod(1.0 + net, axis=0)))})
+    if pos is not None:
+        pnl, col = trade_returns(net, pos)
+        out["trades"] = np.bincount(col, minlength=k)
+        out["trades_per_day"] = trades_per_day(out["trades"].to_numpy(), bars=len(net), days=days)
+        out["profit_factor"] = profit_factor(pnl, col, k)
+        out["expectancy"] = expectancy(pnl, col, k)
+    return out
+
+
+# ---------- online ----------
+class RunningMetrics:
+    """
+    เมตริกแบบสะสมทีละแท่ง O(1): Welford mean/var ของรีเทิร์นต่อแท่ง (และต่อวันถ้าส่ง day), peak/drawdown,
+    นับไม้ + กำไร/ขาดทุนต่อไม้ → ค่าเดียวกับ batch บนประวัติเดียวกัน (ต่างกันแค่ลำดับการบวก)
+    equity เป็นสเกลาร์ หรือเวกเตอร์ยาว k (k config พร้อมกัน)
+    """
+    def __init__(self, k: int | None = None, ann: float = ANN_BAR, ann_day: float = ANN_DAY, ddof: int = 0,
+                 ddof_day: int = 1, bars_per_day: int = BARS_PER_DAY):
+        shape = () if k is None else (int(k),)
+        z = lambda: np.zeros(shape)
+        self.ann, self.ann_day, self.ddof, self.ddof_day = ann, ann_day, ddof, ddof_day
+        self.bars_per_day = bars_per_day
+        self.bars = 0
+        self.prev = np.full(shape, np.nan)
+        self.n, self.mean, self.m2 = 0, z(), z()
+        self.peak = np.full(shape, -np.inf)
+        self.maxdd, self.maxdd_abs = z(), z()
+        self.trades, self.gross_win, self.gross_loss, self.losses, self.pnl_sum = z(), z(), z(), z(), z()
+        self.day = None
+        self.day_close = np.full(shape, np.nan)      # equity ปิดวันก่อน
+        self.day_last = np.full(shape, np.nan)       # equity ล่าสุดของวันนี้
+        self.dn, self.dmean, self.dm2 = 0, z(), z()
+
+    @staticmethod
+    def _welford(n, mean, m2, x):
+        d = x - mean
+        mean = mean + d / n
+        return mean, m2 + d * (x - mean)
+
+    def update(self, equity, trade_pnl=None, closed=None, day=None) -> "RunningMetrics":
+        """
+        equity ของแท่งนี้; trade_pnl = กำไรของไม้ที่ปิดที่แท่งนี้ (closed = mask ว่าคอลัมน์ไหนปิด, ไม่ระบุ = ทุกคอลัมน์)
+        day = คีย์วันของแท่งนี้ (เช่น date) → เปลี่ยนวันแล้วนับรีเทิร์นรายวันจาก equity ปิดวัน
+        """
+        eq = np.asarray(equity, dtype=float)
+        if self.bars:
+            r = (eq - self.prev) / np.where(self.prev == 0, 1.0, self.prev)
+            self.n += 1
+            self.mean, self.m2 = self._welford(self.n, self.mean, self.m2, r)
+        self.bars += 1
+        self.prev = eq
+        self.peak = np.maximum(self.peak, eq)
+        self.maxdd = np.maximum(self.maxdd, 1.0 - eq / self.peak)
+        self.maxdd_abs = np.maximum(self.maxdd_abs, self.peak - eq)
+        if trade_pnl is not None:
+            p = np.asarray(trade_pnl, dtype=float)
+            m = np.ones(np.shape(eq), dtype=bool) if closed is None else np.asarray(closed, dtype=bool)
+            self.trades = self.trades + m
+            self.pnl_sum = self.pnl_sum + np.where(m, p, 0.0)
+            self.gross_win = self.gross_win + np.where(m & (p > 0), p, 0.0)
+            self.gross_loss = self.gross_loss + np.where(m & (p < 0), -p, 0.0)
+            self.losses = self.losses + (m & (p < 0))
+        if day is not None:
+            if self.day is not None and day != self.day:
+                if not np.all(np.isnan(self.day_close)):
+                    self.dn += 1
+                    self.dmean, self.dm2 = self._welford(self.dn, self.dmean, self.dm2,
+                                                         self.day_last / self.day_close - 1.0)
+                self.day_close = self.day_last
+            self.day = day
+            self.day_last = eq
+        return self
+
+    @staticmethod
+    def _sharpe(n, mean, m2, ann, ddof):
+        if n <= ddof:
+            return _val(np.zeros(np.shape(mean)))
+        sd = np.sqrt(m2 / (n - ddof))
+        return _val(np.divide(mean, sd, out=np.zeros(np.shape(mean)), where=sd != 0) * ann)
+
+    @property
+    def sharpe(self):
+        return self._sharpe(self.n, self.mean, self.m2, self.ann, self.ddof)
+
+    @property
+    def daily_sharpe(self):
+        """วันที่ยังไม่จบ (วันล่าสุด) นับรวมด้วย เหมือน resample('1D').last()"""
+        n, mean, m2 = self.dn, self.dmean, self.dm2
+        if self.day is not None and not np.all(np.isnan(self.day_close)):
+            n += 1
+            mean, m2 = self._welford(n, mean, m2, self.day_last / self.day_close - 1.0)
+        return self._sharpe(n, mean, m2, self.ann_day, self.ddof_day)
+
+    @property
+    def trades_per_day(self):
+        return trades_per_day(self.trades, bars=self.n, bars_per_day=self.bars_per_day)
+
+    @property
+    def profit_factor(self):
+        return _val(np.where(self.losses > 0, self.gross_win / np.maximum(self.gross_loss, 1e-12), np.inf))
+
+    @property
+    def expectancy(self):
+        return _val(self.pnl_sum / np.maximum(self.trades, 1))
+
+    def as_dict(self) -> dict:
+        return {"sharpe": self.sharpe, "daily_sharpe": self.daily_sharpe, "maxdd": _val(self.maxdd),
+                "maxdd_abs": _val(self.maxdd_abs), "trades": _val(self.trades),
+                "trades_per_day": _val(self.trades_per_day), "profit_factor": self.profit_factor,
+                "expectancy": self.expectancy}
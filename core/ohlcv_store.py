@@ -0,0 +1,131 @@
+from __future__ import annotations
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import DATA_FILE, LOCAL_TZ
+from core import price_cache
+from core.data_loader import _finish_frame, _make_demo_data, parse_price_csv
+
+NS_PER_MIN = 60 * 1_000_000_000
+
+
+def _to_ns(t) -> int:
+    """รับ int (epoch ns) / str / datetime / Timestamp → epoch ns (UTC); naive ถือเป็นเวลา LOCAL_TZ"""
+    if isinstance(t, (int, np.integer)):
+        return int(t)
+    ts = pd.Timestamp(t)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize(LOCAL_TZ)
+    return int(ts.tz_convert("UTC").as_unit("ns").value)
+
+
+class OHLCVWindow:
+    """ช่วงข้อมูลที่ตัดจาก store: คอลัมน์เป็น view ของ memmap (zero-copy) จนกว่าจะเรียก to_frame()"""
+    def __init__(self, columns: dict[str, np.ndarray], time_unit: str = "ns"):
+        self.columns = columns
+        self._unit = time_unit
+
+    def __len__(self) -> int:
+        return len(self.columns["time"])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    @property
+    def time_ns(self) -> np.ndarray:
+        return self.columns["time"]
+
+    def to_frame(self) -> pd.DataFrame:
+        """คัดลอกเฉพาะช่วงนี้ออกมาเป็น DataFrame หน้าตาเดียวกับ load_price_csv()"""
+        data = {}
+        for name, arr in self.columns.items():
+            if name == "time":
+                data[name] = price_cache._time_series(np.array(arr), self._unit)
+            else:
+                data[name] = np.array(arr)
+        return pd.DataFrame(data)
+
+
+class OHLCVStore:
+    """
+    OHLCV แบบ memory-mapped บนไฟล์แคชไบนารี (core/price_cache.py)
+    time เป็น int64 epoch ns เรียงแล้ว → ตัดช่วงเวลาด้วย searchsorted O(log n)
+    ต้นทุนขึ้นกับขนาดช่วงที่ใช้ ไม่ใช่ขนาดไฟล์
+    """
+    def __init__(self, columns: dict[str, np.ndarray], time_unit: str = "ns"):
+        self.columns = columns
+        self.time_ns = columns["time"]
+        self._unit = time_unit
+
+    @classmethod
+    def open(cls, path: Path | None = None) -> "OHLCVStore":
+        """เปิด store ของ CSV; แคชยังไม่มี/ไม่สด → สร้าง/อัปเดตก่อน; ไม่มีไฟล์ → ใช้เดโมดาต้า (in-memory)"""
+        csv_path = Path(path or DATA_FILE)
+        if not csv_path.exists():
+            return cls.from_frame(_make_demo_data())
+
+        cache_dir = price_cache.cache_dir_for(csv_path)
+        meta = price_cache.read_meta(cache_dir)
+        if not price_cache.is_fresh(csv_path, meta):
+            if price_cache.update_cache(csv_path, _finish_frame) is None:
+                fp = price_cache.file_fingerprint(csv_path)
+                df = parse_price_csv(csv_path)
+                if price_cache.write_cache(csv_path, df, fp) is None:
+                    return cls.from_frame(df)
+            meta = price_cache.read_meta(cache_dir)
+        return cls.open_dir(cache_dir, meta)
+
+    @classmethod
+    def open_dir(cls, cache_dir: Path, meta: dict | None = None) -> "OHLCVStore":
+        """เปิดโฟลเดอร์คอลัมน์ไบนารีตรง ๆ (เช่นที่ core/synth.py เขียน) โดยไม่ต้องมี CSV ต้นทาง"""
+        cache_dir = Path(cache_dir)
+        meta = meta or price_cache.read_meta(cache_dir)
+        if meta is None:
+            raise FileNotFoundError(f"no price cache: {cache_dir}")
+        rows = meta["rows"]
+        cols: dict[str, np.ndarray] = {}
+        unit = "ns"
+        for c in meta["columns"]:
+            fn = cache_dir / f"{c['name']}.bin"
+            # np.memmap ใช้กับไฟล์ขนาด 0 ไม่ได้
+            cols[c["name"]] = (np.memmap(fn, dtype=c["dtype"], mode="r", shape=(rows,))
+                               if rows else np.empty(0, dtype=c["dtype"]))
+            if c["name"] == "time":
+                unit = c.get("time_unit", "ns")
+        return cls(cols, unit)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "OHLCVStore":
+        packed = price_cache._column_arrays(df)
+        if packed is None:
+            raise ValueError("OHLCVStore needs numeric columns only")
+        arrays, cols = packed
+        unit = next(c.get("time_unit", "ns") for c in cols if c["name"] == "time")
+        return cls(arrays, unit)
+
+    def __len__(self) -> int:
+        return len(self.time_ns)
+
+    def _window(self, i0: int, i1: int) -> OHLCVWindow:
+        return OHLCVWindow({k: v[i0:i1] for k, v in self.columns.items()}, self._unit)
+
+    def slice(self, start=None, end=None) -> OHLCVWindow:
+        """แท่งที่ start <= time < end (None = ไม่จำกัดฝั่งนั้น)"""
+        i0 = 0 if start is None else int(np.searchsorted(self.time_ns, _to_ns(start), side="left"))
+        i1 = len(self) if end is None else int(np.searchsorted(self.time_ns, _to_ns(end), side="left"))
+        return self._window(i0, max(i0, i1))
+
+    def last_n_minutes(self, minutes: int) -> OHLCVWindow:
+        """แท่งที่ time >= time[-1] - minutes (เหมือนกรอง df["time"] >= end - timedelta(minutes))"""
+        if len(self) == 0:
+            return self._window(0, 0)
+        start = int(self.time_ns[-1]) - int(minutes) * NS_PER_MIN
+        return self._window(int(np.searchsorted(self.time_ns, start, side="left")), len(self))
+
+    def tail(self, n: int) -> OHLCVWindow:
+        return self._window(max(0, len(self) - int(n)), len(self))
+
+    def to_frame(self) -> pd.DataFrame:
+        return self._window(0, len(self)).to_frame()
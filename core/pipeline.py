@@ -0,0 +1,210 @@
+from __future__ import annotations
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+
+from config import MAX_POS_TOTAL, TAKER_FEE_BPS_PER_SIDE
+from core.entries import combined_signal
+from core.kernels import position_batch_kernel
+from core.position_manager import _filled_atr, bar_returns, base_target_from_signals, pnl_summary
+from core.sweep import resolve_workers, run_cells
+
+
+def fingerprint(value) -> str:
+    """แฮชตามเนื้อหา: ndarray / DataFrame / Series / dict / list / สเกลาร์ (อย่างอื่น → TypeError ให้ผู้เรียกส่ง key เอง)"""
+    h = hashlib.blake2b(digest_size=16)
+
+    def feed(v):
+        if isinstance(v, np.ndarray):
+            if v.dtype == object:
+                raise TypeError("cannot fingerprint object arrays; pass key= explicitly")
+            a = np.ascontiguousarray(v)
+            h.update(f"nd:{a.dtype.str}:{a.shape}".encode())
+            h.update(a.data)
+        elif isinstance(v, pd.DataFrame):
+            h.update(b"df")
+            for name in v.columns:
+                h.update(str(name).encode())
+                feed(v[name])
+        elif isinstance(v, pd.Series):
+            arr = v.array
+            # เวลาแบบมี tz → to_numpy() เป็น object; ใช้ค่า int64 + ชื่อ dtype แทน
+            h.update(str(v.dtype).encode())
+            feed(arr.asi8 if hasattr(arr, "asi8") else v.to_numpy())
+        elif isinstance(v, dict):
+            h.update(b"{")
+            for k in sorted(v, key=str):
+                h.update(str(k).encode())
+                feed(v[k])
+            h.update(b"}")
+        elif isinstance(v, (list, tuple)):
+            h.update(b"[")
+            for x in v:
+                feed(x)
+            h.update(b"]")
+        elif v is None or isinstance(v, (bool, int, float, str, np.generic)):
+            h.update(json.dumps(v.item() if isinstance(v, np.generic) else v).encode())
+        else:
+            raise TypeError(f"cannot fingerprint {type(v).__name__}; pass key= explicitly")
+
+    feed(value)
+    return h.hexdigest()
+
+
+@dataclass(frozen=True)
+class Node:
+    """ผลของสเตจหนึ่ง: key = แฮชของ (ชื่อสเตจ, key ของอินพุต, พารามิเตอร์) → สเตจถัดไปใช้ key นี้ต่อ"""
+    stage: str
+    key: str
+    value: Any = field(repr=False, compare=False)
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    hits: int = 0
+    seconds: float = 0.0      # เวลาคำนวณจริง (ตอน miss)
+
+    @property
+    def misses(self) -> int:
+        return self.calls - self.hits
+
+
+class Pipeline:
+    """
+    memo ของสเตจแบบ DAG: แต่ละสเตจจำผลตาม key ของอินพุตต้นทาง + พารามิเตอร์ของตัวเอง
+    เปลี่ยนพารามิเตอร์ปลายทาง → สเตจต้นทางยัง hit, คำนวณใหม่เฉพาะสเตจที่ได้รับผล
+    เก็บผลล่าสุด maxsize ชิ้น (LRU); stats ต่อสเตจดูได้จาก report()
+    """
+    def __init__(self, maxsize: int = 128):
+        self.maxsize = maxsize
+        self._cache: OrderedDict[str, Node] = OrderedDict()
+        self.stats: dict[str, StageStats] = {}
+
+    def source(self, name: str, value, key: str | None = None) -> Node:
+        """อินพุตจากภายนอก (ราคา / store) → Node; key ไม่ระบุ = fingerprint ของเนื้อหา"""
+        return Node(name, key or fingerprint(value), value)
+
+    def run(self, name: str, fn: Callable, inputs: tuple[Node, ...] = (), params: dict | None = None,
+            opts: dict | None = None) -> Node:
+        """
+        fn(*[n.value for n in inputs], **params, **opts)
+        params = ส่วนหนึ่งของ key; opts = ไม่เปลี่ยนผล (เช่น workers) → ไม่อยู่ใน key
+        """
+        params = params or {}
+        key = fingerprint([name, [n.key for n in inputs], params])
+        st = self.stats.setdefault(name, StageStats())
+        st.calls += 1
+        node = self._cache.get(key)
+        if node is not None:
+            st.hits += 1
+            self._cache.move_to_end(key)
+            return node
+        t0 = time.perf_counter()
+        node = Node(name, key, fn(*[n.value for n in inputs], **params, **(opts or {})))
+        st.seconds += time.perf_counter() - t0
+        self._cache[key] = node
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return node
+
+    def clear(self):
+        self._cache.clear()
+        self.stats.clear()
+
+    def report(self) -> str:
+        lines = [f"{'stage':<10} {'calls':>6} {'hits':>6} {'miss':>6} {'seconds':>9}"]
+        for name, st in self.stats.items():
+            lines.append(f"{name:<10} {st.calls:>6} {st.hits:>6} {st.misses:>6} {st.seconds:>9.3f}")
+        total = sum(st.seconds for st in self.stats.values())
+        lines.append(f"{'total':<10} {'':>6} {'':>6} {'':>6} {total:>9.3f}")
+        return "\n".join(lines)
+
+
+# ---------- สเตจของสวีป signal → position → PnL (sweep_pyramid_trailing) ----------
+def load_stage(store, minutes: int) -> pd.DataFrame:
+    return (store.last_n_minutes(minutes) if minutes else store).to_frame()
+
+
+def features_stage(df: pd.DataFrame, atr_n: int) -> dict[str, np.ndarray]:
+    return {"close": df["close"].to_numpy(dtype=float), "atr": _filled_atr(df, atr_n)}
+
+
+def returns_stage(df: pd.DataFrame) -> np.ndarray:
+    return bar_returns(df["close"].to_numpy(dtype=float))
+
+
+def signals_stage(df: pd.DataFrame, strats: str) -> np.ndarray:
+    return base_target_from_signals(combined_signal(df, strats)).to_numpy(dtype=np.int64)
+
+
+def _positions(close, atr, target, grid, max_pos):
+    grid = np.asarray(grid, dtype=float).reshape(-1, 4)
+    return position_batch_kernel(close, atr, target, grid[:, 0], grid[:, 1], grid[:, 2].astype(int),
+                                 grid[:, 3].astype(int), True, max_pos)
+
+
+def _positions_chunk(shared, grid):
+    return _positions(shared["close"], shared["atr"], shared["target"], grid, int(shared["max_pos"][0]))
+
+
+def positions_stage(feat: dict, target: np.ndarray, grid, max_pos: int = MAX_POS_TOTAL, workers: int = 1) -> np.ndarray:
+    """pos (bars × config) ของทุกแถว grid = (atr_mult, step_atr, layers, cooldown); workers>1 → แบ่งแถวไปหลายโปรเซส"""
+    grid = np.asarray(grid, dtype=float).reshape(-1, 4)
+    if resolve_workers(workers) <= 1 or len(grid) < 2:
+        return _positions(feat["close"], feat["atr"], target, grid, max_pos)
+    chunks = np.array_split(grid, min(len(grid), resolve_workers(workers) * 4))
+    shared = {"close": feat["close"], "atr": feat["atr"], "target": target, "max_pos": np.array([max_pos])}
+    parts = [None] * len(chunks)
+    for i, part, _ in run_cells(_positions_chunk, chunks, shared, workers):
+        parts[i] = part
+    return np.asfortranarray(np.hstack(parts))
+
+
+def _metrics_chunk(shared, cols):
+    j0, j1 = cols
+    return pnl_summary(shared["close"], shared["pos"][:, j0:j1], float(shared["fee"][0]), ret=shared["ret"])
+
+
+def metrics_stage(feat: dict, ret: np.ndarray, pos: np.ndarray, fee_bps_per_side: float = TAKER_FEE_BPS_PER_SIDE,
+                  workers: int = 1) -> pd.DataFrame:
+    """pnl_summary ต่อคอลัมน์ของ pos (ret ของราคาชุดนี้คำนวณไว้แล้ว); workers>1 → แบ่งคอลัมน์ไปหลายโปรเซส"""
+    k = pos.shape[1]
+    if resolve_workers(workers) <= 1 or k < 2:
+        return pnl_summary(feat["close"], pos, fee_bps_per_side, ret=ret)
+    bounds = np.linspace(0, k, min(k, resolve_workers(workers) * 4) + 1).astype(int)
+    cells = list(zip(bounds[:-1], bounds[1:]))
+    shared = {"close": feat["close"], "ret": ret, "pos": pos, "fee": np.array([fee_bps_per_side])}
+    parts = [None] * len(cells)
+    for i, part, _ in run_cells(_metrics_chunk, cells, shared, workers):
+        parts[i] = part
+    return pd.concat(parts, ignore_index=True)
+
+
+def position_sweep(pipe: Pipeline, df: Node, atr_n: int, grid, strats: str = "ema,turtle20,turtle55",
+                   fee_bps_per_side: float = TAKER_FEE_BPS_PER_SIDE, workers: int = 1) -> pd.DataFrame:
+    """
+    df → features / returns / signals → positions → metrics ผ่าน pipe
+    เรียกซ้ำด้วย df / atr_n / strats เดิม แต่ grid ใหม่ → คำนวณใหม่เฉพาะ positions + metrics
+    คืนพารามิเตอร์ + sharpe / maxdd / trades / trades_per_day ต่อแถวของ grid
+    """
+    grid = np.asarray(grid, dtype=float).reshape(-1, 4)
+    feat = pipe.run("features", features_stage, (df,), {"atr_n": atr_n})
+    ret = pipe.run("returns", returns_stage, (df,))
+    sig = pipe.run("signals", signals_stage, (df,), {"strats": strats})
+    pos = pipe.run("positions", positions_stage, (feat, sig), {"grid": grid}, {"workers": workers})
+    met = pipe.run("metrics", metrics_stage, (feat, ret, pos), {"fee_bps_per_side": fee_bps_per_side},
+                   {"workers": workers})
+    cfg = pd.DataFrame({"atr_mult": grid[:, 0], "step_atr": grid[:, 1],
+                        "layers": grid[:, 2].astype(int), "cooldown": grid[:, 3].astype(int)})
+    out = pd.concat([cfg, met.value], axis=1)
+    t = df.value["time"]
+    days = max((t.iloc[-1] - t.iloc[0]).days, 1)
+    out["trades_per_day"] = out["trades"] / days
+    return out
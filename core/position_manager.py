@@ -1,13 +1,18 @@
-$pm = @'
 from __future__ import annotations
+import hashlib
 import numpy as np
 import pandas as pd
-from config import MAX_POS_TOTAL
+from config import MAX_POS_TOTAL, TAKER_FEE_BPS_PER_SIDE
 from core.indicators import atr
+from core.kernels import pnl_path_kernel, position_batch_kernel, position_kernel
+from core.metrics import sharpe
 
 STRATS = ["ema", "turtle20", "turtle55", "meanrev"]
 
-def base_target_from_signals(sig: pd.DataFrame, vote_required: int = 2) -> pd.Series:
+def base_target_from_signals(sig: pd.DataFrame | pd.Series, vote_required: int = 2) -> pd.Series:
+    # Series = สัญญาณที่รวมมาแล้ว (เช่น combined_signal) → ใช้เครื่องหมายเป็นเป้าหมายตรง ๆ
+    if isinstance(sig, pd.Series):
+        return np.sign(sig.fillna(0.0)).clip(-MAX_POS_TOTAL, MAX_POS_TOTAL).astype(int)
     cols = [c for c in STRATS if c in sig.columns]
     if not cols:
         raise ValueError("No known strategy signal columns in DataFrame.")
@@ -15,9 +20,91 @@ def base_target_from_signals(sig: pd.DataFrame, vote_required: int = 2) -> pd.Se
     bt = score.where(score.abs() >= vote_required, 0.0).apply(np.sign)
     return bt.clip(-MAX_POS_TOTAL, MAX_POS_TOTAL).astype(int)
 
+def _filled_atr(df: pd.DataFrame, atr_n: int) -> np.ndarray:
+    a = atr(df, n=atr_n)
+    fill = np.nanmedian(a.dropna()) if a.notna().any() else 1e-6
+    return a.ffill().bfill().fillna(fill).to_numpy(dtype=float)
+
+def simulate_positions(
+    close: np.ndarray,
+    atr_values: np.ndarray,
+    target: np.ndarray,
+    atr_mult: float = 3.0,
+    pyramid_step_atr: float = 1.2,
+    max_layers: int = 0,
+    flatten_on_opposite: bool = True,
+    cooldown_bars: int = 8,
+    max_pos: int = MAX_POS_TOTAL,
+) -> dict[str, np.ndarray]:
+    """
+    state machine ของ generate_position_series บนอาร์เรย์ล้วน (numba ถ้ามี)
+    คืน {"pos", "entry" (ราคาเฉลี่ย, NaN ตอนว่าง), "stop" (trailing stop, NaN ตอนว่าง), "layers"} ต่อแท่ง
+    """
+    pos, entry, stop, layers = position_kernel(
+        close, atr_values, target, atr_mult, pyramid_step_atr, max_layers,
+        flatten_on_opposite, cooldown_bars, max_pos,
+    )
+    return {"pos": pos, "entry": entry, "stop": stop, "layers": layers}
+
+def bar_returns(close: np.ndarray) -> np.ndarray:
+    """pct_change ของ close (แท่งแรก/NaN = 0) ใช้ร่วมทุก config ของราคาชุดเดียวกัน"""
+    close = np.asarray(close, dtype=float)
+    ret = np.zeros(len(close))
+    if len(close) > 1:
+        ret[1:] = close[1:] / close[:-1] - 1.0
+    ret[np.isnan(ret)] = 0.0
+    return ret
+
+def pnl_summary(close: np.ndarray, pos: np.ndarray,
+                fee_bps_per_side: float = TAKER_FEE_BPS_PER_SIDE, ret: np.ndarray | None = None) -> pd.DataFrame:
+    """
+    sharpe / maxdd / trades ต่อคอลัมน์ของ pos (bars × configs) แบบเดียวกับ run_one เดิมของ sweep_pyramid_trailing:
+    ถือ pos ของแท่งก่อน, หักค่าธรรมเนียมไปกลับทุกแท่งที่ pos เปลี่ยน
+    คอลัมน์ที่ pos ซ้ำกัน (เช่น layers ที่ไม่เคยได้ pyramid) คำนวณครั้งเดียว; ret = bar_returns(close) ที่มีอยู่แล้ว
+    """
+    close = np.asarray(close, dtype=float)
+    pos = np.asfortranarray(np.asarray(pos).reshape(len(close), -1))
+    ret = bar_returns(close) if ret is None else ret
+    fee = (fee_bps_per_side / 10000.0) * 2.0
+    net = np.empty(len(close))
+    seen: dict[bytes, tuple] = {}
+    rows = []
+    for j in range(pos.shape[1]):
+        key = hashlib.blake2b(pos[:, j]).digest()
+        if key not in seen:
+            maxdd, turns = pnl_path_kernel(ret, pos[:, j], fee, net)
+            seen[key] = (sharpe(net, ddof=1), float(maxdd), turns // 2)
+        rows.append(seen[key])
+    return pd.DataFrame(rows, columns=["sharpe", "maxdd", "trades"])
+
+def simulate_positions_batch(
+    close: np.ndarray,
+    atr_values: np.ndarray,
+    target: np.ndarray,
+    atr_mult=3.0,
+    pyramid_step_atr=1.2,
+    max_layers=0,
+    cooldown_bars=8,
+    flatten_on_opposite: bool = True,
+    max_pos: int = MAX_POS_TOTAL,
+    fee_bps_per_side: float = TAKER_FEE_BPS_PER_SIDE,
+) -> tuple[np.ndarray, pd.DataFrame]:
+    """
+    simulate_positions หลาย config ในครั้งเดียวบนราคา/ATR/เป้าหมายชุดเดียวกัน
+    atr_mult / pyramid_step_atr / max_layers / cooldown_bars = เวกเตอร์ยาวเท่ากัน (หรือสเกลาร์ → broadcast)
+    คืน (pos int8 bars × configs, DataFrame ต่อ config: พารามิเตอร์ + pnl_summary)
+    ความเร็วต้องใช้ numba (requirements.txt): ทาง fallback วนลูป Python ทีละ config → ~เวลารันเดี่ยว × จำนวน config
+    """
+    pos = position_batch_kernel(close, atr_values, target, atr_mult, pyramid_step_atr, max_layers,
+                                cooldown_bars, flatten_on_opposite, max_pos)
+    am, st, ly, cd = np.broadcast_arrays(atr_mult, pyramid_step_atr, max_layers, cooldown_bars)
+    cfg = pd.DataFrame({"atr_mult": am.astype(float), "step_atr": st.astype(float),
+                        "layers": ly.astype(int), "cooldown": cd.astype(int)})
+    return pos, pd.concat([cfg, pnl_summary(close, pos, fee_bps_per_side)], axis=1)
+
 def generate_position_series(
     df: pd.DataFrame,
-    sig: pd.DataFrame,
+    sig: pd.DataFrame | pd.Series,
     atr_n: int = 14,
     atr_mult: float = 3.0,
     pyramid_step_atr: float = 1.2,
@@ -30,75 +117,9 @@ def generate_position_series(
     if n == 0: return pd.Series(dtype=float)
 
     base = base_target_from_signals(sig, vote_required=vote_required).reindex(idx)
-    a = atr(df, n=atr_n).reindex(idx)
-    fill = np.nanmedian(a.dropna()) if a.notna().any() else 1e-6
-    a = a.fillna(method="ffill").fillna(method="bfill").fillna(fill)
-
-    pos = np.zeros(n, dtype=float)
-    px = df["close"].values
-    cur_pos = 0; avg_entry = np.nan; layers = 0
-    peak = trough = trail = None
-    last_change_i = -10**9
-
-    for i in range(n):
-        price = float(px[i]); ai = float(max(1e-9, a.iat[i])); bt = int(base.iat[i])
-
-        # trailing stop
-        if cur_pos > 0:
-            peak = price if peak is None else max(peak, price)
-            t = peak - atr_mult * ai
-            trail = t if trail is None else max(trail, t)
-            if price <= trail:
-                cur_pos = 0; avg_entry = np.nan; layers = 0
-                peak = trough = trail = None; last_change_i = i
-        elif cur_pos < 0:
-            trough = price if trough is None else min(trough, price)
-            t = trough + atr_mult * ai
-            trail = t if trail is None else min(trail, t)
-            if price >= trail:
-                cur_pos = 0; avg_entry = np.nan; layers = 0
-                peak = trough = trail = None; last_change_i = i
-
-        # ตรงข้ามแรง -> ปิดก่อน
-        if flatten_on_opposite and cur_pos != 0 and bt * cur_pos < 0:
-            cur_pos = 0; avg_entry = np.nan; layers = 0
-            peak = trough = trail = None; last_change_i = i
-
-        # เปิดไม้แรกต้องพ้นคูลดาวน์
-        can_open = (i - last_change_i) >= cooldown_bars
-        if cur_pos == 0:
-            if can_open:
-                if bt > 0:
-                    cur_pos = 1; avg_entry = price; layers = 0
-                    peak = price; trough = None; trail = peak - atr_mult * ai; last_change_i = i
-                elif bt < 0:
-                    cur_pos = -1; avg_entry = price; layers = 0
-                    trough = price; peak = None; trail = trough + atr_mult * ai; last_change_i = i
-        else:
-            # Pyramiding เฉพาะกำไร
-            if max_layers > 0:
-                if cur_pos > 0 and bt > cur_pos and layers < max_layers:
-                    trigger = avg_entry + (layers + 1) * pyramid_step_atr * ai
-                    if price >= trigger:
-                        add = min(1, MAX_POS_TOTAL - cur_pos)
-                        if add > 0:
-                            avg_entry = (avg_entry * cur_pos + price * add) / (cur_pos + add)
-                            cur_pos += add; layers += 1
-                            peak = price if peak is None else max(peak, price)
-                            trail = max(trail or (peak - atr_mult * ai), peak - atr_mult * ai)
-                elif cur_pos < 0 and bt < cur_pos and layers < max_layers:
-                    trigger = avg_entry - (layers + 1) * pyramid_step_atr * ai
-                    if price <= trigger:
-                        add = min(1, MAX_POS_TOTAL - abs(cur_pos))
-                        if add > 0:
-                            avg_entry = (avg_entry * abs(cur_pos) + price * add) / (abs(cur_pos) + add)
-                            cur_pos -= add; layers += 1
-                            trough = price if trough is None else min(trough, price)
-                            trail = min(trail or (trough + atr_mult * ai), trough + atr_mult * ai)
-
-        cur_pos = max(-MAX_POS_TOTAL, min(MAX_POS_TOTAL, cur_pos))
-        pos[i] = cur_pos
-
-    return pd.Series(pos, index=idx, name="pos")
-'@
-Set-Content -Encoding utf8 core\position_manager.py $pm
+    res = simulate_positions(
+        df["close"].to_numpy(dtype=float), _filled_atr(df, atr_n), base.to_numpy(dtype=np.int64),
+        atr_mult=atr_mult, pyramid_step_atr=pyramid_step_atr, max_layers=max_layers,
+        flatten_on_opposite=flatten_on_opposite, cooldown_bars=cooldown_bars,
+    )
+    return pd.Series(res["pos"], index=idx, name="pos")
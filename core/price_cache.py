@@ -0,0 +1,325 @@
+from __future__ import annotations
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import LOCAL_TZ, PRICE_CACHE_DIR
+
+CACHE_VERSION = 1
+_HASH_SPAN = 1 << 20  # แฮชหัว/ท้าย 1 MiB ของส่วนเดิม: เช็คเร็ว ๆ ตอนไฟล์โตแบบต่อท้าย (read_appended) เท่านั้น
+
+
+def cache_dir_for(csv_path: Path) -> Path:
+    """โฟลเดอร์แคชของ CSV: ข้างไฟล์ (<name>.cache) หรือใต้ LBOT_CACHE_DIR ถ้าตั้งไว้"""
+    csv_path = Path(csv_path).resolve()
+    if PRICE_CACHE_DIR is None:
+        return csv_path.with_name(csv_path.name + ".cache")
+    tag = hashlib.sha1(str(csv_path).encode("utf-8")).hexdigest()[:10]
+    return PRICE_CACHE_DIR / f"{csv_path.stem}-{tag}.cache"
+
+
+def _sha1_range(path: Path, start: int, stop: int) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        f.seek(start)
+        left = max(0, stop - start)
+        while left > 0:
+            buf = f.read(min(left, 1 << 16))
+            if not buf:
+                break
+            h.update(buf)
+            left -= len(buf)
+    return h.hexdigest()
+
+
+def file_fingerprint(path: Path, size: int | None = None) -> dict:
+    """
+    ลายนิ้วมือไฟล์ = size + mtime + sha1 ของหัว/ท้ายไฟล์ (ช่วง [0, size))
+    ใช้เช็คว่าแคชยังตรงกับ CSV อยู่หรือไม่
+    """
+    path = Path(path)
+    st = path.stat()
+    size = st.st_size if size is None else size
+    head = min(size, _HASH_SPAN)
+    return {
+        "size": int(size),
+        "mtime_ns": int(st.st_mtime_ns),
+        "head_sha1": _sha1_range(path, 0, head),
+        "tail_sha1": _sha1_range(path, max(0, size - _HASH_SPAN), size),
+    }
+
+
+def _same_content(path: Path, fp: dict) -> bool:
+    """
+    size + mtime ตรง = ไฟล์เดิม; mtime เปลี่ยน → ถือว่าเปลี่ยน (parse ใหม่)
+    ไม่ใช้แฮชหัว/ท้ายตรงนี้: แก้ค่ากลางไฟล์แบบขนาดเท่าเดิม (เช่น 2401.50 → 2401.70) แฮชหัว/ท้ายจับไม่ได้
+    """
+    st = path.stat()
+    return st.st_size == fp["size"] and st.st_mtime_ns == fp["mtime_ns"]
+
+
+def read_meta(cache_dir: Path) -> dict | None:
+    try:
+        with open(cache_dir / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != CACHE_VERSION:
+        return None
+    return meta
+
+
+def is_fresh(csv_path: Path, meta: dict | None) -> bool:
+    if not meta or meta.get("tz") != str(LOCAL_TZ):
+        return False
+    try:
+        return _same_content(Path(csv_path), meta["source"])
+    except (OSError, KeyError):
+        return False
+
+
+def _column_arrays(df: pd.DataFrame) -> tuple[dict[str, np.ndarray], list[dict]] | None:
+    """แปลง frame เป็นอาเรย์รายคอลัมน์; time → int64 epoch ns (UTC). คอลัมน์ที่ไม่ใช่ตัวเลข → ไม่แคช"""
+    arrays: dict[str, np.ndarray] = {}
+    cols: list[dict] = []
+    for name in df.columns:
+        s = df[name]
+        if name == "time":
+            unit = getattr(s.dtype, "unit", "ns")
+            arr = s.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy().astype("datetime64[ns]").view("i8")
+            cols.append({"name": name, "dtype": "<i8", "time_unit": unit})
+        elif pd.api.types.is_numeric_dtype(s.dtype) or pd.api.types.is_bool_dtype(s.dtype):
+            arr = s.to_numpy()
+            if arr.dtype == object:
+                return None
+            cols.append({"name": name, "dtype": arr.dtype.newbyteorder("<").str})
+        else:
+            return None
+        arrays[name] = np.ascontiguousarray(arr)
+    return arrays, cols
+
+
+def _write_meta(cache_dir: Path, meta: dict):
+    tmp = cache_dir / "meta.json.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+    os.replace(tmp, cache_dir / "meta.json")
+
+
+def write_cache(csv_path: Path, df: pd.DataFrame, fingerprint: dict | None = None) -> Path | None:
+    """
+    เขียนแคช (atomic: เขียนลงโฟลเดอร์ชั่วคราวแล้ว rename)
+    คืน None ถ้าแคชไม่ได้ (คอลัมน์ไม่ใช่ตัวเลข / เขียนดิสก์ไม่ได้)
+    """
+    csv_path = Path(csv_path)
+    packed = _column_arrays(df)
+    if packed is None:
+        return None
+    arrays, cols = packed
+    fp = fingerprint or file_fingerprint(csv_path)
+    cache_dir = cache_dir_for(csv_path)
+    tmp = cache_dir.with_name(cache_dir.name + f".tmp{os.getpid()}")
+    try:
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        for c in cols:
+            arrays[c["name"]].astype(c["dtype"], copy=False).tofile(tmp / f"{c['name']}.bin")
+        meta = {
+            "version": CACHE_VERSION,
+            "tz": str(LOCAL_TZ),
+            "rows": int(len(df)),
+            "columns": cols,
+            "csv_columns": list(pd.read_csv(csv_path, nrows=0).columns),
+            "last_time_ns": int(arrays["time"][-1]) if len(df) else None,
+            "source": fp,
+        }
+        _write_meta(tmp, meta)
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        os.replace(tmp, cache_dir)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        return None
+    return cache_dir
+
+
+def _time_series(ns: np.ndarray, unit: str) -> pd.Series:
+    t = ns.view("datetime64[ns]")
+    if unit != "ns":
+        t = t.astype(f"datetime64[{unit}]")
+    return pd.Series(t).dt.tz_localize("UTC").dt.tz_convert(LOCAL_TZ)
+
+
+def read_cache(cache_dir: Path, meta: dict) -> pd.DataFrame:
+    rows = meta["rows"]
+    data = {}
+    for c in meta["columns"]:
+        arr = np.fromfile(cache_dir / f"{c['name']}.bin", dtype=c["dtype"], count=rows)
+        if len(arr) != rows:
+            raise ValueError(f"cache column truncated: {c['name']} :: {cache_dir}")
+        data[c["name"]] = _time_series(arr, c.get("time_unit", "ns")) if c["name"] == "time" else arr
+    return pd.DataFrame(data)
+
+
+def load_cached(csv_path: Path) -> pd.DataFrame | None:
+    """คืน frame จากแคชถ้ายังสด มิฉะนั้น None"""
+    cache_dir = cache_dir_for(csv_path)
+    meta = read_meta(cache_dir)
+    if not is_fresh(csv_path, meta):
+        return None
+    try:
+        return read_cache(cache_dir, meta)
+    except (OSError, ValueError):
+        return None
+
+
+# ---------- incremental tail-append ----------
+def read_appended(csv_path: Path, source: dict, names: list[str]) -> tuple[pd.DataFrame, dict] | None:
+    """
+    อ่านเฉพาะไบต์ที่ต่อท้ายหลัง source['size'] (O(แถวใหม่))
+    คืน (แถวใหม่แบบดิบ, fingerprint ใหม่) หรือ None ถ้าไม่ใช่การต่อท้าย (ไฟล์สั้นลง/ส่วนต้นถูกแก้) → ต้องโหลดใหม่ทั้งไฟล์
+    """
+    csv_path = Path(csv_path)
+    offset = int(source["size"])
+    size = csv_path.stat().st_size
+    if size < offset or offset == 0:
+        return None
+    if size == offset:
+        return (pd.DataFrame(columns=names), source) if _same_content(csv_path, source) else None
+
+    prefix = file_fingerprint(csv_path, size=offset)
+    if prefix["head_sha1"] != source["head_sha1"] or prefix["tail_sha1"] != source["tail_sha1"]:
+        return None
+    with open(csv_path, "rb") as f:
+        if offset > 0:
+            f.seek(offset - 1)
+            at_line_start = f.read(1) in (b"\n", b"\r")
+        else:
+            at_line_start = True
+        raw = f.read(size - offset)
+    # แถวเดิมถูกเขียนต่อ (เคยอ่านบรรทัดที่ยังเขียนไม่เสร็จ) → ไม่ใช่การต่อท้ายแบบปลอดภัย
+    if not at_line_start and raw[:1] not in (b"\n", b"\r"):
+        return None
+
+    # อ่านถึง \n ตัวสุดท้ายเท่านั้น: บรรทัดท้ายที่ผู้เขียนยังเขียนไม่จบ → ไว้อ่านรอบหน้า (fingerprint หยุดก่อนบรรทัดนั้น)
+    raw = raw[:raw.rfind(b"\n") + 1]
+    if not raw:
+        return pd.DataFrame(columns=names), source
+    new = pd.read_csv(io.BytesIO(raw), header=None, names=names) if raw.strip() else pd.DataFrame(columns=names)
+    return new, file_fingerprint(csv_path, size=offset + len(raw))
+
+
+def is_ordered_after(last_time_ns: int | None, time_ns: np.ndarray) -> bool:
+    """แถวใหม่ต้องเรียงเวลาเพิ่มขึ้นแบบ strict และใหม่กว่าแถวท้ายเดิม (ไม่งั้นผลต่างจากการ sort ทั้งไฟล์)"""
+    if len(time_ns) == 0:
+        return True
+    if last_time_ns is not None and time_ns[0] <= last_time_ns:
+        return False
+    return bool(np.all(np.diff(time_ns) > 0))
+
+
+def append_rows(csv_path: Path, new: pd.DataFrame, prev_source: dict, source: dict) -> bool:
+    """ต่อท้ายคอลัมน์ในแคชบนดิสก์ (ต้องเป็นแคชของ prev_source และ schema เดียวกัน)"""
+    cache_dir = cache_dir_for(csv_path)
+    meta = read_meta(cache_dir)
+    if not meta or meta["source"] != prev_source or meta.get("tz") != str(LOCAL_TZ):
+        return False
+    if len(new) == 0:
+        arrays, cols = {}, []
+    else:
+        packed = _column_arrays(new)
+        if packed is None or packed[1] != meta["columns"]:
+            return False
+        arrays, cols = packed
+        if not is_ordered_after(meta.get("last_time_ns"), arrays["time"]):
+            return False
+    rows = meta["rows"]
+    try:
+        for c in cols:
+            # ตัดไบต์ที่อาจค้างจากการเขียนรอบก่อนที่ล้มกลางทาง แล้วค่อยต่อท้าย
+            with open(cache_dir / f"{c['name']}.bin", "r+b") as f:
+                f.truncate(rows * np.dtype(c["dtype"]).itemsize)
+                f.seek(0, os.SEEK_END)
+                arrays[c["name"]].astype(c["dtype"], copy=False).tofile(f)
+        meta["rows"] = rows + len(new)
+        if len(new):
+            meta["last_time_ns"] = int(arrays["time"][-1])
+        meta["source"] = source
+        _write_meta(cache_dir, meta)
+    except OSError:
+        return False
+    return True
+
+
+def update_cache(csv_path: Path, finish) -> pd.DataFrame | None:
+    """
+    แคชบนดิสก์ตามไม่ทัน CSV → parse เฉพาะแถวต่อท้าย แล้ว append เข้าแคช
+    finish: ฟังก์ชันแปลงแถวดิบ (เช่นแปลงเวลา/คำนวณคอลัมน์เสริม) แบบเดียวกับตอนโหลดเต็ม
+    คืนแถวใหม่ หรือ None ถ้าต้อง rebuild ทั้งไฟล์
+    """
+    meta = read_meta(cache_dir_for(csv_path))
+    if not meta or meta.get("tz") != str(LOCAL_TZ) or "csv_columns" not in meta:
+        return None
+    try:
+        got = read_appended(csv_path, meta["source"], meta["csv_columns"])
+        if got is None:
+            return None
+        raw, source = got
+        new = finish(raw) if len(raw) else raw
+    except (OSError, ValueError):
+        return None
+    if source == meta["source"]:
+        return new
+    return new if append_rows(csv_path, new, meta["source"], source) else None
+
+
+def main():
+    from core.data_loader import parse_price_csv
+    from config import DATA_FILE
+
+    ap = argparse.ArgumentParser(description="pre-warm / rebuild binary price cache")
+    ap.add_argument("path", nargs="?", default=str(DATA_FILE))
+    ap.add_argument("--rebuild", action="store_true", help="ลบแคชเดิมแล้วสร้างใหม่")
+    args = ap.parse_args()
+
+    csv_path = Path(args.path)
+    if not csv_path.exists():
+        raise FileNotFoundError(f"missing price file: {csv_path}")
+    cache_dir = cache_dir_for(csv_path)
+    if args.rebuild:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    meta = read_meta(cache_dir)
+    if not is_fresh(csv_path, meta):
+        fp = file_fingerprint(csv_path)
+        t0 = time.perf_counter()
+        df = parse_price_csv(csv_path)
+        t_parse = time.perf_counter() - t0
+        if write_cache(csv_path, df, fp) is None:
+            print(f"[!] cache not written (non-numeric columns or read-only dir): {cache_dir}")
+            return
+        print(f"[i] built cache rows={len(df)} parse={t_parse:.3f}s -> {cache_dir}")
+    else:
+        t0 = time.perf_counter()
+        parse_price_csv(csv_path)
+        t_parse = time.perf_counter() - t0
+        print(f"[i] cache fresh rows={meta['rows']} -> {cache_dir}")
+
+    t0 = time.perf_counter()
+    df = load_cached(csv_path)
+    t_cache = time.perf_counter() - t0
+    if df is None:
+        print("[!] cache unreadable")
+        return
+    print(f"[i] csv parse={t_parse:.3f}s  cache load={t_cache:.3f}s  speedup={t_parse / max(t_cache, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
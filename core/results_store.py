@@ -0,0 +1,143 @@
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import asdict, is_dataclass
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_DB = ROOT / "backtests" / "results.sqlite"
+# ไฟล์ที่ผลของ run_backtest ขึ้นอยู่ → แก้ไฟล์ไหน = code version ใหม่ = cache เดิมไม่ถูกใช้
+STRATEGY_FILES = ("core/backtest.py", "core/kernels.py", "core/indicators.py", "core/metrics.py", "config.py")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key            TEXT PRIMARY KEY,
+    sweep          TEXT,
+    tag            TEXT,
+    params         TEXT,
+    code_version   TEXT,
+    data_fp        TEXT,
+    sharpe         REAL,
+    maxdd          REAL,
+    trades         INTEGER,
+    trades_per_day REAL,
+    row            TEXT,
+    created        REAL
+);
+CREATE INDEX IF NOT EXISTS results_sharpe ON results (sharpe);
+"""
+
+
+def code_version(files=STRATEGY_FILES) -> str:
+    """แฮชของซอร์สกลยุทธ์ (เนื้อไฟล์ ไม่ใช่ mtime)"""
+    h = hashlib.sha1()
+    for rel in files:
+        p = ROOT / rel
+        h.update(rel.encode("utf-8"))
+        h.update(p.read_bytes() if p.exists() else b"")
+    return h.hexdigest()[:16]
+
+
+def data_fingerprint(arrays: dict[str, np.ndarray], names=("close", "high", "low")) -> str:
+    """แฮชของอาร์เรย์ราคาที่เซลล์ใช้จริง (หน้าต่างหลังตัด tail) → ข้อมูลเปลี่ยน/ต่อท้าย = key ใหม่"""
+    h = hashlib.blake2b(digest_size=16)
+    for name in names:
+        a = np.ascontiguousarray(arrays[name])
+        h.update(f"{name}:{a.dtype.str}:{a.shape}".encode("utf-8"))
+        h.update(a.data)
+    return h.hexdigest()
+
+
+def _params_dict(params) -> dict:
+    return asdict(params) if is_dataclass(params) else dict(params)
+
+
+def cell_key(params, code: str, data_fp: str) -> str:
+    """key ของเซลล์ = แฮชของ (พารามิเตอร์ทั้งหมด, code version, data fingerprint)"""
+    blob = json.dumps({"params": _params_dict(params), "code": code, "data": data_fp},
+                      sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResultsStore:
+    """
+    ผลของแต่ละเซลล์ใน SQLite (content-addressed ด้วย cell_key) → สวีปซ้ำข้ามเซลล์ที่มีแล้ว / ต่อจากที่ค้าง
+    บันทึกทีละเซลล์ (commit ทันที) ให้เครื่องดับกลางทางแล้วยังเก็บเซลล์ที่เสร็จไว้ได้; เขียนจากโปรเซสหลักเท่านั้น
+    """
+    def __init__(self, path: Path | str = DEFAULT_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(self.path))
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get(self, key: str) -> dict | None:
+        r = self.db.execute("SELECT row FROM results WHERE key = ?", (key,)).fetchone()
+        return json.loads(r["row"]) if r else None
+
+    def put(self, key: str, row: dict, params, code: str, data_fp: str, sweep: str = ""):
+        """row = แถวผลแบบที่สคริปต์เขียนลง CSV (ต้องมี sharpe/maxdd/trades/trades_per_day)"""
+        self.db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?,?,?,?,?,?,?,?,?,?,?,?)",
+            (key, sweep, row.get("tag", ""), json.dumps(_params_dict(params), sort_keys=True, default=str),
+             code, data_fp, row.get("sharpe"), row.get("maxdd"), row.get("trades"), row.get("trades_per_day"),
+             json.dumps(row, default=str), time.time()),
+        )
+        self.db.commit()
+
+    def top(self, k: int = 10, min_trades_per_day: float | None = None, max_dd: float | None = None,
+            sweep: str | None = None, code: str | None = None) -> list[dict]:
+        """top-k ตาม Sharpe จากประวัติทุกครั้งที่เคยรัน (ไม่รันอะไรใหม่)"""
+        q, args = "SELECT * FROM results WHERE sharpe IS NOT NULL", []
+        if min_trades_per_day is not None:
+            q += " AND trades_per_day >= ?"; args.append(min_trades_per_day)
+        if max_dd is not None:
+            q += " AND maxdd <= ?"; args.append(max_dd)
+        if sweep:
+            q += " AND sweep = ?"; args.append(sweep)
+        if code:
+            q += " AND code_version = ?"; args.append(code)
+        q += " ORDER BY sharpe DESC, trades_per_day DESC LIMIT ?"; args.append(int(k))
+        return [dict(r) for r in self.db.execute(q, args)]
+
+    def stats(self) -> dict:
+        r = self.db.execute("SELECT COUNT(*) n, COUNT(DISTINCT code_version) codes, "
+                            "COUNT(DISTINCT data_fp) datas FROM results").fetchone()
+        return dict(r)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="query accumulated sweep results")
+    ap.add_argument("--db", default=str(DEFAULT_DB))
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--min_trades_per_day", type=float, default=3.0)
+    ap.add_argument("--max_dd", type=float, default=None)
+    ap.add_argument("--sweep", default=None, help="เช่น stage1 / stage2")
+    ap.add_argument("--current_code", action="store_true", help="เฉพาะผลของซอร์สเวอร์ชันปัจจุบัน")
+    args = ap.parse_args()
+
+    with ResultsStore(args.db) as store:
+        print(f"[i] {store.stats()}  code={code_version()}")
+        rows = store.top(args.top, args.min_trades_per_day, args.max_dd, args.sweep,
+                         code_version() if args.current_code else None)
+        for i, r in enumerate(rows, 1):
+            print(f"{i:>2}) sharpe={r['sharpe']:.4f} maxdd={r['maxdd']:.4f} trades/day={r['trades_per_day']:.2f}"
+                  f"  [{r['sweep']}] {r['tag']}  {r['params']}")
+
+
+if __name__ == "__main__":
+    main()
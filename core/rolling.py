@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import numpy as np
+
+from core.metrics import ANN_BAR, BARS_PER_DAY
+
+# เมตริกแบบหน้าต่างเลื่อน (ยาว w แท่ง) ของอาร์เรย์ 1D (แท่ง) หรือ 2D (แท่ง × config) — O(n) ต่อขนาดหน้าต่าง
+#   ผลรวม/จำนวนในหน้าต่าง = ผลต่างของผลรวมสะสม
+#   max/min และ MaxDD ในหน้าต่าง = แบ่งเป็นบล็อกยาว w (van Herk / Gil-Werman):
+#     หน้าต่าง [t-w+1, t] = ส่วนท้ายของบล็อกหนึ่ง + ส่วนต้นของบล็อกถัดไป → accumulate ภายในบล็อกครั้งเดียว
+# แท่งที่ยังไม่ครบหน้าต่าง (t < w-1) = NaN
+
+
+def _2d(a) -> tuple[np.ndarray, bool]:
+    a = np.asarray(a, dtype=float)
+    return (a[:, None], True) if a.ndim == 1 else (a, False)
+
+
+def _ret(out: np.ndarray, flat: bool) -> np.ndarray:
+    return out[:, 0] if flat else out
+
+
+def _window_sum(x: np.ndarray, w: int) -> np.ndarray:
+    """ผลรวมของ x[t-w+1 .. t] ต่อแท่ง (NaN ก่อนครบ)"""
+    cs = np.zeros((x.shape[0] + 1,) + x.shape[1:])
+    np.cumsum(x, axis=0, out=cs[1:])
+    out = np.full(x.shape, np.nan)
+    out[w - 1:] = cs[w:] - cs[:-w]
+    return out
+
+
+def _blocks(x: np.ndarray, w: int) -> np.ndarray:
+    """(แท่ง, k) → (บล็อก, w, k) เติมท้ายด้วยค่าสุดท้ายให้ครบบล็อก (ส่วนที่เติมไม่ถูกใช้ในผล)"""
+    n = x.shape[0]
+    nb = -(-n // w)
+    pad = nb * w - n
+    if pad:
+        x = np.concatenate([x, np.repeat(x[-1:], pad, axis=0)])
+    return x.reshape(nb, w, -1)
+
+
+def _split(n: int, w: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # ต่อแท่งปลาย t (t >= w-1): s = จุดเริ่มหน้าต่าง, aligned = หน้าต่างตรงบล็อกพอดี (s อยู่ต้นบล็อก)
+    t = np.arange(w - 1, n)
+    s = t - w + 1
+    return t, s, s % w == 0
+
+
+def rolling_extreme(x, window: int, fn=np.maximum) -> np.ndarray:
+    """max (fn=np.maximum) / min (fn=np.minimum) ของ x[t-w+1 .. t]"""
+    x, flat = _2d(x)
+    n, w = x.shape[0], int(window)
+    out = np.full(x.shape, np.nan)
+    if w < 1 or n < w:
+        return _ret(out, flat)
+    b = _blocks(x, w)
+    pre = fn.accumulate(b, axis=1).reshape(-1, x.shape[1])
+    suf = fn.accumulate(b[:, ::-1], axis=1)[:, ::-1].reshape(-1, x.shape[1])
+    t, s, _ = _split(n, w)
+    out[w - 1:] = fn(suf[s], pre[t])
+    return _ret(out, flat)
+
+
+def rolling_sharpe(r, window: int, ann: float = ANN_BAR, ddof: int = 1) -> np.ndarray:
+    """
+    mean / std * ann ของรีเทิร์นต่อแท่งในหน้าต่าง (std = 0 → 0)
+    ลบค่าเฉลี่ยทั้งคอลัมน์ก่อนทำผลรวมสะสม (mean/var ไม่เปลี่ยน) ลดการหักล้างของ sum(x²) - sum(x)²/w
+    """
+    r, flat = _2d(r)
+    w = int(window)
+    out = np.full(r.shape, np.nan)
+    if w <= ddof or r.shape[0] < w:
+        return _ret(out, flat)
+    mu = r.mean(axis=0)
+    c = r - mu
+    s1 = _window_sum(c, w)[w - 1:]
+    s2 = _window_sum(c * c, w)[w - 1:]
+    var = np.maximum(s2 - s1 * s1 / w, 0.0) / (w - ddof)
+    sd = np.sqrt(var)
+    mean = s1 / w + mu
+    out[w - 1:] = np.divide(mean, sd, out=np.zeros_like(mean), where=sd > 1e-15) * ann
+    return _ret(out, flat)
+
+
+def rolling_drawdown(equity, window: int) -> np.ndarray:
+    """ระยะจาก peak ของหน้าต่าง ณ แท่งปัจจุบัน: 1 - equity / max(equity ในหน้าต่าง)"""
+    eq, flat = _2d(equity)
+    return _ret(1.0 - eq / rolling_extreme(eq, window, np.maximum), flat)
+
+
+def rolling_max_drawdown(equity, window: int) -> np.ndarray:
+    """
+    MaxDD (สัดส่วน) ภายในหน้าต่าง: peak ต้องอยู่ในหน้าต่างด้วย
+    ทำบน log equity: หน้าต่าง = ส่วนท้ายบล็อก A + ส่วนต้นบล็อก B →
+      max(MaxDD ใน A-ท้าย, MaxDD ใน B-ต้น, max(A-ท้าย) - min(B-ต้น))
+    """
+    eq, flat = _2d(equity)
+    n, w = eq.shape[0], int(window)
+    out = np.full(eq.shape, np.nan)
+    if w < 1 or n < w:
+        return _ret(out, flat)
+    if np.any(eq <= 0):
+        raise ValueError("equity must be positive for a log-space drawdown")
+    k = eq.shape[1]
+    b = _blocks(np.log(eq), w)
+    pre_max = np.maximum.accumulate(b, axis=1)
+    pre_min = np.minimum.accumulate(b, axis=1)
+    pre_dd = np.maximum.accumulate(pre_max - b, axis=1)             # MaxDD ของ [ต้นบล็อก, t]
+    rb = b[:, ::-1]
+    suf_min = np.minimum.accumulate(rb, axis=1)
+    suf_max = np.maximum.accumulate(rb, axis=1)[:, ::-1]
+    suf_dd = np.maximum.accumulate(rb - suf_min, axis=1)[:, ::-1]   # MaxDD ของ [s, ท้ายบล็อก]
+    pre_min, pre_dd = pre_min.reshape(-1, k), pre_dd.reshape(-1, k)
+    suf_max, suf_dd = suf_max.reshape(-1, k), suf_dd.reshape(-1, k)
+    t, s, aligned = _split(n, w)
+    cross = np.maximum(np.maximum(suf_dd[s], pre_dd[t]), suf_max[s] - pre_min[t])
+    out[w - 1:] = -np.expm1(-np.where(aligned[:, None], pre_dd[t], cross))
+    return _ret(out, flat)
+
+
+def rolling_hit_rate(pnl, window: int, mask=None) -> np.ndarray:
+    """
+    สัดส่วนที่ pnl > 0 ในหน้าต่าง นับเฉพาะแท่งที่ mask (ไม่ระบุ = pnl != 0)
+    pnl ต่อแท่ง → hit rate รายแท่ง; pnl ของไม้ที่แท่งปิด (trade_pnl_at_marks) → win rate รายไม้; ไม่มีเลย → NaN
+    """
+    p, flat = _2d(pnl)
+    m = (p != 0) if mask is None else _2d(mask)[0].astype(bool)
+    w = int(window)
+    out = np.full(p.shape, np.nan)
+    if w < 1 or p.shape[0] < w:
+        return _ret(out, flat)
+    wins = _window_sum((m & (p > 0)).astype(float), w)
+    cnt = _window_sum(m.astype(float), w)
+    np.divide(wins, cnt, out=out, where=cnt > 0)
+    return _ret(out, flat)
+
+
+def trade_pnl_at_marks(equity, marks) -> np.ndarray:
+    """รีเทิร์นของแต่ละไม้วางไว้ที่แท่งที่ไม้จบ: equity ตอนจบ / equity ตอนไม้ก่อนจบ - 1 (แท่งอื่น = 0)"""
+    eq, flat = _2d(equity)
+    mk = _2d(marks)[0].astype(bool)
+    out = np.zeros(eq.shape)
+    for j in range(eq.shape[1]):
+        idx = np.flatnonzero(mk[:, j])
+        if len(idx):
+            prev = np.r_[0, idx[:-1]]
+            out[idx, j] = eq[idx, j] / np.where(eq[prev, j] == 0, 1.0, eq[prev, j]) - 1.0
+    return _ret(out, flat)
+
+
+def days_to_bars(days: float, bars_per_day: int = BARS_PER_DAY) -> int:
+    return max(int(round(days * bars_per_day)), 1)
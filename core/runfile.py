@@ -0,0 +1,214 @@
+from __future__ import annotations
+import argparse
+import io
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# ผลรันของ backtest แบบไบนารีมีเวอร์ชัน (แทน out.txt 9 คอลัมน์ไม่มี header):
+#   <name>.run/       โฟลเดอร์: คอลัมน์ละไฟล์ <col>.bin (little-endian ตาม dtype) + meta.json — อ่านแบบ memmap
+#   <name>.run.npz    ไฟล์เดียวบีบอัด (คอลัมน์ + "meta" เป็น JSON) สำหรับเก็บ archive จำนวนมาก (backtests/runs/)
+# meta.json = sidecar: format / version / rows / columns (schema) + params / metrics / enters / exits ของรันนั้น
+# idx ของ out.txt = ลำดับแท่ง 0..rows-1 → ไม่เก็บ (Run.idx สร้างให้)
+
+RUN_FORMAT = "lbot.run"
+RUN_VERSION = 1
+RUN_COLUMNS = {
+    "close": "<f8",
+    "want_long": "|i1", "want_short": "|i1",
+    "enter_long": "|i1", "enter_short": "|i1", "exit_pos": "|i1", "pos": "|i1",
+    "equity": "<f8",
+}
+LEGACY_COLUMNS = ["idx", *RUN_COLUMNS]   # ลำดับคอลัมน์ของ out.txt (core.backtest.OUT_COLUMNS)
+
+
+def run_path(path, compress: bool = False) -> Path:
+    """'backtests/out' / 'out.run' / 'out.run.npz' → path ของรัน (ไม่มีนามสกุล → เติมตาม compress)"""
+    path = Path(path)
+    if path.name.endswith((".run", ".run.npz")):
+        return path
+    return path.with_name(path.name + (".run.npz" if compress else ".run"))
+
+
+def _meta(rows: int, meta: dict) -> dict:
+    return {"format": RUN_FORMAT, "version": RUN_VERSION, "rows": int(rows),
+            "columns": [{"name": k, "dtype": v} for k, v in RUN_COLUMNS.items()],
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), **meta}
+
+
+def _check(meta: dict, where) -> dict:
+    if meta.get("format") != RUN_FORMAT:
+        raise ValueError(f"not a {RUN_FORMAT} file: {where}")
+    if int(meta.get("version", 0)) > RUN_VERSION:
+        raise ValueError(f"{where}: format version {meta['version']} is newer than supported ({RUN_VERSION})")
+    return meta
+
+
+class RunWriter:
+    """
+    เขียนรันแบบโฟลเดอร์ทีละก้อน (append) ไม่ต้องถือทั้งรันในหน่วยความจำ
+    เขียนลงโฟลเดอร์ชั่วคราว → close() เขียน meta.json แล้ว rename แทนของเดิม (atomic แบบ price_cache)
+    """
+    def __init__(self, path, **meta):
+        self.path = run_path(path)
+        self.meta = meta
+        self.rows = 0
+        self._tmp = self.path.with_name(self.path.name + f".tmp{os.getpid()}")
+        shutil.rmtree(self._tmp, ignore_errors=True)
+        self._tmp.mkdir(parents=True)
+        self._files = {k: open(self._tmp / f"{k}.bin", "wb") for k in RUN_COLUMNS}
+
+    def append(self, **cols) -> int:
+        """ก้อนของทุกคอลัมน์ใน RUN_COLUMNS (ยาวเท่ากัน) → จำนวนแถวสะสม"""
+        missing = set(RUN_COLUMNS) - set(cols)
+        if missing:
+            raise ValueError(f"missing run columns: {sorted(missing)}")
+        n = {len(np.atleast_1d(v)) for v in cols.values()}
+        if len(n) != 1:
+            raise ValueError("run columns must have the same length")
+        for k, dt in RUN_COLUMNS.items():
+            np.ascontiguousarray(np.atleast_1d(cols[k]), dtype=dt).tofile(self._files[k])
+        self.rows += n.pop()
+        return self.rows
+
+    def close(self, **meta) -> Path:
+        for f in self._files.values():
+            f.close()
+        with open(self._tmp / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(_meta(self.rows, {**self.meta, **meta}), f, indent=1)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self._tmp, self.path)
+        return self.path
+
+    def abort(self):
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self._tmp, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_run(path, columns: dict, compress: bool = False, **meta) -> Path:
+    """เขียนรันทั้งก้อน: compress → .run.npz ไฟล์เดียว, ไม่งั้นโฟลเดอร์ .run (memmap ได้)"""
+    path = run_path(path, compress)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not path.name.endswith(".npz"):
+        with RunWriter(path, **meta) as w:
+            w.append(**columns)
+        return path
+    rows = len(next(iter(columns.values()))) if columns else 0
+    arrays = {k: np.ascontiguousarray(columns[k], dtype=dt) for k, dt in RUN_COLUMNS.items()}
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, meta=np.array(json.dumps(_meta(rows, meta))), **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+@dataclass
+class Run:
+    path: Path
+    meta: dict
+    columns: dict = field(repr=False)     # ชื่อ → อาร์เรย์ (memmap สำหรับโฟลเดอร์)
+
+    @property
+    def rows(self) -> int:
+        return int(self.meta["rows"])
+
+    @property
+    def idx(self) -> np.ndarray:
+        return np.arange(self.rows)
+
+    @property
+    def metrics(self) -> dict | None:
+        return self.meta.get("metrics")
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.idx if name == "idx" else self.columns[name]
+
+    def to_frame(self) -> pd.DataFrame:
+        """DataFrame คอลัมน์เดียวกับ out.txt (LEGACY_COLUMNS)"""
+        return pd.DataFrame({k: self[k] for k in LEGACY_COLUMNS})
+
+
+def read_meta(path) -> dict:
+    """meta ของรัน (ไม่แตะอาร์เรย์): โฟลเดอร์ .run / meta.json ของมัน / .run.npz"""
+    path = Path(path)
+    if path.name == "meta.json":
+        path = path.parent
+    if path.suffix == ".npz":
+        with np.load(path) as z:
+            return _check(json.loads(str(z["meta"])), path)
+    with open(path / "meta.json", "r", encoding="utf-8") as f:
+        return _check(json.load(f), path)
+
+
+def _read_legacy(path: Path) -> Run:
+    df = pd.read_csv(path, header=None, float_precision="round_trip")
+    if df.shape[1] < len(LEGACY_COLUMNS):
+        raise ValueError(f"{path}: expected {len(LEGACY_COLUMNS)} columns (see core.backtest.OUT_COLUMNS), "
+                         f"got {df.shape[1]}")
+    cols = {k: df.iloc[:, i + 1].to_numpy(dtype=dt) for i, (k, dt) in enumerate(RUN_COLUMNS.items())}
+    return Run(path, {"format": "out.txt", "version": 0, "rows": len(df)}, cols)
+
+
+def open_run(path) -> Run:
+    """
+    เปิดรัน: โฟลเดอร์ .run (memmap ต่อคอลัมน์), .run.npz (โหลดทั้งไฟล์), หรือ out.txt เดิม (parse CSV ไม่มี header)
+    path ไม่มีนามสกุลที่รู้จัก → ลอง <path>.run ก่อน
+    """
+    path = Path(path)
+    if path.name == "meta.json":
+        path = path.parent
+    if path.suffix == ".txt" or (path.is_file() and path.suffix != ".npz"):
+        return _read_legacy(path)
+    if not path.exists() and run_path(path).exists():
+        path = run_path(path)
+    meta = read_meta(path)
+    rows = int(meta["rows"])
+    if path.suffix == ".npz":
+        with np.load(path) as z:
+            cols = {c["name"]: z[c["name"]] for c in meta["columns"]}
+    else:
+        # np.memmap ใช้กับไฟล์ขนาด 0 ไม่ได้
+        cols = {c["name"]: (np.memmap(path / f"{c['name']}.bin", dtype=c["dtype"], mode="r", shape=(rows,))
+                            if rows else np.empty(0, dtype=c["dtype"])) for c in meta["columns"]}
+    return Run(path, meta, cols)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="แปลง out.txt เดิม ↔ รันแบบไบนารี (core/runfile.py) / ดู meta")
+    ap.add_argument("src", help="out.txt / .run / .run.npz")
+    ap.add_argument("--to", default=None, help="ปลายทาง (.run, .run.npz หรือ .txt); ไม่ระบุ = พิมพ์ meta")
+    args = ap.parse_args()
+
+    run = open_run(args.src)
+    if not args.to:
+        print(json.dumps(run.meta, indent=1))
+        return
+    dst = Path(args.to)
+    if dst.suffix == ".txt":
+        buf = io.StringIO()
+        run.to_frame().to_csv(buf, header=False, index=False)
+        dst.write_text(buf.getvalue(), encoding="utf-8")
+    else:
+        meta = {k: v for k, v in run.meta.items() if k not in ("format", "version", "rows", "columns", "created")}
+        dst = write_run(dst, {k: run[k] for k in RUN_COLUMNS}, compress=dst.suffix == ".npz", **meta)
+    print(f"[ok] {run.rows} rows -> {dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,20 @@
 from __future__ import annotations
+import argparse, time
 from datetime import datetime, timedelta
 import pandas as pd
 from config import LOCAL_TZ, LBOT_DATA_DIR, DATA_FILE
-from core.data_loader import load_price_csv
+from core.data_loader import PriceFeed
 from core.entries import combined_signal
-from core.position_manager import build_orders
+from core.position_manager import generate_position_series
 
 M15 = timedelta(minutes=15)
 def floor_to_m15(dt: datetime) -> datetime:
     q = (dt.minute // 15) * 15
     return dt.replace(minute=q, second=0, microsecond=0, tzinfo=LOCAL_TZ)
 
-if __name__ == "__main__":
-    print(f"[i] TZ={LOCAL_TZ}  DATA_DIR={LBOT_DATA_DIR}  FILE={DATA_FILE}")
-    df = load_price_csv()
-    sig = combined_signal(df)
-    plan = build_orders(sig)
+def report(df: pd.DataFrame):
+    sig = combined_signal(df).rename("signal")
+    plan = generate_position_series(df, sig, vote_required=1)   # สถานะเป้าหมายต่อแท่ง (ATR stop / cooldown)
 
     last = df.iloc[-1]
     print(f"[i] rows={len(df)} last_bkk={last['time']} close={last['close']}")
@@ -27,4 +26,20 @@ if __name__ == "__main__":
         plan.tail(10).reset_index(drop=True)
     ], axis=1)
     print(tail.to_string(index=False))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--follow", type=float, default=0.0,
+                    help="poll ทุก N วินาที แล้วอ่านเฉพาะแถวที่ต่อท้าย CSV (0 = รันครั้งเดียว)")
+    ap.add_argument("--window", type=int, default=2000,
+                    help="--follow: คำนวณสัญญาณ/แผนบน N แท่งท้าย → ต้นทุนต่อรอบไม่โตตามประวัติ (0 = ทั้งหมด)")
+    args = ap.parse_args()
+
+    print(f"[i] TZ={LOCAL_TZ}  DATA_DIR={LBOT_DATA_DIR}  FILE={DATA_FILE}")
+    feed = PriceFeed()
+    report(feed.df)
+    while args.follow > 0:
+        time.sleep(args.follow)
+        if feed.refresh() > 0:
+            report(feed.df.tail(args.window) if args.window > 0 else feed.df)
     print("[ok] runner finished (demo-safe if CSV missing)")
@@ -0,0 +1,218 @@
+from __future__ import annotations
+import itertools
+import math
+from dataclasses import dataclass
+from typing import Callable, Sequence
+
+import numpy as np
+
+# evaluate(candidates, budget) -> แถวผลต่อ candidate (ลำดับเดียวกัน) ที่มี sharpe / maxdd / trades_per_day
+# budget = ขนาดหน้าต่าง (เช่น --minutes) ที่ใช้ประเมินรอบนั้น; ส่งเป็นชุดเพื่อให้ผู้เรียกกระจายงาน/ใช้แคชได้
+Evaluate = Callable[[list, int], list]
+
+
+# ---------- search space ----------
+@dataclass(frozen=True)
+class Real:
+    lo: float
+    hi: float
+    q: float | None = None    # ปัดเป็นขั้น q (เช่น 0.05) ให้ซ้ำกับแคช/อ่านง่าย
+
+    def clip(self, x: float) -> float:
+        x = min(max(float(x), self.lo), self.hi)
+        return round(round(x / self.q) * self.q, 10) if self.q else x
+
+
+@dataclass(frozen=True)
+class Choice:
+    values: tuple
+
+    def __init__(self, values: Sequence):
+        object.__setattr__(self, "values", tuple(values))
+
+
+Space = dict  # ชื่อพารามิเตอร์ -> Real / Choice
+
+
+def sample_space(space: Space, n: int, rng: np.random.Generator) -> list[dict]:
+    out = []
+    for _ in range(n):
+        p = {}
+        for name, dim in space.items():
+            if isinstance(dim, Real):
+                p[name] = dim.clip(rng.uniform(dim.lo, dim.hi))
+            else:
+                p[name] = dim.values[rng.integers(len(dim.values))]
+        out.append(p)
+    return out
+
+
+def grid_space(space: Space, reals: int = 4) -> list[dict]:
+    """product ของทุกมิติ (Real → จุดห่างเท่ากัน `reals` จุด) ใช้เป็นชุดเริ่มของ successive halving"""
+    axes = [[dim.clip(x) for x in np.linspace(dim.lo, dim.hi, reals)] if isinstance(dim, Real) else list(dim.values)
+            for dim in space.values()]
+    return [dict(zip(space, values)) for values in itertools.product(*axes)]
+
+
+# ---------- filters ----------
+@dataclass(frozen=True)
+class Filters:
+    """เกณฑ์เดียวกับสคริปต์กริด: trades/day ขั้นต่ำ และ MaxDD สูงสุด (None = ไม่กรอง)"""
+    min_trades_per_day: float = 3.0
+    max_dd: float | None = None
+
+    def passes(self, row: dict) -> bool:
+        if row.get("sharpe") is None:
+            return False
+        if (row.get("trades_per_day") or 0) < self.min_trades_per_day:
+            return False
+        return self.max_dd is None or (row.get("maxdd") is not None and row["maxdd"] <= self.max_dd)
+
+    def key(self, row: dict) -> tuple:
+        """คีย์จัดอันดับ (มากดีกว่า): ผ่านเกณฑ์ก่อน → Sharpe → trades/day"""
+        sh = row.get("sharpe")
+        return (self.passes(row), -math.inf if sh is None else sh, row.get("trades_per_day") or 0.0)
+
+    def objective(self, row: dict) -> float:
+        """สเกลาร์สำหรับ sampler: ไม่ผ่านเกณฑ์ = ถูกลงโทษให้อยู่ใต้ทุกตัวที่ผ่าน"""
+        sh = row.get("sharpe")
+        if sh is None or not np.isfinite(sh):
+            return -1e9
+        return sh if self.passes(row) else sh - 1e3
+
+
+def rank(rows: list[dict], filters: Filters) -> list[dict]:
+    return sorted(rows, key=filters.key, reverse=True)
+
+
+# ---------- successive halving ----------
+def halving_budgets(full: int, rungs: int = 3, eta: int = 3, floor: int = 0) -> list[int]:
+    """หน้าต่างของแต่ละรอบ: full / eta^(rungs-1) … full (ไม่ต่ำกว่า floor)"""
+    return sorted({max(floor, full // eta ** k) for k in range(rungs)})
+
+
+def successive_halving(evaluate: Evaluate, candidates: list[dict], budgets: Sequence[int], eta: int = 3,
+                       filters: Filters = Filters(), log: Callable[[str], None] | None = print) -> list[dict]:
+    """
+    ทุก candidate ประเมินบนหน้าต่างสั้นสุดก่อน แล้วเลื่อนเฉพาะ 1/eta อันดับแรก (ตาม filters.key) ไปหน้าต่างถัดไป
+    คืนแถวผลทุกครั้งที่ประเมิน (มีคอลัมน์ rung, budget) เรียงรอบสุดท้ายก่อน ตามอันดับ
+    """
+    history: list[dict] = []
+    alive = list(candidates)
+    for r, budget in enumerate(budgets):
+        rows = [{**row, "rung": r, "budget": budget} for row in evaluate(alive, budget)]
+        history += rows
+        order = sorted(range(len(alive)), key=lambda i: filters.key(rows[i]), reverse=True)
+        if log:
+            best = rows[order[0]] if order else {}
+            log(f"[halving] rung {r} budget={budget} evaluated={len(alive)} best sharpe={best.get('sharpe')}")
+        if r < len(budgets) - 1:
+            alive = [alive[i] for i in order[:max(1, math.ceil(len(alive) / eta))]]
+    return sorted(history, key=lambda row: (row["rung"], filters.key(row)), reverse=True)
+
+
+# ---------- TPE ----------
+class TPESampler:
+    """
+    Tree-structured Parzen Estimator แบบย่อ (มิติเป็นอิสระกัน):
+    แบ่งผลที่เคยเห็นเป็นกลุ่มดี (gamma บนสุด) / กลุ่มอื่น → สุ่ม n_ei ตัวจากความหนาแน่นของกลุ่มดี
+    แล้วเลือกตัวที่ l(x)/g(x) สูงสุด; Real ใช้ Parzen แบบเกาส์เซียน + uniform prior, Choice ใช้นับความถี่ + smoothing
+    """
+    def __init__(self, space: Space, seed: int = 0, n_startup: int = 10, gamma: float = 0.25, n_ei: int = 24):
+        self.space = space
+        self.rng = np.random.default_rng(seed)
+        self.n_startup, self.gamma, self.n_ei = n_startup, gamma, n_ei
+        self.X: list[dict] = []
+        self.y: list[float] = []
+
+    def tell(self, params: dict, value: float):
+        self.X.append(dict(params))
+        self.y.append(float(value))
+
+    def _split(self) -> tuple[list[dict], list[dict]]:
+        order = np.argsort(-np.asarray(self.y), kind="stable")
+        n_good = max(1, int(math.ceil(self.gamma * len(order))))
+        return [self.X[i] for i in order[:n_good]], [self.X[i] for i in order[n_good:]]
+
+    @staticmethod
+    def _bandwidth(n: int, dim: Real) -> float:
+        # แคบลงตามจำนวนจุด (แบบ Scott) แต่ไม่ต่ำกว่า 0.1% ของช่วง
+        width = dim.hi - dim.lo
+        return max(0.5 * width / max(n, 1) ** 0.2, width * 1e-3)
+
+    @staticmethod
+    def _logpdf_real(x: np.ndarray, points: np.ndarray, bw: float, dim: Real) -> np.ndarray:
+        # mixture ของเกาส์เซียนรอบแต่ละจุด + uniform หนึ่งส่วน (กันความหนาแน่นเป็นศูนย์นอกกลุ่ม)
+        width = dim.hi - dim.lo
+        dens = np.full(len(x), 1.0 / width)
+        if len(points):
+            z = (x[:, None] - points[None, :]) / bw
+            dens = dens + np.exp(-0.5 * z * z).sum(axis=1) / (bw * math.sqrt(2 * math.pi))
+        return np.log(dens / (len(points) + 1))
+
+    @staticmethod
+    def _logpmf_choice(x: list, values: list, dim: Choice) -> np.ndarray:
+        counts = np.array([sum(v == c for v in values) for c in dim.values], dtype=float) + 1.0
+        p = counts / counts.sum()
+        return np.log(np.array([p[dim.values.index(v)] for v in x]))
+
+    def _suggest(self) -> dict:
+        good, bad = self._split()
+        cand = [dict() for _ in range(self.n_ei)]
+        score = np.zeros(self.n_ei)
+        for name, dim in self.space.items():
+            gv = [p[name] for p in good]
+            bv = [p[name] for p in bad]
+            if isinstance(dim, Real):
+                gp, bp = np.asarray(gv, dtype=float), np.asarray(bv, dtype=float)
+                gbw, bbw = self._bandwidth(len(gp), dim), self._bandwidth(len(bp), dim)
+                centers = gp[self.rng.integers(len(gp), size=self.n_ei)]
+                x = np.array([dim.clip(v) for v in self.rng.normal(centers, gbw)])
+                score += self._logpdf_real(x, gp, gbw, dim) - self._logpdf_real(x, bp, bbw, dim)
+            else:
+                counts = np.array([sum(v == c for v in gv) for c in dim.values], dtype=float) + 1.0
+                x = [dim.values[i] for i in self.rng.choice(len(dim.values), size=self.n_ei, p=counts / counts.sum())]
+                score += self._logpmf_choice(x, gv, dim) - self._logpmf_choice(x, bv, dim)
+            for c, v in zip(cand, x):
+                c[name] = v.item() if isinstance(v, np.generic) else v
+        return cand[int(np.argmax(score))]
+
+    def ask(self, n: int = 1) -> list[dict]:
+        """
+        n candidate ใหม่ (ยังไม่ครบ n_startup → สุ่มทั้ง space); ไม่เสนอตัวที่เคยประเมินแล้ว/ซ้ำกันในชุด
+        กลุ่มดีแคบจน sampler เสนอซ้ำเรื่อย ๆ → เติมที่เหลือด้วยการสุ่มทั้ง space (คืนน้อยกว่า n = space หมดแล้ว)
+        """
+        seen = {tuple(sorted(p.items())) for p in self.X}
+        out: list[dict] = []
+        tries = 0
+        while len(out) < n and tries < n * 40:
+            tries += 1
+            if len(self.X) < self.n_startup or tries > n * 20:
+                p = sample_space(self.space, 1, self.rng)[0]
+            else:
+                p = self._suggest()
+            key = tuple(sorted(p.items()))
+            if key not in seen:
+                seen.add(key)
+                out.append(p)
+        return out
+
+
+def tpe_search(evaluate: Evaluate, space: Space, n_trials: int, budget: int, batch: int = 4,
+               filters: Filters = Filters(), seed: int = 0, n_startup: int | None = None,
+               log: Callable[[str], None] | None = print) -> list[dict]:
+    """ถาม-ประเมิน-บอก เป็นชุดละ batch (ประเมินขนานได้) จนครบ n_trials → แถวผลทั้งหมดเรียงตามอันดับ"""
+    sampler = TPESampler(space, seed=seed, n_startup=n_startup or max(batch, min(10, n_trials // 3)))
+    history: list[dict] = []
+    while len(history) < n_trials:
+        cands = sampler.ask(min(batch, n_trials - len(history)))
+        if not cands:
+            break  # space เล็กกว่า n_trials และถูกประเมินครบแล้ว
+        rows = evaluate(cands, budget)
+        for p, row in zip(cands, rows):
+            sampler.tell(p, filters.objective(row))
+            history.append({**row, "trial": len(history)})
+        if log:
+            best = rank(history, filters)[0]
+            log(f"[tpe] {len(history)}/{n_trials} best sharpe={best.get('sharpe')} pass={filters.passes(best)}")
+    return rank(history, filters)
@@ -0,0 +1,443 @@
+from __future__ import annotations
+import math
+import operator
+from collections import deque
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from core.kernels import ema_kernel, rma_kernel
+
+# indicator แบบ stateful สำหรับ live: update() ทีละแท่ง O(1) ผลตรงกับแบบ batch ทุกบิต
+#   EMA/RMA/RSI/ATR(wilder) ↔ features._ema/_rsi/_atr (core.kernels)
+#   ATR(sma)/RollingMean ↔ pandas rolling mean (core.indicators) — ทำ Kahan add/remove แบบเดียวกับ pandas
+#   Bollinger ↔ core.indicators.bbands (ส่วน std ดู RollingStd)
+#   RollingMax/Min ↔ pandas rolling max/min (deque แบบ monotonic)
+# seed(batch) คำนวณทั้งก้อนแล้วตั้ง state ให้ update() ต่อได้ทันที
+
+
+def _isnan(v: float) -> bool:
+    return v != v
+
+
+class StreamingEMA:
+    """EMA alpha=2/(n+1) seed ด้วยค่าแรกที่ไม่ใช่ NaN; NaN เข้า → NaN ออก (state ไม่เปลี่ยน)"""
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.alpha = 2.0 / (self.period + 1.0)
+        self.prev = math.nan
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        if self.period <= 1:
+            self.value = x
+        elif _isnan(x):
+            self.value = math.nan
+        else:
+            self.prev = x if _isnan(self.prev) else self.alpha * x + (1 - self.alpha) * self.prev
+            self.value = self.prev
+        return self.value
+
+    def seed(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=float)
+        out = x if self.period <= 1 else ema_kernel(x, self.period)
+        ok = out[~np.isnan(out)]
+        self.prev = float(ok[-1]) if len(ok) else math.nan
+        self.value = float(out[-1]) if len(out) else math.nan
+        return out
+
+
+class StreamingRMA:
+    """RMA/Wilder alpha=1/n: seed ด้วย SMA n ค่าแรก (NaN ก่อนครบ)"""
+    def __init__(self, period: int):
+        self.period = int(period)
+        self.alpha = 1.0 / self.period
+        self.acc = 0.0
+        self.cnt = 0
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        if _isnan(x):
+            self.value = math.nan
+        elif self.cnt < self.period:
+            self.acc += x
+            self.cnt += 1
+            self.value = math.nan if self.cnt < self.period else self.acc / self.period
+        else:
+            self.value = (1 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+    def seed(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=float)
+        out = rma_kernel(x, self.period)
+        self.acc, self.cnt = 0.0, 0
+        for v in x[~np.isnan(x)][:self.period].tolist():  # บวกเรียงลำดับเหมือนลูป (ไม่ใช่ pairwise sum)
+            self.acc += v
+            self.cnt += 1
+        self.value = float(out[-1]) if len(out) else math.nan
+        return out
+
+
+class StreamingRSI:
+    """RSI แบบ features._rsi (diff แท่งแรก = 0, NaN diff นับเป็น 0 ทั้งขึ้นและลง)"""
+    def __init__(self, period: int = 14):
+        self.up = StreamingRMA(period)
+        self.dn = StreamingRMA(period)
+        self.prev_close: float | None = None
+        self.value = math.nan
+
+    @staticmethod
+    def _rsi(up: float, dn: float) -> float:
+        rs = up / (dn + 1e-12)
+        return 100.0 - (100.0 / (1.0 + rs))
+
+    def update(self, close: float) -> float:
+        close = float(close)
+        d = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+        self.value = self._rsi(self.up.update(d if d > 0 else 0.0), self.dn.update(-d if d < 0 else 0.0))
+        return self.value
+
+    def seed(self, close: np.ndarray) -> np.ndarray:
+        c = np.asarray(close, dtype=float)
+        if len(c) == 0:
+            return c
+        diff = np.diff(c, prepend=c[0])
+        up = self.up.seed(np.where(diff > 0, diff, 0.0))
+        dn = self.dn.seed(np.where(diff < 0, -diff, 0.0))
+        self.prev_close = float(c[-1])
+        out = 100.0 - (100.0 / (1.0 + up / (dn + 1e-12)))
+        self.value = float(out[-1])
+        return out
+
+
+class RollingMean:
+    """rolling(n, min_periods).mean() ของ pandas แบบทีละค่า (Kahan แยก add/remove + กติกาค่าซ้ำ/เครื่องหมาย)"""
+    def __init__(self, window: int, min_periods: int | None = None):
+        self.window = int(window)
+        self.min_periods = self.window if min_periods is None else int(min_periods)
+        self.buf: deque[float] = deque()
+        self.nobs = 0
+        self.sum = 0.0
+        self.neg = 0
+        self.comp_add = 0.0
+        self.comp_rm = 0.0
+        self.same = 0
+        self.prev = math.nan
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        self.buf.append(x)
+        if len(self.buf) > self.window:
+            o = self.buf.popleft()
+            if not _isnan(o):
+                self.nobs -= 1
+                y = -o - self.comp_rm
+                t = self.sum + y
+                self.comp_rm = t - self.sum - y
+                self.sum = t
+                if math.copysign(1.0, o) < 0:
+                    self.neg -= 1
+        if not _isnan(x):
+            self.nobs += 1
+            y = x - self.comp_add
+            t = self.sum + y
+            self.comp_add = t - self.sum - y
+            self.sum = t
+            if math.copysign(1.0, x) < 0:
+                self.neg += 1
+            self.same = self.same + 1 if x == self.prev else 1
+            self.prev = x
+        if self.nobs >= self.min_periods and self.nobs > 0:
+            r = self.sum / self.nobs
+            if self.same >= self.nobs:
+                r = self.prev
+            elif self.neg == 0 and r < 0:
+                r = 0.0
+            elif self.neg == self.nobs and r > 0:
+                r = 0.0
+            self.value = r
+        else:
+            self.value = math.nan
+        return self.value
+
+    def seed(self, x: np.ndarray) -> np.ndarray:
+        # state ของ Kahan ขึ้นกับทุกค่าตั้งแต่ต้น → replay (ทำครั้งเดียวตอนเริ่ม)
+        return np.array([self.update(v) for v in np.asarray(x, dtype=float).tolist()], dtype=float)
+
+
+class RollingStd:
+    """
+    rolling(n, min_periods).std(ddof) แบบทีละค่า (Welford + Kahan แยก add/remove)
+    ตรงกับ pandas ทุกบิตในข้อมูลปกติ; หลังหน้าต่างที่เป็นค่าเดียวกันทั้งหมดหรือช่วง NaN ยาว อาจต่างในหลักทศนิยมท้าย ๆ
+    """
+    def __init__(self, window: int, min_periods: int | None = None, ddof: int = 1):
+        self.window = int(window)
+        self.min_periods = self.window if min_periods is None else int(min_periods)
+        self.ddof = int(ddof)
+        self.buf: deque[float] = deque()
+        self.nobs = 0
+        self.mean = 0.0
+        self.ssq = 0.0
+        self.comp_add = 0.0
+        self.comp_rm = 0.0
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        self.buf.append(x)
+        if len(self.buf) > self.window:
+            o = self.buf.popleft()
+            if not _isnan(o):
+                self.nobs -= 1
+                if self.nobs:
+                    pm = self.mean - self.comp_rm
+                    y = o - self.comp_rm
+                    t = y - self.mean
+                    self.comp_rm = t + self.mean - y
+                    self.mean = self.mean - t / self.nobs
+                    self.ssq = self.ssq - (o - pm) * (o - self.mean)
+                else:
+                    self.mean = 0.0
+                    self.ssq = 0.0
+        if not _isnan(x):
+            self.nobs += 1
+            pm = self.mean - self.comp_add
+            y = x - self.comp_add
+            t = y - self.mean
+            self.comp_add = t + self.mean - y
+            self.mean = self.mean + t / self.nobs
+            self.ssq = self.ssq + (x - pm) * (x - self.mean)
+        if self.ssq < 0:  # เศษติดลบจากหน้าต่างค่าซ้ำ → เริ่มนับใหม่จากค่าปัจจุบัน
+            self.ssq = 0.0
+            if not _isnan(x):
+                self.mean = x
+        if self.nobs >= self.min_periods and self.nobs > self.ddof:
+            var = 0.0 if self.nobs == 1 else max(self.ssq / (self.nobs - self.ddof), 0.0)
+            self.value = math.sqrt(var)
+        else:
+            self.value = math.nan
+        return self.value
+
+    def seed(self, x: np.ndarray) -> np.ndarray:
+        return np.array([self.update(v) for v in np.asarray(x, dtype=float).tolist()], dtype=float)
+
+
+class _RollingExtreme:
+    """
+    rolling max/min แบบ monotonic deque (ข้าม NaN เหมือน pandas)
+    คลาสลูกกำหนด _how (ชื่อเมธอด rolling ของ pandas) และ _dominates(new, kept): ค่าใหม่ทำให้ค่าท้ายคิวไม่มีวันเป็นคำตอบ
+    """
+    _how: str
+    _dominates: Callable[[float, float], bool]
+
+    def __init__(self, window: int, min_periods: int | None = None):
+        self.window = int(window)
+        self.min_periods = self.window if min_periods is None else int(min_periods)
+        self.i = -1
+        self.q: deque[tuple[int, float]] = deque()
+        self.valid: deque[int] = deque()  # index ของค่าที่ไม่ใช่ NaN ในหน้าต่าง
+        self.value = math.nan
+
+    def update(self, x: float) -> float:
+        x = float(x)
+        self.i += 1
+        lo = self.i - self.window
+        while self.q and self.q[0][0] <= lo:
+            self.q.popleft()
+        while self.valid and self.valid[0] <= lo:
+            self.valid.popleft()
+        if not _isnan(x):
+            while self.q and self._dominates(x, self.q[-1][1]):
+                self.q.pop()
+            self.q.append((self.i, x))
+            self.valid.append(self.i)
+        n = len(self.valid)
+        self.value = self.q[0][1] if n >= self.min_periods and n > 0 else math.nan
+        return self.value
+
+    def seed(self, x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=float)
+        s = pd.Series(x).rolling(self.window, min_periods=self.min_periods)
+        out = getattr(s, self._how)().to_numpy()
+        # state ขึ้นกับแค่ n ค่าล่าสุด
+        self.q.clear()
+        self.valid.clear()
+        self.i = len(x) - 1 - min(len(x), self.window)
+        for v in x[-self.window:].tolist():
+            self.update(v)
+        return out
+
+
+class RollingMax(_RollingExtreme):
+    _how = "max"
+    _dominates = operator.ge
+
+
+class RollingMin(_RollingExtreme):
+    _how = "min"
+    _dominates = operator.le
+
+
+class StreamingATR:
+    """
+    method="wilder": features._atr (แท่งแรก prev_close = close เอง, NaN แพร่, RMA)
+    method="sma"   : core.indicators.atr (TR ข้าม NaN, SMA n แท่ง min_periods=n)
+    """
+    def __init__(self, period: int = 14, method: str = "wilder"):
+        if method not in ("wilder", "sma"):
+            raise ValueError(f"unknown ATR method: {method}")
+        self.method = method
+        self.avg = StreamingRMA(period) if method == "wilder" else RollingMean(period, period)
+        self.prev_close: float | None = None
+        self.value = math.nan
+
+    def _tr(self, h: float, l: float, c: float) -> float:
+        if self.method == "wilder":
+            pc = c if self.prev_close is None else self.prev_close
+            parts = (h - l, abs(h - pc), abs(l - pc))
+            return math.nan if any(_isnan(p) for p in parts) else max(parts)
+        pc = math.nan if self.prev_close is None else self.prev_close
+        parts = [p for p in (abs(h - l), abs(h - pc), abs(l - pc)) if not _isnan(p)]
+        return max(parts) if parts else math.nan
+
+    def update(self, high: float, low: float, close: float) -> float:
+        tr = self._tr(float(high), float(low), float(close))
+        self.prev_close = float(close)
+        self.value = self.avg.update(tr)
+        return self.value
+
+    def seed(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+        h, l, c = (np.asarray(v, dtype=float) for v in (high, low, close))
+        if len(c) == 0:
+            return c
+        if self.method == "wilder":
+            pc = np.r_[c[0], c[:-1]]
+            tr = np.maximum.reduce([h - l, np.abs(h - pc), np.abs(l - pc)])
+        else:
+            pc = np.r_[np.nan, c[:-1]]
+            tr = np.fmax(np.fmax(np.abs(h - l), np.abs(h - pc)), np.abs(l - pc))
+        out = self.avg.seed(tr)
+        self.prev_close = float(c[-1])
+        self.value = float(out[-1])
+        return out
+
+
+class StreamingBollinger:
+    """core.indicators.bbands แบบทีละค่า → (up, low, ma)"""
+    def __init__(self, period: int = 20, k: float = 2.0):
+        self.k = float(k)
+        self.ma = RollingMean(period, period)
+        self.sd = RollingStd(period, period, ddof=0)
+        self.value = (math.nan, math.nan, math.nan)
+
+    def update(self, x: float) -> tuple[float, float, float]:
+        ma, sd = self.ma.update(x), self.sd.update(x)
+        self.value = (ma + self.k * sd, ma - self.k * sd, ma)
+        return self.value
+
+    def seed(self, x: np.ndarray):
+        ma, sd = self.ma.seed(x), self.sd.seed(x)
+        up, low = ma + self.k * sd, ma - self.k * sd
+        if len(ma):
+            self.value = (float(up[-1]), float(low[-1]), float(ma[-1]))
+        return up, low, ma
+
+
+# ---------- ชุดฟีเจอร์ของ features.build_features แบบ streaming ----------
+OBS_COLUMNS = ["open", "high", "low", "close", "volume", "ema_fast", "ema_slow", "ema_trend",
+               "rsi14", "atr14", "bar_range", "is_spike", "trend_up", "ema_cross_up", "ema_cross_dn"]
+
+
+class StreamingFeatures:
+    """
+    คอลัมน์ตัวเลขของ features.build_features ทีละแท่ง (ลำดับตาม OBS_COLUMNS)
+    + atr_sma (ATR แบบ SMA ของ core.indicators) สำหรับคำนวณขนาดไม้/SL
+    sync(hist) ป้อนเฉพาะแถวใหม่ของ history → ต้นทุนต่อแท่งคงที่ไม่ว่า history ยาวแค่ไหน
+    """
+    def __init__(self, ema_fast: int = 20, ema_slow: int = 50, ema_trend: int = 200,
+                 rsi: int = 14, atr: int = 14, spike_mult: float = 3.0, sizing_atr: int = 14):
+        self.periods = (ema_fast, ema_slow, ema_trend, rsi, atr, sizing_atr)
+        self.spike_mult = float(spike_mult)
+        self.reset()
+
+    def reset(self):
+        ema_fast, ema_slow, ema_trend, rsi, atr, sizing_atr = self.periods
+        self.ema_fast, self.ema_slow, self.ema_trend = (StreamingEMA(p) for p in (ema_fast, ema_slow, ema_trend))
+        self.rsi = StreamingRSI(rsi)
+        self.atr = StreamingATR(atr, "wilder")
+        self.atr_sma = StreamingATR(sizing_atr, "sma")
+        self.rows = 0
+        self.last_time = None
+        self.value: dict[str, float] = {}
+
+    def _row(self, o, h, l, c, v, ef, es, et, rsi, atr, atr_sma, ef_prev, es_prev) -> dict[str, float]:
+        rng = h - l
+        spike = rng > (self.spike_mult * atr if not _isnan(atr) else math.inf)
+        return {
+            "open": o, "high": h, "low": l, "close": c, "volume": v,
+            "ema_fast": ef, "ema_slow": es, "ema_trend": et, "rsi14": rsi, "atr14": atr,
+            "bar_range": rng, "is_spike": float(spike), "trend_up": float(et < c),
+            "ema_cross_up": float(ef > es and ef_prev <= es_prev),
+            "ema_cross_dn": float(ef < es and ef_prev >= es_prev),
+            "atr_sma": atr_sma,
+        }
+
+    def update(self, bar: dict) -> dict[str, float]:
+        o, h, l, c, v = (float(bar[k]) for k in ("open", "high", "low", "close", "volume"))
+        ef_prev, es_prev = (self.ema_fast.value, self.ema_slow.value) if self.rows else (math.nan, math.nan)
+        self.value = self._row(o, h, l, c, v,
+                               self.ema_fast.update(c), self.ema_slow.update(c), self.ema_trend.update(c),
+                               self.rsi.update(c), self.atr.update(h, l, c), self.atr_sma.update(h, l, c),
+                               ef_prev, es_prev)
+        self.rows += 1
+        if "time" in bar:
+            self.last_time = bar["time"]
+        return self.value
+
+    def seed(self, df: pd.DataFrame) -> dict[str, float]:
+        """คำนวณทั้งก้อน (batch) แล้วตั้ง state ให้ update ต่อ → คืนฟีเจอร์ของแถวสุดท้าย"""
+        self.reset()
+        if len(df) == 0:
+            return self.value
+        o, h, l, c, v = (df[k].to_numpy(dtype=float) for k in ("open", "high", "low", "close", "volume"))
+        ef, es, et = (s.seed(c) for s in (self.ema_fast, self.ema_slow, self.ema_trend))
+        rsi = self.rsi.seed(c)
+        atr = self.atr.seed(h, l, c)
+        atr_sma = self.atr_sma.seed(h, l, c)
+        ef_prev, es_prev = (ef[-2], es[-2]) if len(c) > 1 else (math.nan, math.nan)
+        self.value = self._row(o[-1], h[-1], l[-1], c[-1], v[-1], ef[-1], es[-1], et[-1], rsi[-1], atr[-1],
+                               atr_sma[-1], ef_prev, es_prev)
+        self.value = {k: float(x) for k, x in self.value.items()}
+        self.rows = len(c)
+        if "time" in df.columns:
+            self.last_time = df["time"].iloc[-1]
+        return self.value
+
+    def sync(self, hist: pd.DataFrame) -> dict[str, float]:
+        """
+        ป้อน history ทั้งก้อน (แบบที่ bridge ส่งมา) → seed ครั้งแรก, ครั้งต่อไปป้อนเฉพาะแถวที่ time ใหม่กว่า
+        หาแถวของ last_time ด้วย searchsorted → รับได้ทั้ง history ที่โตทีละแถวและหน้าต่างยาวคงที่ที่เลื่อนไป
+        ถ้าไม่พบ last_time ใน history (ย้อนเวลา/ขาดช่วง) → seed ใหม่ทั้งก้อน
+        """
+        if self.rows == 0 or self.last_time is None or len(hist) == 0:
+            return self.seed(hist)
+        t = hist["time"]
+        k = int(t.searchsorted(self.last_time))
+        if k >= len(t) or t.iloc[k] != self.last_time:
+            return self.seed(hist)
+        if k == len(t) - 1:
+            return self.value
+        cols = {c: hist[c].to_numpy(dtype=float)[k + 1:] for c in ("open", "high", "low", "close", "volume")}
+        last = t.iloc[-1]
+        for i in range(len(cols["close"])):
+            self.update({c: v[i] for c, v in cols.items()})
+        self.last_time = last
+        return self.value
+
+    def obs(self) -> np.ndarray:
+        return np.array([self.value[k] for k in OBS_COLUMNS], dtype=np.float32)
@@ -0,0 +1,118 @@
+from __future__ import annotations
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Any, Callable, Iterable, Iterator
+
+import numpy as np
+
+# fn(shared, cell) -> ผลของเซลล์; shared = dict ของอาร์เรย์ (read-only) ที่ publish ครั้งเดียว
+CellFn = Callable[[dict, Any], Any]
+
+
+class SharedArrays:
+    """
+    อาร์เรย์ที่ publish ลง shared memory ครั้งเดียว → worker attach ด้วย spec (ชื่อ/shape/dtype)
+    ไม่มีการ pickle ข้อมูลไปกับทุกเซลล์; ผู้สร้างเป็นเจ้าของ → close() = ปิด + unlink
+    """
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        self._blocks: list[shared_memory.SharedMemory] = []
+        self.spec: dict[str, tuple[str, tuple, str]] = {}
+        try:
+            for name, a in arrays.items():
+                a = np.ascontiguousarray(a)
+                shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+                self._blocks.append(shm)
+                np.ndarray(a.shape, a.dtype, buffer=shm.buf)[...] = a
+                self.spec[name] = (shm.name, a.shape, a.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        for shm in self._blocks:
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+    def __enter__(self) -> "SharedArrays":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _open_block(name: str) -> shared_memory.SharedMemory:
+    # worker ใช้ resource_tracker ตัวเดียวกับผู้สร้าง (ชื่อซ้ำ = ไม่ลงทะเบียนเพิ่ม) → ผู้สร้าง unlink คนเดียวพอ
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # py>=3.13
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach(spec: dict[str, tuple[str, tuple, str]]) -> tuple[dict[str, np.ndarray], list]:
+    """spec ของ SharedArrays → (dict ของ view แบบ read-only, handle ที่ต้องถือไว้ตลอดอายุ view)"""
+    arrays, handles = {}, []
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = _open_block(shm_name)
+        handles.append(shm)
+        a = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+        a.flags.writeable = False
+        arrays[name] = a
+    return arrays, handles
+
+
+# ---------- ฝั่ง worker ----------
+_SHARED: dict[str, np.ndarray] = {}
+_HANDLES: list = []
+
+
+def _init_worker(spec):
+    global _SHARED, _HANDLES
+    _SHARED, _HANDLES = attach(spec)
+
+
+def _run_cell(fn: CellFn, i: int, cell):
+    t0 = time.perf_counter()
+    out = fn(_SHARED, cell)
+    return i, out, time.perf_counter() - t0
+
+
+def resolve_workers(workers: int | None) -> int:
+    """0/None = ทุกคอร์ของเครื่อง"""
+    return max(1, int(workers)) if workers else (os.cpu_count() or 1)
+
+
+def run_cells(fn: CellFn, cells: Iterable, arrays: dict[str, np.ndarray] | None = None,
+              workers: int | None = 1) -> Iterator[tuple[int, Any, float]]:
+    """
+    รัน fn(shared, cell) ทุกเซลล์ → yield (ลำดับเซลล์, ผล, วินาที) ทันทีที่แต่ละเซลล์เสร็จ
+    workers=1 → รันในโปรเซสนี้ตามลำดับ (shared = arrays ตรง ๆ)
+    workers>1 → process pool; arrays ถูก publish ลง shared memory ครั้งเดียว worker attach ตอนเริ่ม
+    fn ต้อง pickle ได้ (ฟังก์ชันระดับโมดูล) และ exception ของเซลล์จะโยนต่อมาที่ผู้เรียก
+    """
+    cells = list(cells)
+    workers = min(resolve_workers(workers), max(len(cells), 1))
+    if workers <= 1:
+        shared = dict(arrays or {})
+        for i, cell in enumerate(cells):
+            t0 = time.perf_counter()
+            out = fn(shared, cell)
+            yield i, out, time.perf_counter() - t0
+        return
+
+    with SharedArrays(arrays or {}) as sh:
+        ex = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(sh.spec,))
+        try:
+            pending = {ex.submit(_run_cell, fn, i, c) for i, c in enumerate(cells)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    yield fut.result()
+        finally:
+            # ต้องปิด pool ก่อน unlink shared memory (ออกจาก with ของ SharedArrays)
+            ex.shutdown(wait=True, cancel_futures=True)
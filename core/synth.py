@@ -0,0 +1,216 @@
+from __future__ import annotations
+import argparse
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+from config import LOCAL_TZ
+from core import price_cache
+
+NS_PER_MIN = 60 * 1_000_000_000
+# ตลาดทองปิดช่วงเสาร์-อาทิตย์: ศุกร์ 21:00 UTC → อาทิตย์ 22:00 UTC (นาทีนับจากจันทร์ 00:00 UTC)
+WEEKEND_CLOSE_MIN = 4 * 1440 + 21 * 60
+WEEKEND_OPEN_MIN = 6 * 1440 + 22 * 60
+REGIME_VOL = np.array([0.6, 1.0, 1.8])     # calm / normal / volatile
+REGIME_DRIFT = np.array([0.0, 1.0, -1.0])  # คูณกับ mu
+
+COLUMNS = [
+    {"name": "time", "dtype": "<i8", "time_unit": "ns"},
+    {"name": "open", "dtype": "<f8"},
+    {"name": "high", "dtype": "<f8"},
+    {"name": "low", "dtype": "<f8"},
+    {"name": "close", "dtype": "<f8"},
+    {"name": "volume", "dtype": "<i8"},
+    {"name": "range", "dtype": "<f8"},
+]
+
+
+@dataclass
+class SynthParams:
+    tf_minutes: int = 15
+    start: str = "2015-01-05 00:00"   # UTC
+    start_close: float = 2400.0
+    mu: float = 0.0                   # drift ต่อวัน
+    sigma: float = 0.008              # vol ต่อวัน
+    regimes: bool = True
+    regime_bars: int = 2000           # ความยาวเฉลี่ยของแต่ละ regime (แท่ง)
+    vol_cluster: bool = True
+    cluster_bars: int = 48            # หน้าต่าง rolling ของ vol clustering
+    gap_prob: float = 0.0005          # โอกาสแท่งหาย (ข้อมูลขาด)
+    weekend_closed: bool = True
+
+
+def _open_mask(slot_ns: np.ndarray) -> np.ndarray:
+    minute = slot_ns // NS_PER_MIN
+    dow = (minute // 1440 + 3) % 7          # 1970-01-01 เป็นวันพฤหัส (จันทร์ = 0)
+    mow = dow * 1440 + minute % 1440
+    return (mow < WEEKEND_CLOSE_MIN) | (mow >= WEEKEND_OPEN_MIN)
+
+
+def iter_bars(n_bars: int, p: SynthParams | None = None, seed: int = 1234,
+              chunk: int = 1_000_000) -> Iterator[dict[str, np.ndarray]]:
+    """
+    สร้างแท่ง OHLCV สังเคราะห์ทีละก้อน (ไม่มีลูปรายแท่ง) แบบ GBM ผ่าน cumprod
+    + regime switching + vol clustering + แท่งหาย/ปิดเสาร์อาทิตย์ (ราคากระโดดตามเวลาที่ขาดไป)
+    time เป็น int64 epoch ns (UTC); seed เดิม + chunk เดิม → ผลเดิมทุกครั้ง
+    """
+    p = p or SynthParams()
+    rng = np.random.default_rng(seed)
+    tf_ns = int(p.tf_minutes) * NS_PER_MIN
+    bars_day = 1440.0 / p.tf_minutes
+    mu_bar = p.mu / bars_day
+    sig_bar = p.sigma / np.sqrt(bars_day)
+
+    cursor = pd.Timestamp(p.start, tz="UTC").as_unit("ns").value // tf_ns  # slot index ถัดไป
+    last_slot = cursor - 1
+    last_close = float(p.start_close)
+    regime, regime_left = 1, 0
+    shock_tail = np.ones(max(p.cluster_bars - 1, 0))  # z^2 ก้อนก่อนหน้า สำหรับ rolling ต่อเนื่อง
+    done = 0
+
+    while done < n_bars:
+        # --- กริดเวลา: ตัดช่วงปิดตลาด + แท่งหายแบบสุ่ม ---
+        want = min(chunk, n_bars - done)
+        slots = cursor + np.arange(int(want * 1.5) + 16, dtype=np.int64)
+        keep = _open_mask(slots * tf_ns) if p.weekend_closed else np.ones(len(slots), bool)
+        if p.gap_prob > 0:
+            keep &= rng.random(len(slots)) >= p.gap_prob
+        slots = slots[keep][:want]
+        cursor = int(slots[-1]) + 1 if len(slots) else cursor + int(want * 1.5) + 16
+        m = len(slots)
+        if m == 0:
+            continue
+        elapsed = np.diff(slots, prepend=last_slot).astype(float)  # 1 = ต่อเนื่อง, >1 = มีช่วงขาด
+        last_slot = int(slots[-1])
+
+        # --- regime: ช่วงยาวแบบ geometric แล้ว np.repeat ---
+        vol = np.ones(m)
+        drift = np.full(m, mu_bar)
+        if p.regimes:
+            states, lens = [regime], [regime_left]
+            total = regime_left
+            while total < m:
+                k = max(8, int((m - total) / p.regime_bars) + 8)
+                seg = rng.geometric(1.0 / p.regime_bars, size=k)
+                st = rng.integers(0, len(REGIME_VOL), size=k)
+                states.extend(st.tolist()); lens.extend(seg.tolist())
+                total += int(seg.sum())
+            reg = np.repeat(np.asarray(states), np.asarray(lens))[:m]
+            regime = int(reg[-1])
+            regime_left = total - m
+            vol *= REGIME_VOL[reg]
+            drift *= REGIME_DRIFT[reg]
+
+        # --- vol clustering: sqrt(rolling mean ของ z^2) ผ่าน cumsum ---
+        if p.vol_cluster and p.cluster_bars > 1:
+            z2 = np.r_[shock_tail, rng.standard_normal(m) ** 2]
+            cs = np.cumsum(np.r_[0.0, z2])
+            w = p.cluster_bars
+            h = (cs[w:] - cs[:-w]) / w
+            shock_tail = z2[-(w - 1):]
+            vol *= np.sqrt(h)
+
+        # --- GBM: ราคากระโดดตามเวลาที่ขาดไปตอนเปิดแท่ง แล้ว cumprod ---
+        gap_r = np.where(elapsed > 1, sig_bar * np.sqrt(elapsed - 1) * rng.standard_normal(m), 0.0)
+        bar_r = drift + sig_bar * vol * rng.standard_normal(m)
+        growth = np.cumprod((1.0 + gap_r) * (1.0 + bar_r))
+        close = last_close * growth
+        prev_close = np.r_[last_close, close[:-1]]
+        open_ = prev_close * (1.0 + gap_r)
+        last_close = float(close[-1])
+
+        spread = np.maximum(close * 0.0004 * vol, 0.05)
+        high = np.maximum(open_, close) + spread * rng.random(m)
+        low = np.minimum(open_, close) - spread * rng.random(m)
+        volume = (rng.lognormal(5.0, 0.4, size=m) * vol).astype(np.int64) + 1
+
+        yield {
+            "time": slots * tf_ns,
+            "open": open_, "high": high, "low": low, "close": close,
+            "volume": volume, "range": np.abs(high - low),
+        }
+        done += m
+
+
+def generate_bars(n_bars: int, p: SynthParams | None = None, seed: int = 1234) -> pd.DataFrame:
+    """ทั้งก้อนในหน่วยความจำ → DataFrame หน้าตาเดียวกับ load_price_csv()"""
+    parts = list(iter_bars(n_bars, p, seed=seed))
+    data = {c["name"]: np.concatenate([x[c["name"]] for x in parts]) for c in COLUMNS}
+    data["time"] = price_cache._time_series(data["time"], "ns")
+    return pd.DataFrame(data)
+
+
+def write_csv(path: Path, n_bars: int, p: SynthParams | None = None, seed: int = 1234,
+              chunk: int = 1_000_000) -> int:
+    """เขียน CSV (time แบบ UTC) ทีละก้อน → ใช้หน่วยความจำคงที่ไม่ว่ากี่ล้านแท่ง"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for i, x in enumerate(iter_bars(n_bars, p, seed=seed, chunk=chunk)):
+            df = pd.DataFrame({c["name"]: x[c["name"]] for c in COLUMNS if c["name"] != "range"})
+            df["time"] = pd.to_datetime(df["time"], unit="ns")
+            df.to_csv(f, index=False, header=(i == 0), date_format="%Y-%m-%d %H:%M:%S")
+            rows += len(df)
+    return rows
+
+
+def write_store(cache_dir: Path, n_bars: int, p: SynthParams | None = None, seed: int = 1234,
+                chunk: int = 1_000_000) -> int:
+    """เขียนคอลัมน์ไบนารีรูปแบบเดียวกับ price_cache โดยตรง (เปิดด้วย OHLCVStore.open_dir)"""
+    cache_dir = Path(cache_dir)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    cache_dir.mkdir(parents=True)
+    files = {c["name"]: open(cache_dir / f"{c['name']}.bin", "wb") for c in COLUMNS}
+    rows, last = 0, None
+    try:
+        for x in iter_bars(n_bars, p, seed=seed, chunk=chunk):
+            for c in COLUMNS:
+                x[c["name"]].astype(c["dtype"], copy=False).tofile(files[c["name"]])
+            rows += len(x["time"])
+            last = int(x["time"][-1])
+    finally:
+        for f in files.values():
+            f.close()
+    price_cache._write_meta(cache_dir, {
+        "version": price_cache.CACHE_VERSION,
+        "tz": str(LOCAL_TZ),
+        "rows": rows,
+        "columns": COLUMNS,
+        "last_time_ns": last,
+        "source": None,
+    })
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="synthetic OHLCV generator (benchmark fixture)")
+    ap.add_argument("out", help="ไฟล์ .csv หรือโฟลเดอร์ไบนารี (--format bin)")
+    ap.add_argument("--bars", type=int, default=1_000_000)
+    ap.add_argument("--tf", type=int, default=15, help="นาทีต่อแท่ง (15 = M15, 1 = M1)")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--format", choices=["csv", "bin"], default="csv")
+    ap.add_argument("--start", default=SynthParams.start)
+    ap.add_argument("--gap_prob", type=float, default=SynthParams.gap_prob)
+    ap.add_argument("--no_regimes", action="store_true")
+    ap.add_argument("--no_vol_cluster", action="store_true")
+    ap.add_argument("--no_weekend", action="store_true")
+    args = ap.parse_args()
+
+    p = SynthParams(tf_minutes=args.tf, start=args.start, gap_prob=args.gap_prob,
+                    regimes=not args.no_regimes, vol_cluster=not args.no_vol_cluster,
+                    weekend_closed=not args.no_weekend)
+    t0 = time.perf_counter()
+    writer = write_store if args.format == "bin" else write_csv
+    rows = writer(Path(args.out), args.bars, p, seed=args.seed)
+    dt = time.perf_counter() - t0
+    print(f"[ok] wrote {rows} bars tf={args.tf}m -> {args.out}  ({dt:.2f}s, {rows / max(dt, 1e-9):,.0f} bars/s)")
+
+
+if __name__ == "__main__":
+    main()
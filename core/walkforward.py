@@ -0,0 +1,154 @@
+from __future__ import annotations
+import itertools
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from config import MAX_POS_TOTAL, TAKER_FEE_BPS_PER_SIDE
+from core.entries import combined_signal
+from core.kernels import pnl_path_kernel, position_batch_kernel, position_kernel
+from core.metrics import net_metrics, sharpe
+from core.position_manager import _filled_atr, bar_returns, base_target_from_signals, pnl_summary
+from core.search import Filters, rank
+from core.sweep import run_cells
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+GRID_COLUMNS = ["atr_mult", "step_atr", "layers", "cooldown"]
+
+
+@dataclass(frozen=True)
+class Fold:
+    """ช่วงแท่ง [is_start, is_end) = in-sample, [is_end, oos_end) = out-of-sample"""
+    index: int
+    is_start: int
+    is_end: int
+    oos_end: int
+
+    @property
+    def oos_start(self) -> int:
+        return self.is_end
+
+
+def make_folds(n_bars: int, is_bars: int, oos_bars: int, anchored: bool = False) -> list[Fold]:
+    """
+    rolling: IS ยาว is_bars เลื่อนไปทีละ oos_bars; anchored: IS เริ่มที่แท่ง 0 เสมอ (ยาวขึ้นทุก fold)
+    OOS ของแต่ละ fold ต่อกันพอดีไม่ทับกัน; fold สุดท้ายอาจสั้นกว่า oos_bars
+    """
+    if is_bars <= 0 or oos_bars <= 0:
+        raise ValueError("is_bars and oos_bars must be positive")
+    folds = []
+    for k in itertools.count():
+        is_end = is_bars + k * oos_bars
+        if is_end >= n_bars:
+            break
+        folds.append(Fold(k, 0 if anchored else is_end - is_bars, is_end, min(is_end + oos_bars, n_bars)))
+    return folds
+
+
+def shared_arrays(df: pd.DataFrame, atr_n: int = 14, strats: str = "ema,turtle20,turtle55") -> dict[str, np.ndarray]:
+    """
+    ราคา / ATR / เป้าหมายจาก combined_signal / รีเทิร์นของทั้งประวัติ คำนวณครั้งเดียวใช้ทุก fold
+    (indicator และสัญญาณเป็นแบบ causal → ค่าที่แท่ง t ไม่ขึ้นกับข้อมูลหลัง t ตัดเป็นช่วงได้เลย)
+    """
+    close = df["close"].to_numpy(dtype=float)
+    return {
+        "close": close,
+        "atr": _filled_atr(df, atr_n),
+        "target": base_target_from_signals(combined_signal(df, strats)).to_numpy(dtype=np.int64),
+        "ret": bar_returns(close),
+        "time": pd.DatetimeIndex(df["time"]).as_unit("ns").asi8,   # epoch ns (ใช้นับวันของ trades/day)
+    }
+
+
+def _days(t: np.ndarray, i0: int, i1: int) -> int:
+    # จำนวนวันแบบเดียวกับ sweep_pyramid_trailing: (time[-1] - time[0]).days ไม่ต่ำกว่า 1
+    return max(int((t[i1 - 1] - t[i0]) // NS_PER_DAY), 1) if i1 > i0 else 1
+
+
+def _segment(shared, i0: int, i1: int, p: dict, fee: float, max_pos: int) -> tuple[np.ndarray, dict]:
+    """
+    config เดียวบนช่วง [i0, i1) เริ่มจากว่าง และปิดสถานะที่ราคาปิดแท่งสุดท้าย (flat-to-flat)
+    → (net ต่อแท่ง, sharpe/maxdd/trades/trades_per_day)
+    """
+    pos = position_kernel(shared["close"][i0:i1], shared["atr"][i0:i1], shared["target"][i0:i1],
+                          p["atr_mult"], p["step_atr"], int(p["layers"]), True, int(p["cooldown"]), max_pos)[0]
+    pos[-1:] = 0
+    net = np.empty(i1 - i0)
+    maxdd, turns = pnl_path_kernel(shared["ret"][i0:i1], pos, fee, net)
+    if i1 - i0 > 1 and pos[-2] != 0:
+        # kernel หัก fee ที่แท่งถัดจากที่ pos เปลี่ยน (นอกช่วง) → หัก fee ขาออกที่แท่งสุดท้ายเอง แล้วคิด maxdd ใหม่
+        net[-1] -= fee
+        turns += 1
+        maxdd = None
+    return net, {**_net_metrics(net, maxdd), "trades": turns // 2,
+                 "trades_per_day": (turns // 2) / _days(shared["time"], i0, i1)}
+
+
+def _net_metrics(net: np.ndarray, maxdd: float | None = None) -> dict:
+    # Sharpe / MaxDD ของรีเทิร์นสุทธิต่อแท่ง (สูตรเดียวกับ pnl_summary); maxdd จาก pnl_path_kernel ใช้ต่อได้เลย
+    if maxdd is None:
+        return net_metrics(net)
+    return {"sharpe": sharpe(net, ddof=1), "maxdd": float(maxdd)}
+
+
+def _run_fold(shared, cell) -> dict:
+    """IS: ทุก config ของกริดในครั้งเดียว → เลือกตัวดีสุดตาม filters; OOS: รันตัวที่เลือกบนช่วงถัดไป"""
+    fold, grid, filters, fee_bps, max_pos = cell
+    s, e = fold.is_start, fold.is_end
+    pos = position_batch_kernel(shared["close"][s:e], shared["atr"][s:e], shared["target"][s:e],
+                                grid[:, 0], grid[:, 1], grid[:, 2].astype(int), grid[:, 3].astype(int),
+                                True, max_pos)
+    summ = pnl_summary(shared["close"][s:e], pos, fee_bps, ret=shared["ret"][s:e])
+    days = _days(shared["time"], s, e)
+    rows = [{**dict(zip(GRID_COLUMNS, g)), "sharpe": r.sharpe, "maxdd": r.maxdd, "trades": int(r.trades),
+             "trades_per_day": r.trades / days} for g, r in zip(grid.tolist(), summ.itertuples())]
+    best = rank(rows, filters)[0]
+    params = {"atr_mult": best["atr_mult"], "step_atr": best["step_atr"],
+              "layers": int(best["layers"]), "cooldown": int(best["cooldown"])}
+
+    fee = (fee_bps / 10000.0) * 2.0
+    net, oos = _segment(shared, fold.oos_start, fold.oos_end, params, fee, max_pos)
+    return {
+        "fold": fold.index, "is_start": s, "is_end": e, "oos_start": fold.oos_start, "oos_end": fold.oos_end,
+        **params, "is_pass": filters.passes(best),
+        **{f"is_{k}": best[k] for k in ("sharpe", "maxdd", "trades", "trades_per_day")},
+        **{f"oos_{k}": v for k, v in oos.items()},
+        "net": net,
+    }
+
+
+@dataclass
+class WalkForwardResult:
+    folds: pd.DataFrame                              # ต่อ fold: ช่วงแท่ง, พารามิเตอร์ที่เลือก, เมตริก IS / OOS
+    oos_net: np.ndarray = field(repr=False)          # รีเทิร์นสุทธิต่อแท่งของ OOS ทุก fold ต่อกัน
+    oos_index: np.ndarray = field(repr=False)        # ตำแหน่งแท่ง (ในอาร์เรย์เต็ม) ของ oos_net
+    aggregate: dict = field(default_factory=dict)    # sharpe / maxdd / trades / trades_per_day ของเส้น OOS รวม
+
+    @property
+    def oos_equity(self) -> np.ndarray:
+        return np.cumprod(1.0 + self.oos_net)
+
+
+def walk_forward(shared: dict[str, np.ndarray], grid, is_bars: int, oos_bars: int, anchored: bool = False,
+                 filters: Filters = Filters(), fee_bps_per_side: float = TAKER_FEE_BPS_PER_SIDE,
+                 max_pos: int = MAX_POS_TOTAL, workers: int = 1) -> WalkForwardResult:
+    """
+    ทุก fold ของ make_folds: เลือกพารามิเตอร์บน IS ด้วยกริด (atr_mult, step_atr, layers, cooldown) แล้วเทรด OOS
+    fold ขนานกันผ่าน core.sweep.run_cells (shared = อาร์เรย์จาก shared_arrays ทั้งประวัติ, publish ครั้งเดียว)
+    เส้น OOS ของทุก fold ต่อกันเป็นเส้นเดียว (แต่ละ fold เริ่มจากไม่มีสถานะและปิดหมดที่แท่งสุดท้าย)
+    """
+    grid = np.asarray(grid, dtype=float).reshape(-1, 4)
+    folds = make_folds(len(shared["close"]), is_bars, oos_bars, anchored)
+    cells = [(f, grid, filters, fee_bps_per_side, max_pos) for f in folds]
+    out: list[dict] = [{} for _ in folds]
+    for i, row, _ in run_cells(_run_fold, cells, shared, workers):
+        out[i] = row
+
+    nets = [row.pop("net") for row in out]
+    oos_net = np.concatenate(nets) if nets else np.empty(0)
+    oos_index = np.concatenate([np.arange(f.oos_start, f.oos_end) for f in folds]) if folds else np.empty(0, int)
+    trades = int(sum(row["oos_trades"] for row in out))
+    agg = {**_net_metrics(oos_net), "trades": trades, "folds": len(folds), "bars": len(oos_net)}
+    agg["trades_per_day"] = trades / _days(shared["time"], int(oos_index[0]), int(oos_index[-1]) + 1) if folds else 0.0
+    return WalkForwardResult(pd.DataFrame(out), oos_net, oos_index, agg)
@@ -11,7 +11,7 @@ def run_live():
     env = TradingEnv()
     model = PPO.load(MODEL_PATH, env=env)
 
-    obs = env.reset()
+    obs, _ = env.reset()
     while True:
         action, _ = model.predict(obs)
         payload = {
@@ -23,9 +23,9 @@ def run_live():
         except Exception as e:
             print(f"Error sending to server: {e}")
 
-        obs, _, done, _ = env.step(action)
-        if done:
-            obs = env.reset()
+        obs, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            obs, _ = env.reset()
 
 if __name__ == "__main__":
     run_live()
@@ -1,10 +1,12 @@
 # drl_agent.py — Train PPO + print full stats (Trades, PF, Expectancy, Sharpe 15m & Daily)
 import numpy as np
+import pandas as pd
 from stable_baselines3 import PPO
 from stable_baselines3.common.vec_env import DummyVecEnv
 
 from trading_env import TradingEnv
 from config import TOTAL_TIMESTEPS, MODEL_PATH, LOG_DIR
+from core import metrics
 
 
 def _to_int_action(a):
@@ -14,20 +16,9 @@ def _to_int_action(a):
 
 def _equity_metrics(time_index, equity_curve):
     eq = np.asarray(equity_curve, dtype=float)
-
-    # Sharpe จาก 15m bar
-    r_bar = np.diff(eq) / np.maximum(eq[:-1], 1e-12)
-    sharpe_15m = np.sqrt(24 * 4 * 252) * (r_bar.mean() / (r_bar.std() + 1e-12))
-
-    # Daily Sharpe (น่าเชื่อถือกว่า)
-    import pandas as pd
-    ts = pd.Series(eq, index=pd.to_datetime(time_index[: len(eq)]))
-    daily_eq = ts.resample("1D").last().dropna()
-    daily_ret = daily_eq.pct_change().dropna()
-    sharpe_daily = np.sqrt(252) * (daily_ret.mean() / (daily_ret.std() + 1e-12))
-
-    peak = np.maximum.accumulate(eq)
-    mdd = ((eq - peak) / np.maximum(peak, 1e-12)).min()
+    sharpe_15m = metrics.sharpe(metrics.returns_from_equity(eq))              # Sharpe จาก 15m bar
+    sharpe_daily = metrics.daily_sharpe(eq, pd.to_datetime(time_index[: len(eq)]))   # Daily Sharpe (น่าเชื่อถือกว่า)
+    mdd = -metrics.max_drawdown(eq)
     net = eq[-1] - eq[0]
     return float(sharpe_15m), float(sharpe_daily), float(mdd), float(net)
 
@@ -73,19 +64,10 @@ def evaluate(model):
 
     # ----- Trade-level stats -----
     trades = np.asarray(getattr(env, "trade_pnls", []), dtype=float)
-    n = int(trades.size)
-    if n > 0:
-        wins = int((trades > 0).sum())
-        losses = int((trades < 0).sum())
-        win_rate = wins / n
-        avg_win = trades[trades > 0].mean() if wins else 0.0
-        avg_loss = (-trades[trades < 0]).mean() if losses else 0.0
-        gross_win = trades[trades > 0].sum() if wins else 0.0
-        gross_loss = -trades[trades < 0].sum() if losses else 0.0
-        pf = (gross_win / max(gross_loss, 1e-12)) if losses else float("inf")
-        expectancy = trades.mean()
-        print(f"Trades: {n} | Win%: {win_rate:.2%} | PF: {pf:.2f} | "
-              f"Expectancy: {expectancy:.2f} | AvgWin: {avg_win:.2f} | AvgLoss: {avg_loss:.2f}")
+    if trades.size > 0:
+        st = metrics.trade_stats(trades)
+        print(f"Trades: {st['trades']} | Win%: {st['win_rate']:.2%} | PF: {st['profit_factor']:.2f} | "
+              f"Expectancy: {st['expectancy']:.2f} | AvgWin: {st['avg_win']:.2f} | AvgLoss: {st['avg_loss']:.2f}")
     else:
         print("Trades: 0")
 
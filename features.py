@@ -3,91 +3,34 @@ import numpy as np
 import pandas as pd
 from typing import Tuple, Dict
 import config
+from core.indicators import ENGINE
 
 def _ema(arr: np.ndarray, period: int) -> np.ndarray:
     if period <= 1:
         return arr
-    alpha = 2.0 / (period + 1.0)
-    out = np.empty_like(arr, dtype=float)
-    out[:] = np.nan
-    prev = np.nan
-    for i, v in enumerate(arr):
-        if np.isnan(v):
-            out[i] = np.nan
-            continue
-        if np.isnan(prev):
-            prev = v
-        else:
-            prev = alpha * v + (1 - alpha) * prev
-        out[i] = prev
-    return out
+    return ENGINE.ema_seeded(arr, period)
 
 def _rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
-    diff = np.diff(close, prepend=close[0])
-    up = np.where(diff > 0, diff, 0.0)
-    dn = np.where(diff < 0, -diff, 0.0)
-    def rma(x, n):
-        out = np.empty_like(x, dtype=float)
-        out[:] = np.nan
-        acc = 0.0
-        cnt = 0
-        alpha = 1.0 / n
-        for i, v in enumerate(x):
-            if np.isnan(v):
-                out[i] = np.nan
-                continue
-            if cnt < n:
-                acc += v
-                cnt += 1
-                out[i] = np.nan if cnt < n else acc / n
-            else:
-                acc = (1 - alpha) * out[i-1] + alpha * v
-                out[i] = acc
-        return out
-    avg_up = rma(up, period)
-    avg_dn = rma(dn, period)
-    rs = avg_up / (avg_dn + 1e-12)
-    rsi = 100.0 - (100.0 / (1.0 + rs))
-    return rsi
+    return ENGINE.rsi_wilder(close, period)
 
 def _atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
-    prev_close = np.roll(close, 1)
-    prev_close[0] = close[0]
-    tr1 = high - low
-    tr2 = np.abs(high - prev_close)
-    tr3 = np.abs(low - prev_close)
-    tr = np.maximum.reduce([tr1, tr2, tr3])
     # RMA/TR EMA แบบ alpha=1/period
-    alpha = 1.0 / period
-    out = np.empty_like(tr, dtype=float)
-    out[:] = np.nan
-    acc = 0.0
-    cnt = 0
-    for i, v in enumerate(tr):
-        if np.isnan(v):
-            out[i] = np.nan
-            continue
-        if cnt < period:
-            acc += v
-            cnt += 1
-            out[i] = np.nan if cnt < period else acc / period
-        else:
-            out[i] = (1 - alpha) * out[i-1] + alpha * v
-    return out
+    return ENGINE.atr_wilder(high, low, close, period)
 
 def build_features(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, str]]:
     """
     Expect df columns: ['time','open','high','low','close','volume']
     Returns: features_df with added columns + meta (for runner/env)
     """
-    df = df.copy()
     for col in ["open", "high", "low", "close", "volume"]:
         if col not in df.columns:
             raise ValueError(f"missing column: {col}")
 
+    # อ่านจากเฟรมต้นฉบับก่อน copy → อาร์เรย์เดิมทุกครั้ง ใช้ memo ของ ENGINE ซ้ำได้
     c = df["close"].to_numpy(dtype=float)
     h = df["high"].to_numpy(dtype=float)
     l = df["low"].to_numpy(dtype=float)
+    df = df.copy()
 
     df["ema_fast"] = _ema(c, config.EMA_FAST)
     df["ema_slow"] = _ema(c, config.EMA_SLOW)
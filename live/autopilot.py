@@ -1,5 +1,4 @@
-import os, sys, numpy as np, pandas as pd
-from datetime import datetime, timezone
+import os, sys, numpy as np
 from stable_baselines3 import PPO
 from pathlib import Path
 
@@ -8,16 +7,9 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-# import features (project-first)
-try:
-    from features import build_state_features as _build
-except Exception:
-    from features import add_indicators, normalize_features
-    def _build(df: pd.DataFrame) -> pd.DataFrame:
-        df = add_indicators(df)
-        df = normalize_features(df)
-        num = df.select_dtypes(include=[np.number]).columns
-        return df[num]
+import config
+# ฟีเจอร์แบบ streaming: อัปเดตทีละแท่ง ไม่คำนวณ history ใหม่ทั้งก้อนทุกครั้งที่ปิดแท่ง
+from core.streaming import StreamingFeatures
 
 from live.bridge.ctrader_bridge import (
     connect, subscribe, on_bar_close, positions, place, modify_sl, close, price, run_sim_from_csv
@@ -35,11 +27,6 @@ BE_AFTER_ATR   = float(os.getenv("BE_AFTER_ATR", "0.5"))
 RISK_PCT_TRADE = float(os.getenv("RISK_PCT_TRADE", "0.005"))
 LOT_SIZE       = float(os.getenv("LOT_SIZE", "1.0"))
 
-def _atr(hist: pd.DataFrame, period: int=14) -> float:
-    h,l,c = hist["high"], hist["low"], hist["close"]
-    tr = pd.concat([h-l, (h-c.shift()).abs(), (l-c.shift()).abs()], axis=1).max(axis=1)
-    return float(tr.rolling(period).mean().iloc[-1])
-
 def main():
     print("[AP] Loading model:", MODEL_PATH)
     try:
@@ -52,19 +39,22 @@ def main():
         model = _Rand()
 
     connect(); subscribe(SYMBOL, TIMEFRAME)
+    # ช่วง EMA / ATR / spike ต้องตรงกับ features.build_features (config) → obs เหมือนตอนเทรน
+    feats = StreamingFeatures(ema_fast=config.EMA_FAST, ema_slow=config.EMA_SLOW, ema_trend=config.EMA_TREND,
+                              atr=config.ATR_PERIOD, spike_mult=config.SPIKE_ATR_MULT, sizing_atr=ATR_PERIOD)
 
     def handle_close(bar: dict):
         hist = bar["history"]
         if len(hist) < 120: return
 
-        feats = _build(hist.copy())
-        obs = feats.iloc[-1].to_numpy(dtype=np.float32).ravel()
+        f = feats.sync(hist)  # ป้อนเฉพาะแถวใหม่ → O(1) ต่อแท่ง
+        obs = feats.obs()
 
         act, _ = model.predict(obs, deterministic=True)
         act = int(np.asarray(act).flatten()[0])  # 0=hold,1=long,2=short
 
         px = float(bar["close"])
-        a  = _atr(hist, ATR_PERIOD)
+        a  = f["atr_sma"]
         if not np.isfinite(a) or a <= 0: return
 
         # risk sizing
@@ -2,12 +2,13 @@
 import numpy as np
 import pandas as pd
 from config import EMA_PERIODS, EMA_SPREAD_THRESHOLD
+from core.indicators import ENGINE
 
 def detect_market_regime(df):
     ema_short, ema_mid, ema_long = EMA_PERIODS
-    df["ema_s"] = df["close"].ewm(span=ema_short).mean()
-    df["ema_m"] = df["close"].ewm(span=ema_mid).mean()
-    df["ema_l"] = df["close"].ewm(span=ema_long).mean()
+    df["ema_s"] = ENGINE.ema(df["close"], ema_short, adjust=True)
+    df["ema_m"] = ENGINE.ema(df["close"], ema_mid, adjust=True)
+    df["ema_l"] = ENGINE.ema(df["close"], ema_long, adjust=True)
 
     spread = (df["ema_s"] - df["ema_l"]) / df["ema_l"]
 
@@ -12,12 +12,21 @@ def step_reward(
       + ผลตอบแทนรายแท่ง (หลังหัก cost)
       + โทษเมื่อเข้าเขต drawdown หนัก (นิ่ม ๆ ไม่แกว่ง)
     """
-    r = step_pnl - trade_cost
     if equity_curve is None or len(equity_curve) < 2:
-        return r
+        return step_pnl - trade_cost
+    return step_reward_peak(step_pnl, float(equity_curve[-1]), float(np.max(equity_curve)),
+                            max_dd_limit, trade_cost)
 
-    peak = np.max(equity_curve)
-    dd = 0.0 if peak <= 0 else 1.0 - (equity_curve[-1] / peak)
+def step_reward_peak(
+    step_pnl: float,
+    equity: float,
+    peak: float,
+    max_dd_limit: float = 0.2,
+    trade_cost: float = 0.0,
+) -> float:
+    """step_reward จาก equity ปัจจุบัน + peak ที่ผู้เรียกถือไว้เอง (O(1) ต่อ step ไม่ต้องส่งทั้งเส้น)"""
+    r = step_pnl - trade_cost
+    dd = 0.0 if peak <= 0 else 1.0 - (equity / peak)
     if dd > max_dd_limit:
         # โทษแบบนิ่ม (soft penalty)
         r -= 0.5 * (dd - max_dd_limit)
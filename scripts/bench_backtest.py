@@ -0,0 +1,118 @@
+# scripts/bench_backtest.py
+# parity ของ core/backtest.py (numba และ fallback Python) เทียบลูป iloc เดิมของ run_quick_backtest + ความเร็ว
+#   python scripts/bench_backtest.py --bars 300000
+# ลูปเดิมช้า → เทียบ parity บน --ref_bars แท่งแรก แล้วประมาณเวลาเต็ม
+import argparse, sys, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from core import kernels
+from core.backtest import BacktestParams, prepare, run_backtest, run_batch, simulate
+from core.synth import generate_bars
+
+
+# ---------- ลูปเดิมของ run_quick_backtest.main (อ้างอิงสำหรับ parity) ----------
+def legacy_rows(df, long_cnt, short_cnt, winner, a_mult, cooldown):
+    pos = 0; entry = 0.0; equity = 1.0; cooldown_left = 0
+    rows = []; enters = exits = 0
+    for i in range(len(df)):
+        c = float(df["close"].iloc[i])
+        a = float(df["atr"].iloc[i]) if not np.isnan(df["atr"].iloc[i]) else 0.0
+        if i > 0:
+            pprev = float(df["close"].iloc[i-1])
+            if pos == 1:   equity *= (c / pprev)
+            elif pos == -1: equity *= (pprev / c)
+        enter_long = enter_short = exit_pos = 0
+        if pos != 0 and a_mult > 0 and a > 0:
+            if pos == 1:
+                stop = entry - a_mult * a
+                if df["low"].iloc[i] <= stop:
+                    exit_pos = 1; exits += 1; pos = 0; entry = 0.0; cooldown_left = cooldown
+            else:
+                stop = entry + a_mult * a
+                if df["high"].iloc[i] >= stop:
+                    exit_pos = 1; exits += 1; pos = 0; entry = 0.0; cooldown_left = cooldown
+        if cooldown_left > 0:
+            cooldown_left -= 1
+        else:
+            want = int(winner.iloc[i])
+            if want == 1 and pos <= 0:
+                if pos == -1: exit_pos = 1; exits += 1
+                pos = 1; entry = c; enter_long = 1; enters += 1; cooldown_left = cooldown
+            elif want == -1 and pos >= 0:
+                if pos == 1: exit_pos = 1; exits += 1
+                pos = -1; entry = c; enter_short = 1; enters += 1; cooldown_left = cooldown
+        rows.append([i, c, int(long_cnt.iloc[i] > 0), int(short_cnt.iloc[i] > 0),
+                     enter_long, enter_short, exit_pos, pos, float(equity)])
+    if pos != 0:
+        rows[-1][6] = 1; exits += 1
+    return rows, enters, exits
+
+
+def engine_rows(arrays, res):
+    cols = [range(len(arrays["close"])), arrays["close"].tolist(),
+            (arrays["long_cnt"] > 0).astype(int).tolist(), (arrays["short_cnt"] > 0).astype(int).tolist()]
+    cols += [res[k].astype(int).tolist() for k in ("enter_long", "enter_short", "exit_pos", "pos")]
+    return [list(r) for r in zip(*cols, res["equity"].tolist())]
+
+
+CASES = [(0.0, 0, 1), (2.0, 3, 1), (1.5, 0, 2), (3.0, 5, 3)]  # (atr_mult, cooldown, vote)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=300_000)
+    ap.add_argument("--ref_bars", type=int, default=20_000)
+    args = ap.parse_args()
+
+    df = generate_bars(args.bars)
+    strats = ["ema", "turtle20", "turtle55"]
+    print(f"[i] numba={kernels.HAVE_NUMBA} jit={kernels.JIT_ENABLED}")
+    sub = df.iloc[:min(args.ref_bars, len(df))].reset_index(drop=True)
+    ok = True
+    for am, cd, vote in CASES:
+        arr = prepare(sub, strats, atr_n=20, vote=vote)
+        frame = pd.DataFrame({k: arr[k] for k in ("close", "high", "low", "atr")})
+        t0 = time.perf_counter()
+        ref, en, ex = legacy_rows(frame, pd.Series(arr["long_cnt"]), pd.Series(arr["short_cnt"]),
+                                  pd.Series(arr["winner"]), am, cd)
+        t_ref = time.perf_counter() - t0
+        res = simulate(arr, am, cd)
+        saved = kernels._quick_backtest_nb
+        kernels._quick_backtest_nb = None  # ทางสำรอง Python ต้องตรงด้วย
+        try:
+            res_py = simulate(arr, am, cd)
+        finally:
+            kernels._quick_backtest_nb = saved
+        same = all(engine_rows(arr, r) == ref and (r["enters"], r["exits"]) == (en, ex) for r in (res, res_py))
+        print(f"[parity] atr_mult={am} cooldown={cd} vote={vote}  rows={len(ref)}  identical={same}")
+        ok &= same
+
+    # run_batch (Stage 1 ของ quick_grid ในการเรียกครั้งเดียว) ต้องเท่ากับ run_backtest ทีละชุด
+    grid = [BacktestParams(minutes=len(sub) * 15, atr_mult=am, cooldown=cd, vote=v)
+            for am in (2.0, 3.0) for v in (1, 2, 3) for cd in (0, 6, 12)]
+    batch = run_batch(sub, grid)
+    one = [run_backtest(sub, p) for p in grid]
+    same = all(b.metrics == o.metrics and (b.enters, b.exits) == (o.enters, o.exits)
+               and all(np.array_equal(b.columns[k], o.columns[k]) for k in ("exit_pos", "pos", "equity"))
+               for b, o in zip(batch, one))
+    print(f"[parity] run_batch {len(grid)} configs == run_backtest each: {same}")
+    ok &= same
+    if not ok:
+        sys.exit(1)
+
+    arr = prepare(df, strats, atr_n=20, vote=1)
+    t0 = time.perf_counter()
+    simulate(arr, 2.0, 3)
+    t_new = time.perf_counter() - t0
+    est_ref = t_ref * len(df) / len(sub)
+    print(f"[bench] bars={len(df)}  engine={t_new * 1000:.1f}ms  legacy~{est_ref:.1f}s  speedup~{est_ref / max(t_new, 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
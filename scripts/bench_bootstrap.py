@@ -0,0 +1,88 @@
+# scripts/bench_bootstrap.py
+# core/bootstrap.py: ตรวจ MaxDD / Sharpe ของ path ที่สุ่มเทียบการเดินทีละแท่งแบบตรง ๆ (path น้อย)
+# แล้วจับเวลา 10k path บนรีเทิร์นสังเคราะห์ 100k แท่ง ทั้งแบบ block และ trades
+#   python scripts/bench_bootstrap.py --bars 100000 --paths 10000
+import argparse, sys, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+import numpy as np
+from core.backtest import compute_metrics
+from core.bootstrap import _paths_maxdd, _trade_segments, _window_stats, bootstrap, returns_from_equity
+
+
+def synthetic(bars: int, seed: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    r = rng.normal(2e-5, 1.5e-3, bars - 1) * (rng.random(bars - 1) < 0.6)    # ช่วงว่างไม่มีสถานะ = รีเทิร์น 0
+    eq = np.r_[1.0, np.cumprod(1.0 + r)]
+    marks = (rng.random(bars) < 4.5 / 96).astype(np.int64)
+    return eq, marks
+
+
+def brute_maxdd(r: np.ndarray, order: list[tuple[int, int]], eq0: float) -> float:
+    eq = eq0 * np.r_[1.0, np.cumprod(1.0 + np.concatenate([r[s:s + n] for s, n in order]))]
+    return float((np.maximum.accumulate(eq) - eq).max())
+
+
+def parity(eq: np.ndarray, marks: np.ndarray, n_paths: int = 20, block: int = 50) -> float:
+    """ส่วนต่างสูงสุดของ MaxDD (สัมพัทธ์) ระหว่างสถิติรายช่วงกับการเดินทีละแท่ง"""
+    r = returns_from_equity(eq)
+    m = len(r)
+    rng = np.random.default_rng(7)
+    worst = 0.0
+
+    # block: บล็อกวนรอบ (ext) → ทุก path เทียบกับการต่อรีเทิร์นตรง ๆ
+    ext = np.r_[r, r[:block]]
+    lg0 = np.r_[0.0, np.cumsum(np.log1p(ext))]
+    k = -(-m // block)
+    last = m - block * (k - 1)
+    full = _window_stats(lg0, np.arange(m), block)
+    stats = [full] * (k - 1) + [_window_stats(lg0, np.arange(m), last)]
+    seg = rng.integers(0, m, size=(n_paths, k))
+    fast = _paths_maxdd(stats, seg, float(eq[0]))
+    for p in range(n_paths):
+        order = [(int(s), block) for s in seg[p, :-1]] + [(int(seg[p, -1]), last)]
+        ref = brute_maxdd(ext, order, float(eq[0]))
+        worst = max(worst, abs(fast[p] - ref) / max(ref, 1e-12))
+
+    # trades: สลับช่วงของแต่ละไม้
+    starts, lens = _trade_segments(marks[1:])
+    lg0 = np.r_[0.0, np.cumsum(np.log1p(r))]
+    tstats = [np.array([_window_stats(lg0, np.array([s]), int(n))[0] for s, n in zip(starts, lens)])]
+    perm = np.array([rng.permutation(len(starts)) for _ in range(n_paths)])
+    fast = _paths_maxdd(tstats, perm, float(eq[0]))
+    for p in range(n_paths):
+        ref = brute_maxdd(r, [(int(starts[i]), int(lens[i])) for i in perm[p]], float(eq[0]))
+        worst = max(worst, abs(fast[p] - ref) / max(ref, 1e-12))
+
+    # path เดิม (ไม่สลับ) ต้องได้ MaxDD เท่ากับ compute_metrics
+    ident = _paths_maxdd(tstats, np.arange(len(starts))[None, :], float(eq[0]))[0]
+    point = compute_metrics(eq, 0).maxdd
+    return max(worst, abs(ident - point) / max(point, 1e-12))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=100_000)
+    ap.add_argument("--paths", type=int, default=10_000)
+    ap.add_argument("--block", type=int, default=96)
+    args = ap.parse_args()
+
+    eq, marks = synthetic(3000)
+    print(f"[parity] max rel diff of MaxDD vs bar-by-bar = {parity(eq, marks):.2e}")
+
+    eq, marks = synthetic(args.bars)
+    for method in ("block", "trades"):
+        t0 = time.perf_counter()
+        res = bootstrap(eq, marks, method, args.paths, args.block)
+        dt = time.perf_counter() - t0
+        lo, hi = res.ci("sharpe")
+        dlo, dhi = res.ci("maxdd")
+        print(f"[{method:<6}] paths={args.paths} bars={args.bars} {dt:.2f}s  sharpe 90%CI=({lo:.3f}, {hi:.3f}) "
+              f"point={res.point['sharpe']:.3f}  maxdd 90%CI=({dlo:.4f}, {dhi:.4f}) point={res.point['maxdd']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
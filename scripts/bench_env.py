@@ -0,0 +1,139 @@
+# scripts/bench_env.py
+# TradingEnv แบบอาร์เรย์ เทียบ step เดิม (pandas .loc / .iloc + obs เป็น dict ทุก step): parity + steps/s
+#   python scripts/bench_env.py --bars 20000
+import argparse, sys, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+import config
+from core.synth import generate_bars
+from reward_fn import step_reward
+from trading_env import OBS_KEYS, Position, TradingEnv
+
+
+# ---------- step เดิม (อ้างอิงสำหรับ parity) ----------
+class LegacyEnv(TradingEnv):
+    def _bar_date(self):
+        return pd.to_datetime(self.data.loc[self.i, "time"]).date()
+
+    def _daily_reset_if_needed(self):
+        d = self._bar_date()
+        if self.cur_day is None:
+            self.cur_day = d
+        elif d != self.cur_day:
+            self.cur_day = d
+            self.daily_risk_used = 0.0
+
+    def reset(self, **kw):
+        super().reset(**kw)
+        self.hist = [self.start_cash]
+        return self._obs(), {}
+
+    def _obs(self):
+        row = self.data.iloc[self.i]
+        return {
+            "close": float(row["close"]),
+            "ema_fast": float(row["ema_fast"]),
+            "ema_slow": float(row["ema_slow"]),
+            "ema_trend": float(row["ema_trend"]),
+            "rsi14": float(row["rsi14"]) if not np.isnan(row["rsi14"]) else 50.0,
+            "atr14": float(row["atr14"]) if not np.isnan(row["atr14"]) else 0.0,
+            "is_spike": bool(row["is_spike"]),
+            "trend_up": int(row["trend_up"]),
+        }
+
+    def step(self, action):
+        done = False
+        self._daily_reset_if_needed()
+        d = self.data
+        px = float(d.loc[self.i, "close"])
+        prev_equity = self.hist[-1]
+        if d.loc[self.i, "is_spike"]:
+            action = 0
+        if self.daily_risk_used >= config.DAILY_RISK_CAP * prev_equity:
+            action = 0
+        step_pnl = 0.0
+        if action == 1:
+            can_long = (d.loc[self.i, "ema_fast"] > d.loc[self.i, "ema_slow"]) \
+                       and (d.loc[self.i, "close"] > d.loc[self.i, "ema_trend"])
+            if can_long:
+                risk_val = self.hist[-1] * config.RISK_PER_TRADE
+                atr = float(d.loc[self.i, "atr14"]) or 0.0
+                stop_px = px - max(atr * 1.5, 0.5)
+                qty = max(int(risk_val / (max(px - stop_px, 1e-4) * self.contract)), 1)
+                if self.pos.side == 0:
+                    self.pos = Position(side=+1, entry=px, qty=qty, sl=stop_px, group_id=self._open_groups)
+                elif self.pos.side == +1 and px > self.pos.entry:
+                    self.pos.qty += qty
+                self.daily_risk_used += config.RISK_PER_TRADE * prev_equity
+        elif action == 2 and self.pos.side != 0:
+            step_pnl += self._position_value(px)
+            self.cash += step_pnl
+            self.pos = Position()
+        if self.pos.side == +1 and self.pos.qty > 0:
+            atr = float(d.loc[self.i, "atr14"]) or 0.0
+            if (px - self.pos.entry) / max(atr, 1e-4) >= config.BREAKEVEN_AFTER_R_MULT:
+                self.pos.sl = max(self.pos.sl or self.pos.entry, self.pos.entry)
+            trail = px - config.ATR_TRAIL_MULT * atr
+            self.pos.sl = trail if self.pos.sl is None else max(self.pos.sl, trail)
+            if px <= (self.pos.sl or -1e9):
+                step_pnl += self._position_value(self.pos.sl)
+                self.cash += step_pnl
+                self.pos = Position()
+        equity = self.cash + self._position_value(px)
+        self.hist.append(equity)
+        reward = step_reward(step_pnl=equity - prev_equity, equity_curve=np.array(self.hist, dtype=float))
+        self.i += 1
+        if self.i >= len(self.data) - 1:
+            done = True
+        return self._obs(), float(reward), bool(done), False, {}
+
+
+def episode(env, actions, keep_obs=False):
+    obs, _ = env.reset()
+    rewards, obs_log = [], []
+    for a in actions:
+        obs, r, term, trunc, _ = env.step(a)
+        rewards.append(r)
+        if keep_obs:
+            obs_log.append(np.array([obs[k] for k in OBS_KEYS], dtype=np.float32) if isinstance(obs, dict) else obs)
+        if term or trunc:
+            break
+    return np.array(rewards), (np.array(obs_log) if keep_obs else None)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=20_000)
+    ap.add_argument("--legacy_steps", type=int, default=5_000, help="จำนวน step ที่จับเวลาของ step เดิม (ช้า)")
+    args = ap.parse_args()
+
+    df = generate_bars(args.bars)
+    new, old = TradingEnv(df), LegacyEnv(df)
+    actions = np.random.default_rng(0).choice(3, size=args.bars, p=[0.6, 0.3, 0.1])
+
+    r_new, o_new = episode(new, actions, keep_obs=True)
+    r_old, o_old = episode(old, actions, keep_obs=True)
+    ok = np.array_equal(r_new, r_old) and np.array_equal(o_new, o_old)
+    print(f"[parity] steps={len(r_new)}  rewards/obs identical={ok}  final equity {new.equity:.4f} vs {old.hist[-1]:.4f}")
+    if not ok:
+        sys.exit(1)
+
+    m = min(args.legacy_steps, len(r_new))
+    t0 = time.perf_counter()
+    episode(old, actions[:m])
+    sps_old = m / (time.perf_counter() - t0)
+    t0 = time.perf_counter()
+    n = len(episode(new, actions)[0])
+    sps_new = n / (time.perf_counter() - t0)
+    print(f"[bench] legacy {sps_old:,.0f} steps/s ({m} steps)  arrays {sps_new:,.0f} steps/s ({n} steps)  "
+          f"speedup {sps_new / sps_old:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# scripts/bench_features.py
+# parity + ความเร็วของ core/kernels.py เทียบลูปเดิมของ features.py
+#   python scripts/bench_features.py --bars 1000000
+# ลูปเดิมช้ามาก → เทียบ parity บน --ref_bars แท่งแรก (ค่าเริ่มต้น 200k) แล้วประมาณเวลาเต็ม
+import argparse, sys, time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+import features
+from core import kernels
+from core.indicators import ENGINE
+from core.synth import generate_bars
+
+
+# ---------- ลูปเดิม (อ้างอิงสำหรับ parity) ----------
+def _legacy_ema(arr, period):
+    if period <= 1:
+        return arr
+    alpha = 2.0 / (period + 1.0)
+    out = np.empty_like(arr, dtype=float)
+    out[:] = np.nan
+    prev = np.nan
+    for i, v in enumerate(arr):
+        if np.isnan(v):
+            out[i] = np.nan
+            continue
+        if np.isnan(prev):
+            prev = v
+        else:
+            prev = alpha * v + (1 - alpha) * prev
+        out[i] = prev
+    return out
+
+def _legacy_rma(x, n):
+    out = np.empty_like(x, dtype=float)
+    out[:] = np.nan
+    acc = 0.0
+    cnt = 0
+    alpha = 1.0 / n
+    for i, v in enumerate(x):
+        if np.isnan(v):
+            out[i] = np.nan
+            continue
+        if cnt < n:
+            acc += v
+            cnt += 1
+            out[i] = np.nan if cnt < n else acc / n
+        else:
+            acc = (1 - alpha) * out[i-1] + alpha * v
+            out[i] = acc
+    return out
+
+def _legacy_rsi(close, period=14):
+    diff = np.diff(close, prepend=close[0])
+    up = np.where(diff > 0, diff, 0.0)
+    dn = np.where(diff < 0, -diff, 0.0)
+    rs = _legacy_rma(up, period) / (_legacy_rma(dn, period) + 1e-12)
+    return 100.0 - (100.0 / (1.0 + rs))
+
+def _legacy_atr(high, low, close, period=14):
+    prev_close = np.roll(close, 1)
+    prev_close[0] = close[0]
+    tr = np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+    return _legacy_rma(tr, period)
+
+
+def feature_set(mod, c, h, l):
+    return [mod._ema(c, 20), mod._ema(c, 50), mod._ema(c, 200), mod._rsi(c, 14), mod._atr(h, l, c, 14)]
+
+def legacy_set(c, h, l):
+    return [_legacy_ema(c, 20), _legacy_ema(c, 50), _legacy_ema(c, 200), _legacy_rsi(c, 14), _legacy_atr(h, l, c, 14)]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=1_000_000)
+    ap.add_argument("--ref_bars", type=int, default=200_000)
+    args = ap.parse_args()
+
+    df = generate_bars(args.bars)
+    c, h, l = (df[k].to_numpy(dtype=float) for k in ("close", "high", "low"))
+    c_nan = c.copy()
+    c_nan[np.random.default_rng(7).integers(0, len(c), size=50)] = np.nan  # เช็คพฤติกรรม NaN ด้วย
+
+    print(f"[i] numba={kernels.HAVE_NUMBA} jit={kernels.JIT_ENABLED}")
+    feature_set(features, c[:1000], h[:1000], l[:1000])  # warm-up / compile
+
+    m = min(args.ref_bars, len(c))
+    for name, cc in (("clean", c), ("with NaN", c_nan)):
+        new = feature_set(features, cc[:m], h[:m], l[:m])
+        t0 = time.perf_counter()
+        ref = legacy_set(cc[:m], h[:m], l[:m])
+        t_ref = time.perf_counter() - t0
+        ok = all(np.array_equal(a, b, equal_nan=True) for a, b in zip(new, ref))
+        print(f"[parity] {name:8s} bars={m}  bit-exact={ok}")
+        if not ok:
+            sys.exit(1)
+
+    ENGINE.clear()  # ไม่ให้ memo ช่วยตอนจับเวลา
+    t0 = time.perf_counter()
+    feature_set(features, c, h, l)
+    t_new = time.perf_counter() - t0
+    est_ref = t_ref * len(c) / m
+    print(f"[bench] bars={len(c)}  kernels={t_new:.3f}s  legacy~{est_ref:.1f}s  speedup~{est_ref / max(t_new, 1e-9):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
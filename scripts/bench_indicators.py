@@ -0,0 +1,96 @@
+# scripts/bench_indicators.py
+# วัดผลของ memo ใน core/indicators.ENGINE: รอบแรก (cold) vs รอบซ้ำบนเฟรมเดิม (warm)
+# + rolling max/min หลายหน้าต่าง (sparse table) และ ema/atr matrix เทียบ pandas ทีละพารามิเตอร์
+#   python scripts/bench_indicators.py --bars 1000000
+import argparse, sys, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from core.entries import combined_signal
+import numpy as np
+
+from core.indicators import ENGINE, atr, atr_matrix, ema_matrix, rolling_extrema
+from core.spike_filter import spike_flag
+from core.synth import generate_bars
+import features
+
+
+def workload(df):
+    combined_signal(df)
+    spike_flag(df)
+    atr(df, 14)
+    c, h, l = (df[k].to_numpy(dtype=float) for k in ("close", "high", "low"))
+    features._ema(c, 20); features._rsi(c, 14); features._atr(h, l, c, 14)
+
+
+def bench_extrema(df, windows):
+    x = df["close"]
+    t0 = time.perf_counter()
+    hi, lo = rolling_extrema(x, windows, "max"), rolling_extrema(x, windows, "min")
+    t_sparse = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ref = [(x.rolling(w).max().to_numpy(), x.rolling(w).min().to_numpy()) for w in windows]
+    t_pd = time.perf_counter() - t0
+    ok = all(np.array_equal(hi[:, j], a, equal_nan=True) and np.array_equal(lo[:, j], b, equal_nan=True)
+             for j, (a, b) in enumerate(ref))
+    print(f"[bench] rolling max+min  windows={len(windows)}  sparse={t_sparse:.3f}s  pandas={t_pd:.3f}s  "
+          f"speedup~{t_pd / max(t_sparse, 1e-9):.1f}x  equal={ok}")
+    return ok
+
+
+def bench_matrices(df, spans, atr_ns):
+    x = df["close"]
+    ema_matrix(x.head(100), spans), atr_matrix(df.head(100), atr_ns)  # compile
+    ok = True
+    for name, fn, ref in (
+        ("ema", lambda dt: ema_matrix(x, spans, dtype=dt),
+         lambda: [x.ewm(span=s, adjust=False, min_periods=s).mean().to_numpy() for s in spans]),
+        ("atr", lambda dt: atr_matrix(df, atr_ns, dtype=dt),
+         lambda: [ENGINE.atr(df, n).to_numpy() for n in atr_ns]),
+    ):
+        ENGINE.clear()
+        t0 = time.perf_counter()
+        m = fn(np.float64)
+        t_mat = time.perf_counter() - t0
+        m32 = fn(np.float32)
+        t0 = time.perf_counter()
+        cols = ref()
+        t_pd = time.perf_counter() - t0
+        eq = all(np.array_equal(m[:, j], c, equal_nan=True) for j, c in enumerate(cols))
+        ok &= eq
+        print(f"[bench] {name}_matrix  params={m.shape[1]}  matrix={t_mat:.3f}s  pandas={t_pd:.3f}s  "
+              f"equal={eq}  MB f64={m.nbytes / 1e6:.0f} f32={m32.nbytes / 1e6:.0f}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--windows", default="10:201:5", help="start:stop:step ของความยาว breakout")
+    args = ap.parse_args()
+
+    df = generate_bars(args.bars)
+    workload(df.head(1000))  # warm-up / compile
+    for cache in (0, ENGINE.maxsize or 256):
+        ENGINE.clear()
+        ENGINE.maxsize = cache
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            workload(df)
+            times.append(time.perf_counter() - t0)
+        st = ENGINE.stats()
+        print(f"[bench] cache={cache:<4d} bars={len(df)}  " + "  ".join(f"{t:.3f}s" for t in times)
+              + f"  hits={st['hits']} misses={st['misses']} hit_rate={st['hit_rate']:.0%}")
+
+    ok = bench_extrema(df, range(*map(int, args.windows.split(":"))))
+    ok &= bench_matrices(df, range(5, 201, 5), range(7, 31))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# scripts/bench_metrics.py
+# core/metrics.py: summarize (แท่ง × config ในการเรียกครั้งเดียว) เทียบลูปทีละไม้ / net_metrics ทีละคอลัมน์ / pnl_summary
+# และ RunningMetrics (ทีละแท่ง) เทียบเมตริกแบบ batch บนประวัติเดียวกัน
+#   python scripts/bench_metrics.py --bars 20000 --configs 64
+import argparse, sys, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+import numpy as np
+from config import TAKER_FEE_BPS_PER_SIDE
+from core.kernels import pnl_path_kernel
+from core.metrics import (NS_PER_DAY, RunningMetrics, daily_sharpe, expectancy, max_drawdown, net_metrics,
+                          profit_factor, returns_from_equity, sharpe, summarize, trade_returns)
+from core.position_manager import bar_returns, pnl_summary
+from core.synth import generate_bars
+
+
+def trades_loop(net: np.ndarray, pos: np.ndarray) -> tuple[list[float], np.ndarray]:
+    """ไม้ของคอลัมน์เดียวแบบเดินทีละแท่ง → (กำไรต่อไม้, แท่งที่ปิดไม้ต่อไม้) ไม้ที่ยังเปิดปิดที่แท่งสุดท้าย"""
+    pnl, at = [], []
+    acc, open_, prev = 0.0, False, 0.0
+    for i in range(len(net)):
+        h = float(pos[i - 1]) if i > 0 else 0.0
+        if i > 0 and h != prev:
+            if h == 0:                      # ปิดเป็นว่าง: ค่าธรรมเนียมแท่งนี้เป็นของไม้ที่ปิด
+                pnl.append(acc + net[i]); at.append(i); open_ = False
+            else:                           # เปิดใหม่ / กลับฝั่ง / เปลี่ยนขนาด → ไม้ใหม่
+                if open_:
+                    pnl.append(acc); at.append(i - 1)
+                acc, open_ = net[i], True
+        elif open_:
+            acc += net[i]
+        prev = h
+    if open_:
+        pnl.append(acc); at.append(len(net) - 1)
+    return pnl, np.array(at, dtype=np.int64)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=20_000)
+    ap.add_argument("--configs", type=int, default=64)
+    args = ap.parse_args()
+
+    df = generate_bars(args.bars)
+    ret = bar_returns(df["close"].to_numpy(dtype=float))
+    n, k = len(ret), args.configs
+    rng = np.random.default_rng(5)
+    # pos -2..2 เป็นช่วงยาวสุ่มต่อคอลัมน์ → มีทั้งเปิด/ปิด/กลับฝั่ง/เปลี่ยนขนาด
+    pos = np.zeros((n, k), order="F")
+    for j in range(k):
+        lens = rng.integers(1, 40, size=n // 2)
+        pos[:, j] = np.repeat(rng.integers(-2, 3, size=len(lens)), lens)[:n]
+    fee = (TAKER_FEE_BPS_PER_SIDE / 10000.0) * 2.0
+    net = np.empty((n, k), order="F")
+    for j in range(k):
+        pnl_path_kernel(ret, pos[:, j], fee, net[:, j])
+
+    ok = True
+    # 1) summarize: sharpe / maxdd ตรง net_metrics ทีละคอลัมน์และ pnl_summary ทุกบิต
+    t0 = time.perf_counter()
+    summ = summarize(net, pos)
+    t_sum = time.perf_counter() - t0
+    ref = [net_metrics(net[:, j]) for j in range(k)]
+    same = (np.array_equal(summ["sharpe"], [r["sharpe"] for r in ref])
+            and np.array_equal(summ["maxdd"], [r["maxdd"] for r in ref]))
+    ps = pnl_summary(np.empty(n), pos, ret=ret)
+    same &= np.array_equal(summ["sharpe"], ps["sharpe"]) and np.array_equal(summ["maxdd"], ps["maxdd"])
+    print(f"[parity] summarize sharpe/maxdd vs net_metrics + pnl_summary  bit-exact={same}")
+    ok &= same
+
+    # 2) summarize: trades / profit_factor / expectancy เทียบลูปทีละไม้
+    t0 = time.perf_counter()
+    loops = [trades_loop(net[:, j], pos[:, j]) for j in range(k)]
+    t_loop = time.perf_counter() - t0
+    cnt = np.array([len(p) for p, _ in loops])
+    pf = np.array([profit_factor(p) for p, _ in loops])
+    ex = np.array([expectancy(p) for p, _ in loops])
+    same = (np.array_equal(summ["trades"], cnt) and np.allclose(summ["profit_factor"], pf, rtol=1e-10)
+            and np.allclose(summ["expectancy"], ex, rtol=1e-10, atol=1e-15))
+    print(f"[parity] summarize trades/pf/expectancy vs per-trade loop  ok={same}  "
+          f"trades={int(cnt.sum())}")
+    ok &= same
+
+    # 3) RunningMetrics ทีละแท่ง (เวกเตอร์ k config) เทียบ batch
+    eq = np.cumprod(1.0 + net, axis=0)
+    closed = np.zeros((n, k), dtype=bool)
+    tpnl = np.zeros((n, k))
+    for j, (p, at) in enumerate(loops):
+        closed[at, j] = True
+        tpnl[at, j] = p
+    t = df["time"]
+    day = t.dt.tz_localize(None).to_numpy().astype("datetime64[ns]").view("i8") // NS_PER_DAY
+    rm = RunningMetrics(k)
+    t0 = time.perf_counter()
+    for i in range(n):
+        rm.update(eq[i], tpnl[i], closed[i], day=int(day[i]))
+    t_run = time.perf_counter() - t0
+    pnl, col = trade_returns(net, pos)
+    checks = {
+        "sharpe": (rm.sharpe, sharpe(returns_from_equity(eq))),
+        "daily_sharpe": (rm.daily_sharpe, daily_sharpe(eq, t)),
+        "maxdd": (rm.maxdd, max_drawdown(eq)),
+        "maxdd_abs": (rm.maxdd_abs, max_drawdown(eq, relative=False)),
+        "trades": (rm.trades, np.bincount(col, minlength=k)),
+        "profit_factor": (rm.profit_factor, profit_factor(pnl, col, k)),
+        "expectancy": (rm.expectancy, expectancy(pnl, col, k)),
+    }
+    for name, (got, want) in checks.items():
+        same = bool(np.allclose(got, want, rtol=1e-9, atol=1e-12))
+        print(f"[parity] RunningMetrics.{name:14s} vs batch  ok={same}")
+        ok &= same
+    if not ok:
+        sys.exit(1)
+
+    print(f"[bench] bars={n} configs={k}  summarize {t_sum * 1e3:.1f} ms  per-trade loop {t_loop * 1e3:.1f} ms  "
+          f"speedup {t_loop / max(t_sum, 1e-9):.0f}x  RunningMetrics {t_run / n * 1e6:.1f} us/bar")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# scripts/bench_positions.py
+# parity ของ core.position_manager.simulate_positions (numba และ fallback Python) เทียบลูปเดิมทีละแท่ง + ความเร็ว
+# และ simulate_positions_batch (กริด atr_mult × step × layers) เทียบการรันทีละ config + pnl แบบ pandas เดิม
+#   python scripts/bench_positions.py --bars 1000000
+# ลูปเดิมช้า → เทียบ parity บน --ref_bars แท่งแรก แล้วประมาณเวลาเต็ม
+import argparse, itertools, sys, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from config import ANN_FACTOR, MAX_POS_TOTAL, TAKER_FEE_BPS_PER_SIDE
+from core import kernels
+from core.entries import combined_signal
+from core.position_manager import (_filled_atr, generate_position_series, simulate_positions,
+                                   simulate_positions_batch)
+from core.synth import generate_bars
+
+
+# ---------- ลูปเดิมของ generate_position_series (อ้างอิงสำหรับ parity; a = ATR ที่เติมแล้ว) ----------
+def legacy_positions(px, a, base, atr_mult=3.0, pyramid_step_atr=1.2, max_layers=0,
+                     flatten_on_opposite=True, cooldown_bars=8):
+    n = len(px)
+    a = pd.Series(a); base = pd.Series(base)
+    pos = np.zeros(n, dtype=float)
+    cur_pos = 0; avg_entry = np.nan; layers = 0
+    peak = trough = trail = None
+    last_change_i = -10**9
+
+    for i in range(n):
+        price = float(px[i]); ai = float(max(1e-9, a.iat[i])); bt = int(base.iat[i])
+
+        if cur_pos > 0:
+            peak = price if peak is None else max(peak, price)
+            t = peak - atr_mult * ai
+            trail = t if trail is None else max(trail, t)
+            if price <= trail:
+                cur_pos = 0; avg_entry = np.nan; layers = 0
+                peak = trough = trail = None; last_change_i = i
+        elif cur_pos < 0:
+            trough = price if trough is None else min(trough, price)
+            t = trough + atr_mult * ai
+            trail = t if trail is None else min(trail, t)
+            if price >= trail:
+                cur_pos = 0; avg_entry = np.nan; layers = 0
+                peak = trough = trail = None; last_change_i = i
+
+        if flatten_on_opposite and cur_pos != 0 and bt * cur_pos < 0:
+            cur_pos = 0; avg_entry = np.nan; layers = 0
+            peak = trough = trail = None; last_change_i = i
+
+        can_open = (i - last_change_i) >= cooldown_bars
+        if cur_pos == 0:
+            if can_open:
+                if bt > 0:
+                    cur_pos = 1; avg_entry = price; layers = 0
+                    peak = price; trough = None; trail = peak - atr_mult * ai; last_change_i = i
+                elif bt < 0:
+                    cur_pos = -1; avg_entry = price; layers = 0
+                    trough = price; peak = None; trail = trough + atr_mult * ai; last_change_i = i
+        else:
+            if max_layers > 0:
+                if cur_pos > 0 and bt > cur_pos and layers < max_layers:
+                    trigger = avg_entry + (layers + 1) * pyramid_step_atr * ai
+                    if price >= trigger:
+                        add = min(1, MAX_POS_TOTAL - cur_pos)
+                        if add > 0:
+                            avg_entry = (avg_entry * cur_pos + price * add) / (cur_pos + add)
+                            cur_pos += add; layers += 1
+                            peak = price if peak is None else max(peak, price)
+                            trail = max(trail or (peak - atr_mult * ai), peak - atr_mult * ai)
+                elif cur_pos < 0 and bt < cur_pos and layers < max_layers:
+                    trigger = avg_entry - (layers + 1) * pyramid_step_atr * ai
+                    if price <= trigger:
+                        add = min(1, MAX_POS_TOTAL - abs(cur_pos))
+                        if add > 0:
+                            avg_entry = (avg_entry * abs(cur_pos) + price * add) / (abs(cur_pos) + add)
+                            cur_pos -= add; layers += 1
+                            trough = price if trough is None else min(trough, price)
+                            trail = min(trail or (trough + atr_mult * ai), trough + atr_mult * ai)
+
+        cur_pos = max(-MAX_POS_TOTAL, min(MAX_POS_TOTAL, cur_pos))
+        pos[i] = cur_pos
+    return pos
+
+
+def legacy_pnl(close, pos):
+    # run_one เดิมของ backtests/sweep_pyramid_trailing.py
+    close, pos = pd.Series(close), pd.Series(pos, dtype=float)
+    hold = pos.shift(1).fillna(0)
+    ret = close.pct_change().fillna(0.0)
+    fee = (TAKER_FEE_BPS_PER_SIDE / 10000.0) * 2.0
+    net = hold * ret - (hold.diff().abs().fillna(0) > 0).astype(int) * fee
+    r = net.dropna()
+    shp = 0.0 if len(r) < 2 or r.std() == 0 else (r.mean() / r.std()) * np.sqrt(ANN_FACTOR)
+    eq = (1 + net.fillna(0)).cumprod()
+    mdd = float(-((eq / eq.cummax()) - 1).min())
+    return shp, mdd, int((hold.diff().abs() > 0).sum() // 2)
+
+
+CASES = [  # (atr_mult, step_atr, max_layers, flatten, cooldown)
+    (3.0, 1.2, 0, True, 8),
+    (1.8, 0.6, 3, True, 0),
+    (2.5, 1.0, 2, False, 4),
+    (0.5, 0.2, 3, True, 12),
+]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=1_000_000)
+    ap.add_argument("--ref_bars", type=int, default=100_000)
+    args = ap.parse_args()
+
+    df = generate_bars(args.bars)
+    px = df["close"].to_numpy(dtype=float)
+    a = _filled_atr(df, 14)
+    # เป้าหมาย -3..3 แบบเปลี่ยนเป็นช่วง ๆ → ผ่านทุกสาขา (pyramid / flatten / trailing)
+    rng = np.random.default_rng(11)
+    target = np.repeat(rng.integers(-3, 4, size=len(px) // 20 + 1), 20)[:len(px)]
+
+    print(f"[i] numba={kernels.HAVE_NUMBA} jit={kernels.JIT_ENABLED}")
+    m = min(args.ref_bars, len(px))
+    ok = True
+    for am, st, ly, fl, cd in CASES:
+        kw = dict(atr_mult=am, pyramid_step_atr=st, max_layers=ly, flatten_on_opposite=fl, cooldown_bars=cd)
+        t0 = time.perf_counter()
+        ref = legacy_positions(px[:m], a[:m], target[:m], **kw)
+        t_ref = time.perf_counter() - t0
+        got = simulate_positions(px[:m], a[:m], target[:m], **kw)
+        saved = kernels._position_nb
+        kernels._position_nb = None  # ทางสำรอง Python ต้องตรงด้วย
+        try:
+            py = simulate_positions(px[:m], a[:m], target[:m], **kw)
+        finally:
+            kernels._position_nb = saved
+        same = np.array_equal(got["pos"], ref) and all(
+            np.array_equal(got[k], py[k], equal_nan=True) for k in got)
+        flat = got["pos"] == 0
+        same &= bool(np.isnan(got["entry"][flat]).all() and np.isnan(got["stop"][flat]).all())
+        print(f"[parity] {kw}  bit-exact={same}")
+        ok &= same
+
+    # wrapper เดิมบน combined_signal (Series)
+    sub = df.iloc[:m]
+    sig = combined_signal(sub)
+    base = np.sign(sig.to_numpy()).astype(int)
+    same = np.array_equal(generate_position_series(sub, sig).to_numpy(), legacy_positions(
+        sub["close"].to_numpy(dtype=float), _filled_atr(sub, 14), base))
+    print(f"[parity] generate_position_series  bit-exact={same}")
+    if not (ok and same):
+        sys.exit(1)
+
+    # batch: กริดแบบ sweep_pyramid_trailing (7×5×4) เทียบรันทีละ config
+    grid = np.array(list(itertools.product((1.8, 2.0, 2.25, 2.5, 2.75, 3.0, 3.25),
+                                           (0.6, 0.8, 1.0, 1.2, 1.4), (0, 1, 2, 3))))
+    bkw = dict(atr_mult=grid[:, 0], pyramid_step_atr=grid[:, 1], max_layers=grid[:, 2].astype(int), cooldown_bars=4)
+    pos, summ = simulate_positions_batch(px[:m], a[:m], target[:m], **bkw)
+    same = True
+    for j in range(0, len(grid), 7):
+        one = simulate_positions(px[:m], a[:m], target[:m], atr_mult=grid[j, 0], pyramid_step_atr=grid[j, 1],
+                                 max_layers=int(grid[j, 2]), cooldown_bars=4)["pos"]
+        same &= np.array_equal(pos[:, j], one)
+        same &= legacy_pnl(px[:m], one) == tuple(summ.loc[j, ["sharpe", "maxdd", "trades"]])
+    print(f"[parity] batch {len(grid)} configs (pos + pnl)  bit-exact={same}")
+    if not same:
+        sys.exit(1)
+
+    kw = dict(zip(("atr_mult", "pyramid_step_atr", "max_layers", "flatten_on_opposite", "cooldown_bars"), CASES[1]))
+    simulate_positions(px[:1000], a[:1000], target[:1000], **kw)  # warm-up / compile
+    t0 = time.perf_counter()
+    simulate_positions(px, a, target, **kw)
+    t_new = time.perf_counter() - t0
+    est_ref = t_ref * len(px) / m
+    print(f"[bench] bars={len(px)}  engine={t_new:.3f}s  legacy~{est_ref:.1f}s  speedup~{est_ref / max(t_new, 1e-9):.0f}x")
+
+    t0 = time.perf_counter()
+    simulate_positions_batch(px, a, target, **bkw)
+    t_b = time.perf_counter() - t0
+    print(f"[bench] batch {len(grid)} configs  {t_b:.2f}s  (~{t_b / est_ref:.2f} legacy single runs, "
+          f"jit={kernels.JIT_ENABLED})")
+
+
+if __name__ == "__main__":
+    main()
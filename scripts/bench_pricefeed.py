@@ -0,0 +1,95 @@
+# scripts/bench_pricefeed.py
+# PriceFeed.refresh (parse เฉพาะแถวต่อท้าย) เทียบ parse ทั้งไฟล์: parity + เวลาต่อบาร์
+# รวมเคสบรรทัดท้ายที่ผู้เขียนยังเขียนไม่จบ (ต้องไม่ถูกอ่าน จนกว่าจะมี \n) และแก้ค่ากลางไฟล์แบบขนาดเท่าเดิม
+#   python scripts/bench_pricefeed.py --bars 200000 --append 200
+import argparse, shutil, sys, tempfile, time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from core.data_loader import PriceFeed, load_price_csv, parse_price_csv
+from core.synth import generate_bars
+
+COLS = ["time", "open", "high", "low", "close", "volume"]
+
+
+def _lines(df: pd.DataFrame) -> list[str]:
+    t = df["time"].dt.tz_convert("UTC").dt.strftime("%Y-%m-%d %H:%M:%S")
+    return [",".join(map(str, row)) + "\n" for row in zip(t, *(df[k].tolist() for k in COLS[1:]))]
+
+
+def _same(name: str, got: pd.DataFrame, ref: pd.DataFrame) -> bool:
+    try:
+        pd.testing.assert_frame_equal(got.reset_index(drop=True), ref.reset_index(drop=True))
+        ok = True
+    except AssertionError:
+        ok = False
+    print(f"[parity] {name:28s} rows={len(got):>7}  equal_to_full_parse={ok}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=200_000)
+    ap.add_argument("--append", type=int, default=200, help="จำนวนบาร์ที่ต่อท้ายทีละแถว")
+    args = ap.parse_args()
+
+    lines = _lines(generate_bars(args.bars + args.append + 1)[COLS])
+    base, extra, last = lines[:args.bars], lines[args.bars:-1], lines[-1]
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        path = tmp / "prices.csv"
+        path.write_text(",".join(COLS) + "\n" + "".join(base), encoding="utf-8")
+        feed = PriceFeed(path, use_cache=True)
+
+        t0 = time.perf_counter()
+        for ln in extra:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(ln)
+            feed.refresh()
+        t_inc = (time.perf_counter() - t0) / len(extra)
+        ok = _same("refresh per bar", feed.df, parse_price_csv(path))
+
+        # บรรทัดท้ายเขียนไม่จบ → ไม่เพิ่มแถว, dtype เดิม; เขียนจบ → ได้แถวนั้นครบ
+        cut = len(last) // 2
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(last[:cut])
+        dtypes = feed.df.dtypes.copy()
+        added = feed.refresh()
+        half_ok = added == 0 and feed.df.dtypes.equals(dtypes)
+        print(f"[parity] {'half-written line':28s} added={added}  dtypes_unchanged={feed.df.dtypes.equals(dtypes)}")
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(last[cut:])
+        added = feed.refresh()
+        half_ok = half_ok and added == 1
+        ref = parse_price_csv(path)
+        ok = all([ok, half_ok,
+                  _same("refresh after completed line", feed.df, ref),
+                  _same("on-disk cache", load_price_csv(path, use_cache=True), ref)])
+
+        # แก้ค่ากลางไฟล์แบบขนาดเท่าเดิม (งาน clean ข้อมูลปกติ) → แคชต้องไม่คืนคอลัมน์เก่า
+        body = path.read_bytes()
+        mid = body.index(b"\n", len(body) // 2) + 1
+        end = body.index(b"\n", mid)
+        row = body[mid:end]
+        digit = row.rindex(b".") + 1                      # ทศนิยมหลักแรกของค่าท้ายที่เป็น float
+        fixed = row[:digit] + (b"1" if row[digit:digit + 1] != b"1" else b"2") + row[digit + 1:]
+        path.write_bytes(body[:mid] + fixed + body[end:])
+        ok = _same("same-size edit mid-file", load_price_csv(path, use_cache=True), parse_price_csv(path)) and ok
+
+        t0 = time.perf_counter()
+        parse_price_csv(path)
+        t_full = time.perf_counter() - t0
+        print(f"[bench] refresh {t_inc * 1e3:.2f} ms/bar  full parse {t_full * 1e3:.1f} ms  "
+              f"speedup {t_full / max(t_inc, 1e-9):.0f}x")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
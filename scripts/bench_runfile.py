@@ -0,0 +1,64 @@
+# scripts/bench_runfile.py
+# out.txt เดิม เทียบรันแบบไบนารี (core/runfile.py): ขนาดไฟล์ + เวลาอ่าน/เขียน ต่อรัน และความตรงกันของคอลัมน์
+#   python scripts/bench_runfile.py --bars 300000 --runs 5
+import argparse, shutil, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+import numpy as np
+from core.backtest import OUT_COLUMNS
+from core.runfile import RUN_COLUMNS, open_run, write_run
+
+
+def _size(p: Path) -> int:
+    return sum(f.stat().st_size for f in p.rglob("*")) if p.is_dir() else p.stat().st_size
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=300_000)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    n = args.bars
+    pos = np.sign(np.round(np.cumsum(rng.normal(0, 0.2, n)) % 3 - 1)).astype(int)
+    cols = {"close": 2000 + np.cumsum(rng.normal(0, 1, n)),
+            "want_long": rng.random(n) < 0.5, "want_short": rng.random(n) < 0.5,
+            "enter_long": np.r_[0, np.diff(pos) > 0], "enter_short": np.r_[0, np.diff(pos) < 0],
+            "exit_pos": np.r_[0, (pos[:-1] != 0) & (pos[1:] != pos[:-1])], "pos": pos,
+            "equity": np.cumprod(1 + rng.normal(1e-5, 1e-3, n))}
+
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        txt = tmp / "out.txt"
+        t0 = time.perf_counter()
+        with open(txt, "w", encoding="utf-8") as f:
+            for row in zip(range(n), *(np.asarray(cols[k]).tolist() if cols[k].dtype.kind == "f"
+                                      else np.asarray(cols[k]).astype(int).tolist() for k in OUT_COLUMNS[1:])):
+                f.write(",".join(map(str, row)) + "\n")
+        t_w = {"txt": time.perf_counter() - t0}
+        paths = {"txt": txt}
+        for name, compress in (("run", False), ("npz", True)):
+            t0 = time.perf_counter()
+            paths[name] = write_run(tmp / "out", cols, compress=compress)
+            t_w[name] = time.perf_counter() - t0
+
+        ref = open_run(txt)
+        for name, p in paths.items():
+            t0 = time.perf_counter()
+            for _ in range(args.runs):
+                run = open_run(p)
+                eq = float(np.asarray(run["equity"]).sum())      # แตะข้อมูลจริง (memmap อ่านตอนใช้)
+            t_r = (time.perf_counter() - t0) / args.runs
+            same = all(np.array_equal(np.asarray(run[k]), np.asarray(ref[k])) for k in RUN_COLUMNS)
+            print(f"[{name:>3}] {_size(p) / 1e6:8.2f} MB  write {t_w[name]:.3f}s  read {t_r * 1e3:8.1f} ms  "
+                  f"equal_to_txt={same}  ({eq:.3f})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
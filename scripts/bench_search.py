@@ -0,0 +1,80 @@
+# scripts/bench_search.py
+# Stage 1 แบบกริดเต็ม (36 เซลล์) เทียบ successive halving / TPE ของ core/search.py:
+# จำนวนการประเมิน, ต้นทุนเป็นแท่งรวม และ Sharpe ที่ดีที่สุดที่ผ่านเกณฑ์ (trades/day, MaxDD)
+#   python scripts/bench_search.py --minutes 60000 --seeds 5
+import argparse, itertools, sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+import numpy as np
+from core.backtest import DATA, BacktestParams, OHLCVStore, load_data, run_backtest, shared_inputs
+from core.search import Filters, halving_budgets, rank, sample_space, successive_halving, tpe_search
+from core.synth import generate_bars
+from backtests.quick_grid import MIN_SEARCH_MINUTES, SEARCH_SPACE, STRATS
+
+
+class Counter:
+    """evaluate ของ core/search.py ที่นับจำนวนครั้ง + แท่งที่ใช้ (indicator ต่อหน้าต่างคำนวณครั้งเดียว)"""
+    def __init__(self, data):
+        self.data, self.shared, self.evals, self.bars = data, {}, 0, 0
+
+    def __call__(self, cands, minutes):
+        if minutes not in self.shared:
+            self.shared[minutes] = shared_inputs(self.data, BacktestParams(minutes=minutes, strats=STRATS))
+        rows = []
+        for p in cands:
+            m = run_backtest(self.shared[minutes], BacktestParams(minutes=minutes, strats=STRATS, **p)).metrics
+            rows.append({**p, "minutes": minutes, "sharpe": m.sharpe, "maxdd": m.maxdd, "trades": m.trades,
+                         "trades_per_day": m.trades / (minutes / 1440.0)})
+        self.evals += len(cands)
+        self.bars += len(cands) * len(self.shared[minutes]["close"])
+        return rows
+
+
+def best(rows, minutes, filters):
+    full = [r for r in rank(rows, filters) if r["minutes"] == minutes and filters.passes(r)]
+    return full[0]["sharpe"] if full else float("nan")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--minutes", type=int, default=60000)
+    ap.add_argument("--trials", type=int, default=60, help="halving: ชุดเริ่ม")
+    ap.add_argument("--tpe_trials", type=int, default=24)
+    ap.add_argument("--seeds", type=int, default=5)
+    ap.add_argument("--max_dd", type=float, default=None)
+    ap.add_argument("--bars", type=int, default=300_000, help="ขนาดข้อมูลสังเคราะห์ถ้าไม่มีไฟล์ราคา")
+    args = ap.parse_args()
+
+    data = load_data(DATA) if DATA.exists() else OHLCVStore.from_frame(generate_bars(args.bars))
+    filters = Filters(3.0, args.max_dd)
+
+    ev = Counter(data)
+    grid = [{"atr_mult": am, "vote": v, "cooldown": cd, "max_layers": 0}
+            for am, v, cd in itertools.product((2.0, 2.5, 3.0, 3.5), (1, 2, 3), (0, 6, 12))]
+    ref = best(ev(grid, args.minutes), args.minutes, filters)
+    print(f"[grid]    evals={ev.evals:>3} bars={ev.bars:>9,} best sharpe={ref:.6f}")
+    ref_bars = ev.bars
+
+    budgets = halving_budgets(args.minutes, 3, 3, floor=min(MIN_SEARCH_MINUTES, args.minutes))
+    for name in ("halving", "tpe"):
+        res = []
+        for seed in range(args.seeds):
+            ev = Counter(data)
+            if name == "halving":
+                cands = sample_space(SEARCH_SPACE, args.trials, np.random.default_rng(seed))
+                rows = successive_halving(ev, cands, budgets, eta=3, filters=filters, log=None)
+            else:
+                rows = tpe_search(ev, SEARCH_SPACE, args.tpe_trials, args.minutes, filters=filters,
+                                  seed=seed, log=None)
+            res.append((ev.evals, ev.bars, best(rows, args.minutes, filters)))
+        ev_n, bars, sh = (np.array(x, dtype=float) for x in zip(*res))
+        print(f"[{name:<7}] evals={ev_n.mean():>5.1f} bars={bars.mean():>9,.0f} ({bars.mean() / ref_bars:.0%} of grid) "
+              f"best sharpe median={np.nanmedian(sh):.6f} >=grid in {(sh >= ref - 1e-9).sum()}/{len(sh)} "
+              f"(no passing config in {np.isnan(sh).sum()})")
+
+
+if __name__ == "__main__":
+    main()
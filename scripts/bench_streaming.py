@@ -0,0 +1,69 @@
+# scripts/bench_streaming.py
+# parity ของ core/streaming.py เทียบแบบ batch (seed ครึ่งแรก + update ทีละแท่ง) และ latency ต่อแท่งตามความยาว history
+#   python scripts/bench_streaming.py --bars 50000
+import argparse, sys, time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+import features
+from core.indicators import ENGINE, bbands
+from core.streaming import (StreamingATR, StreamingBollinger, StreamingEMA, StreamingFeatures,
+                            StreamingRSI, RollingMax, RollingMin)
+from core.synth import generate_bars
+
+
+def check(name, make, cols, batch, cut):
+    s = make()
+    head = s.seed(*(x[:cut] for x in cols))
+    tail = [s.update(*(x[i] for x in cols)) for i in range(cut, len(cols[0]))]
+    got = np.r_[head[0] if isinstance(head, tuple) else head,
+                [v[0] if isinstance(v, tuple) else v for v in tail]]
+    ok = np.array_equal(got, np.asarray(batch, dtype=float), equal_nan=True)
+    print(f"[parity] {name:12s} bit-exact={ok}")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--bars", type=int, default=50_000)
+    args = ap.parse_args()
+
+    df = generate_bars(args.bars)[["time", "open", "high", "low", "close", "volume"]]
+    c, h, l = (df[k].to_numpy(dtype=float) for k in ("close", "high", "low"))
+    cut = len(c) // 2
+    ok = all([
+        check("ema20", lambda: StreamingEMA(20), (c,), features._ema(c, 20), cut),
+        check("rsi14", lambda: StreamingRSI(14), (c,), features._rsi(c, 14), cut),
+        check("atr14 wilder", lambda: StreamingATR(14, "wilder"), (h, l, c), features._atr(h, l, c, 14), cut),
+        check("atr14 sma", lambda: StreamingATR(14, "sma"), (h, l, c), ENGINE.atr(df, 14), cut),
+        check("max20", lambda: RollingMax(20), (c,), df["close"].rolling(20).max(), cut),
+        check("min55", lambda: RollingMin(55), (c,), df["close"].rolling(55).min(), cut),
+        check("bb20 up", lambda: StreamingBollinger(20), (c,), bbands(df["close"])[0], cut),
+    ])
+
+    # latency: history สั้น vs ยาว, โตทีละแถว vs หน้าต่างยาวคงที่ที่เลื่อนไป → ต้องใกล้เคียงกัน และค่าตรงกัน
+    for n in sorted({min(1_000, len(df) - 201), len(df) - 201}):
+        out = {}
+        for mode in ("grow", "window"):
+            hs = [df.iloc[(0 if mode == "grow" else i - n):i + 1] for i in range(n, n + 200)]
+            sf = StreamingFeatures()
+            sf.sync(hs[0])
+            t0 = time.perf_counter()
+            for hist in hs[1:]:
+                sf.sync(hist)
+            dt = (time.perf_counter() - t0) / (len(hs) - 1)
+            out[mode] = sf.value
+            print(f"[bench] history={n:>8d} {mode:6s}  sync {dt * 1e6:8.1f} us/bar")
+        same = out["grow"] == out["window"]
+        print(f"[parity] sync rolling window vs growing history  equal={same}")
+        ok &= same
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
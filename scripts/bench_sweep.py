@@ -0,0 +1,56 @@
+# scripts/bench_sweep.py
+# เวลาของกริด Stage 1 (36 เซลล์ run_backtest) แบบรันทีละเซลล์ เทียบ core.sweep.run_cells
+# (indicator คำนวณครั้งเดียวแล้วแชร์ผ่าน shared memory, หลายโปรเซส) + ผลต้องตรงกัน
+#   python scripts/bench_sweep.py --workers 8 --minutes 60000
+import argparse, itertools, os, sys, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from core.backtest import BacktestParams, OHLCVStore, run_backtest, shared_inputs
+from core.sweep import resolve_workers, run_cells
+from core.synth import generate_bars
+
+
+def cell(data, params):
+    m = run_backtest(data, params).metrics
+    return m.sharpe, m.maxdd, m.trades
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=0, help="0 = ทุกคอร์")
+    ap.add_argument("--minutes", type=int, default=60000)
+    ap.add_argument("--bars", type=int, default=300_000, help="ขนาดข้อมูลสังเคราะห์")
+    args = ap.parse_args()
+
+    store = OHLCVStore.from_frame(generate_bars(args.bars))
+    cells = [BacktestParams(minutes=args.minutes, atr_mult=am, vote=v, cooldown=cd, max_layers=0)
+             for am, v, cd in itertools.product((2.0, 2.5, 3.0, 3.5), (1, 2, 3), (0, 6, 12))]
+    workers = resolve_workers(args.workers)
+    print(f"[i] cells={len(cells)} bars/cell={max(800, args.minutes // 15)} workers={workers} cpu={os.cpu_count()}")
+
+    t0 = time.perf_counter()
+    serial = [cell(store, p) for p in cells]  # แบบเดิม: ทุกเซลล์คำนวณ indicator เอง
+    t_serial = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    shared = shared_inputs(store, cells[0])
+    par = [None] * len(cells)
+    times = []
+    for i, out, secs in run_cells(cell, cells, shared, workers):
+        par[i] = out
+        times.append(secs)
+    t_par = time.perf_counter() - t0
+
+    ok = par == serial
+    print(f"[parity] identical={ok}")
+    print(f"[bench] per-cell serial={t_serial:.2f}s  run_cells={t_par:.2f}s  "
+          f"(mean cell {sum(times) / len(times) * 1000:.1f}ms, = {t_par / (t_serial / len(cells)):.1f} cells)")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
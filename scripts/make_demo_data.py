@@ -1,22 +1,26 @@
 # scripts/make_demo_data.py
-import os, numpy as np, pandas as pd
-os.makedirs("data", exist_ok=True)
+# เดโมดาต้าแบบ seed คงที่ (ใช้ core/synth.py) → สเกลได้ถึงหลายสิบล้านแท่งสำหรับ benchmark
+#   python scripts/make_demo_data.py                          # 5000 แท่ง M15 → data/xauusd_15m_demo.csv
+#   python scripts/make_demo_data.py --bars 20000000 --tf 1 --format bin --out data/bench_m1.bin
+import argparse, os, sys, time
+from pathlib import Path
 
-N = 5000
-t = pd.date_range("2024-01-01", periods=N, freq="15min")
-close = 2000 + np.cumsum(np.random.normal(0, 1.2, size=N))
-open_  = np.r_[close[0], close[:-1]]
-high   = np.maximum(open_, close) + np.random.rand(N) * 0.8
-low    = np.minimum(open_, close) - np.random.rand(N) * 0.8
-vol    = np.random.randint(100, 1000, size=N)
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+from core.synth import SynthParams, write_csv, write_store
 
-df = pd.DataFrame({
-    "time": t,
-    "open": open_,
-    "high": high,
-    "low":  low,
-    "close": close,
-    "volume": vol,
-})
-df.to_csv("data/xauusd_15m_demo.csv", index=False)
-print("Wrote data/xauusd_15m_demo.csv", len(df), "rows")
+ap = argparse.ArgumentParser()
+ap.add_argument("--bars", type=int, default=5000)
+ap.add_argument("--tf", type=int, default=15, help="นาทีต่อแท่ง")
+ap.add_argument("--seed", type=int, default=1234)
+ap.add_argument("--format", choices=["csv", "bin"], default="csv")
+ap.add_argument("--out", default=None)
+args = ap.parse_args()
+
+out = Path(args.out or f"data/xauusd_{args.tf}m_demo" + (".csv" if args.format == "csv" else ".bin"))
+os.makedirs(out.parent, exist_ok=True)
+t0 = time.perf_counter()
+writer = write_csv if args.format == "csv" else write_store
+n = writer(out, args.bars, SynthParams(tf_minutes=args.tf), seed=args.seed)
+print("Wrote", out, n, "rows", f"({time.perf_counter() - t0:.2f}s)")
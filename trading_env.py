@@ -6,7 +6,20 @@ from typing import Optional, Dict, Any, Tuple
 
 import config
 from features import build_features
-from reward_fn import step_reward
+from reward_fn import step_reward_peak
+
+# Gymnasium (requirements.txt): สืบทอด gym.Env + observation_space / action_space (ใช้กับ SB3 / wrappers.py ได้)
+# import ไม่ได้ → คลาสธรรมดา API เดียวกัน (reset → (obs, info), step → 5-tuple) แต่ไม่มี spaces
+try:
+    import gymnasium as gym  # type: ignore
+    from gymnasium import spaces  # type: ignore
+    HAVE_GYM = True
+except Exception:
+    gym = spaces = None
+    HAVE_GYM = False
+
+# ลำดับช่องของ observation (float32)
+OBS_KEYS = ("close", "ema_fast", "ema_slow", "ema_trend", "rsi14", "atr14", "is_spike", "trend_up")
 
 @dataclass
 class Position:
@@ -17,85 +30,120 @@ class Position:
     tp: Optional[float] = None
     group_id: Optional[int] = None  # ใช้เวลา pyramiding / exit พร้อมกัน
 
-class TradingEnv:
+class TradingEnv(gym.Env if HAVE_GYM else object):
     """
     Minimal on-close-bar environment สำหรับ XAUUSD M15
     action space:
       0 = hold, 1 = open/add long, 2 = exit all (flat)
+    observation: เวกเตอร์ float32 ตาม OBS_KEYS (rsi14 ว่าง = 50, atr14 ว่าง = 0)
+    ฟีเจอร์ถูกแปลงเป็นอาร์เรย์ต่อคอลัมน์ + ดัชนีวัน (int) ตอนสร้าง → step ไม่แตะ pandas
+    obs = สำเนาแถวของตาราง obs ที่คำนวณไว้ (8 float) → ผู้เรียกเก็บ obs เก่าได้ (เช่น terminal_observation ของ SB3)
     """
-    def __init__(self, df_raw: pd.DataFrame, start_cash: float = 10_000.0, contract_size: float = 1.0):
+    metadata = {"render_modes": []}
+
+    def __init__(self, df_raw: pd.DataFrame | None = None, start_cash: float = 10_000.0, contract_size: float = 1.0):
+        if df_raw is None:
+            from core.ohlcv_store import OHLCVStore
+            df_raw = OHLCVStore.open().to_frame()
         self.df_raw = df_raw.reset_index(drop=True)
         self.data, self.meta = build_features(self.df_raw)
+        d = self.data
+        self._close = d["close"].to_numpy(dtype=float)
+        self._ema_fast = d["ema_fast"].to_numpy(dtype=float)
+        self._ema_slow = d["ema_slow"].to_numpy(dtype=float)
+        self._ema_trend = d["ema_trend"].to_numpy(dtype=float)
+        self._atr = d["atr14"].to_numpy(dtype=float)
+        self._spike = d["is_spike"].to_numpy(dtype=bool)
+        # วันของแท่งตามเวลาท้องถิ่นของคอลัมน์ time (แบบ pd.to_datetime(t).date())
+        t = pd.DatetimeIndex(pd.to_datetime(d["time"]))
+        if t.tz is not None:
+            t = t.tz_localize(None)
+        self._day = t.to_numpy().astype("datetime64[D]").astype(np.int64)
+        tab = np.column_stack([d[k].to_numpy(dtype=float) for k in OBS_KEYS])
+        tab[:, OBS_KEYS.index("rsi14")] = np.nan_to_num(tab[:, OBS_KEYS.index("rsi14")], nan=50.0)
+        tab[:, OBS_KEYS.index("atr14")] = np.nan_to_num(tab[:, OBS_KEYS.index("atr14")], nan=0.0)
+        self._obs_tab = np.ascontiguousarray(tab, dtype=np.float32)
+        self._n = len(d)
+
+        if HAVE_GYM:
+            self.observation_space = spaces.Box(low=-np.inf, high=np.inf, shape=(len(OBS_KEYS),), dtype=np.float32)
+            self.action_space = spaces.Discrete(3)
+
         self.i = 0
         self.pos = Position()
-        self.cash = float(start_cash)
-        self.equity_hist = [self.cash]
+        self.start_cash = float(start_cash)
+        self.cash = self.start_cash
         self.contract = float(contract_size)
         self.daily_risk_used = 0.0
         self.cur_day = None
+        # equity ต่อ step จองไว้ทั้งตอน (ไม่ append list) + peak สะสมสำหรับ reward
+        self._eq = np.empty(self._n + 1)
+        self._eq[0] = self.cash
+        self._k = 1
+        self._peak = self.cash
         # bookkeeping
         self._open_groups = 0  # สำหรับจำลอง group/pyramid อย่างง่าย
 
-    def _price(self) -> float:
-        return float(self.data.loc[self.i, "close"])
+    @property
+    def equity_hist(self) -> np.ndarray:
+        return self._eq[:self._k]
 
-    def _bar_date(self):
-        # รองรับทั้ง str / pandas.Timestamp
-        t = self.data.loc[self.i, "time"]
-        return pd.to_datetime(t).date()
+    @property
+    def equity(self) -> float:
+        return float(self._eq[self._k - 1])
+
+    def _price(self) -> float:
+        return float(self._close[self.i])
 
     def _position_value(self, price: float) -> float:
         return self.pos.qty * (price - self.pos.entry) * self.contract
 
     def _risk_per_trade_value(self) -> float:
-        return self.equity_hist[-1] * config.RISK_PER_TRADE
+        return self.equity * config.RISK_PER_TRADE
 
     def _daily_reset_if_needed(self):
-        d = self._bar_date()
+        d = int(self._day[self.i])
         if self.cur_day is None:
             self.cur_day = d
         elif d != self.cur_day:
             self.cur_day = d
             self.daily_risk_used = 0.0
 
-    def reset(self) -> Dict[str, Any]:
+    def reset(self, *, seed: int | None = None, options: Dict[str, Any] | None = None) -> Tuple[np.ndarray, Dict[str, Any]]:
+        if HAVE_GYM:
+            super().reset(seed=seed)
         self.i = max(50, config.ATR_PERIOD + 1)  # ให้ indicator อุ่นตัว
         self.pos = Position()
-        self.cash = float(self.equity_hist[0])
-        self.equity_hist = [self.cash]
+        self.cash = self.start_cash
+        self._eq[0] = self.cash
+        self._k = 1
+        self._peak = self.cash
         self.daily_risk_used = 0.0
         self.cur_day = None
         self._open_groups = 0
-        return self._obs()
-
-    def _obs(self) -> Dict[str, Any]:
-        row = self.data.iloc[self.i]
-        return {
-            "close": float(row["close"]),
-            "ema_fast": float(row["ema_fast"]),
-            "ema_slow": float(row["ema_slow"]),
-            "ema_trend": float(row["ema_trend"]),
-            "rsi14": float(row["rsi14"]) if not np.isnan(row["rsi14"]) else 50.0,
-            "atr14": float(row["atr14"]) if not np.isnan(row["atr14"]) else 0.0,
-            "is_spike": bool(row["is_spike"]),
-            "trend_up": int(row["trend_up"]),
-        }
-
-    def step(self, action: int) -> Tuple[Dict[str, Any], float, bool, Dict[str, Any]]:
+        return self._obs(), {}
+
+    def _obs(self) -> np.ndarray:
+        return self._obs_tab[self.i].copy()
+
+    def step(self, action: int) -> Tuple[np.ndarray, float, bool, bool, Dict[str, Any]]:
         """
         action: 0 hold, 1 open/add long, 2 exit-all
+        คืน (obs, reward, terminated, truncated, info) แบบ Gymnasium
         """
+        action = int(action)
         assert action in (0, 1, 2)
         done = False
         info: Dict[str, Any] = {}
         self._daily_reset_if_needed()
+        i = self.i
 
         # ใช้ราคาปิดเท่านั้น (on close bar)
-        px = self._price()
-        prev_equity = self.equity_hist[-1]
+        px = float(self._close[i])
+        prev_equity = self.equity
 
         # Spike filter: skip ทุกอย่างถ้าเป็น spike bar
-        if self.data.loc[self.i, "is_spike"]:
+        if self._spike[i]:
             action = 0  # บังคับ hold
 
         # Risk/day cap guard
@@ -106,12 +154,11 @@ class TradingEnv:
         step_pnl = 0.0
         if action == 1:
             # open/add long เฉพาะเมื่อ trend ok และ cross up (เป็น entry เชิงตัวอย่าง)
-            can_long = (self.data.loc[self.i, "ema_fast"] > self.data.loc[self.i, "ema_slow"]) \
-                       and (self.data.loc[self.i, "close"] > self.data.loc[self.i, "ema_trend"])
+            can_long = (self._ema_fast[i] > self._ema_slow[i]) and (px > self._ema_trend[i])
             if can_long:
                 risk_val = self._risk_per_trade_value()
                 # ตั้ง SL = entry - ATR*X เพื่อคำนวณปริมาณ
-                atr = float(self.data.loc[self.i, "atr14"]) or 0.0
+                atr = float(self._atr[i]) or 0.0
                 sl_buffer = max(atr * 1.5, 0.5)  # กัน 0
                 stop_px = px - sl_buffer
                 per_unit_risk = max(px - stop_px, 1e-4) * self.contract
@@ -134,7 +181,7 @@ class TradingEnv:
 
         # move trailing SL / breakeven guard (อย่างย่อ)
         if self.pos.side == +1 and self.pos.qty > 0:
-            atr = float(self.data.loc[self.i, "atr14"]) or 0.0
+            atr = float(self._atr[i]) or 0.0
             # breakeven guard หลังได้ 1R
             R = (px - self.pos.entry) / max(atr, 1e-4)
             if R >= config.BREAKEVEN_AFTER_R_MULT:
@@ -154,13 +201,16 @@ class TradingEnv:
         # MTM equity
         mtm = self._position_value(px)
         equity = self.cash + mtm
-        self.equity_hist.append(equity)
+        self._eq[self._k] = equity
+        self._k += 1
+        if equity > self._peak:
+            self._peak = equity
 
         # reward
-        reward = step_reward(step_pnl=equity - prev_equity, equity_curve=np.array(self.equity_hist, dtype=float))
+        reward = step_reward_peak(step_pnl=equity - prev_equity, equity=equity, peak=self._peak)
 
         # step next
         self.i += 1
-        if self.i >= len(self.data) - 1:
+        if self.i >= self._n - 1:
             done = True
-        return self._obs(), float(reward), bool(done), info
+        return self._obs(), float(reward), bool(done), False, info
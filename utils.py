@@ -5,26 +5,20 @@ from datetime import datetime
 import os
 
 def load_data(path):
+    # อ่านทั้งไฟล์ทุกครั้ง (ไม่มี cache ซ่อนในโมดูล); อ่านซ้ำแบบ parse เฉพาะแถวต่อท้าย → core.data_loader.PriceFeed
     df = pd.read_csv(path, parse_dates=["time"])
     df.sort_values("time", inplace=True)
     df.reset_index(drop=True, inplace=True)
     return df
 
 def sharpe_ratio(returns, risk_free=0.0):
-    excess_ret = np.array(returns) - risk_free
-    if excess_ret.std() == 0:
-        return 0
-    return np.sqrt(252) * excess_ret.mean() / excess_ret.std()
+    # รีเทิร์นรายวัน (ann. sqrt(252)); สูตรกลางอยู่ที่ core.metrics
+    from core.metrics import ANN_DAY, sharpe
+    return sharpe(np.asarray(returns, dtype=float) - risk_free, ANN_DAY)
 
 def max_drawdown(equity_curve):
-    arr = np.array(equity_curve)
-    peak = arr[0]
-    max_dd = 0
-    for val in arr:
-        peak = max(peak, val)
-        dd = (peak - val) / peak
-        max_dd = max(max_dd, dd)
-    return max_dd
+    from core.metrics import max_drawdown as _max_drawdown
+    return _max_drawdown(equity_curve)
 
 def ensure_dir(path):
     if not os.path.exists(path):